@@ -0,0 +1,209 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from structured_logger import get_logger
+
+# Outbound API pacing and retries, shared by it-helpdesk-bot and
+# brie-infrastructure-connector (bundle this file next to the handler, like
+# structured_logger.py).
+# Client-side token buckets keep bursts under each API's limit; throttled calls are
+# retried with jittered backoff, honoring Retry-After, until the request's deadline.
+# Slack tiers are per method (https://api.slack.com/docs/rate-limits), rates in requests/second.
+RATE_LIMIT_TIERS = {
+    'graph': 10.0,
+    'slack_tier2': 20 / 60.0,
+    'slack_tier3': 50 / 60.0,
+    'slack_tier4': 100 / 60.0,
+    'slack_post': 1.0,
+    'bedrock': float(os.environ.get('BEDROCK_RATE_PER_SECOND', '5'))
+}
+SLACK_METHOD_TIERS = {
+    'chat.postMessage': 'slack_post',
+    'chat.update': 'slack_tier3',
+    'conversations.open': 'slack_tier3',
+    'users.info': 'slack_tier4',
+    'users.list': 'slack_tier2',
+    'files.getUploadURLExternal': 'slack_tier4',
+    'files.completeUploadExternal': 'slack_tier4'
+}
+RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', '5'))
+RETRY_DEADLINE_SECONDS = float(os.environ.get('RETRY_DEADLINE_SECONDS', '20'))
+RETRY_BASE_DELAY_SECONDS = 0.5
+RETRY_MAX_DELAY_SECONDS = 8.0
+RETRYABLE_HTTP_STATUS = (429, 500, 502, 503, 504)
+RETRYABLE_AWS_ERRORS = ('ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException', 'ModelNotReadyException', 'InternalServerException')
+# Slack methods that must not be repeated if the first request might have been processed
+SLACK_NON_IDEMPOTENT_METHODS = {'chat.postMessage', 'chat.postEphemeral', 'files.completeUploadExternal'}
+
+# {api: {'calls': n, 'throttled': n, 'retries': n, 'gave_up': n}} - reset after each emit
+retry_metrics = {}
+retry_metrics_lock = threading.Lock()
+
+class RateLimitedError(Exception):
+    """Raised for throttling that arrives in a response body (Slack's "ratelimited")"""
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is free or the deadline passes"""
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, deadline=None):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline and time.time() + wait > deadline:
+                return False
+            time.sleep(wait)
+    
+    def penalize(self, seconds):
+        """Drain the bucket so other callers also back off after a Retry-After"""
+        with self.lock:
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+rate_limit_buckets = {}
+rate_limit_buckets_lock = threading.Lock()
+
+def get_rate_limit_bucket(api):
+    with rate_limit_buckets_lock:
+        if api not in rate_limit_buckets:
+            rate_limit_buckets[api] = TokenBucket(RATE_LIMIT_TIERS.get(api.split(':')[0], 1.0))
+        return rate_limit_buckets[api]
+
+def slack_rate_limit_api(method, channel=None):
+    """Bucket name for a Slack method: its tier, per channel for chat.postMessage"""
+    api = SLACK_METHOD_TIERS.get(method, 'slack_tier3')
+    return f"{api}:{channel}" if api == 'slack_post' and channel else api
+
+def record_retry_metric(api, name):
+    # Called from SQS worker and answer-stage threads
+    with retry_metrics_lock:
+        counters = retry_metrics.setdefault(api, {'calls': 0, 'throttled': 0, 'retries': 0, 'gave_up': 0})
+        counters[name] += 1
+
+def parse_retry_after(value):
+    """Retry-After in seconds (Graph and Slack send delta-seconds), 0 if absent"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0
+
+def get_retry_after(error, idempotent=True):
+    """Return seconds to wait if error is retryable (0 when no Retry-After was given), else None
+    
+    For a non-idempotent call only errors that prove the request was not acted on
+    are retried: throttling, and connections that were never established.
+    """
+    if isinstance(error, RateLimitedError):
+        return error.retry_after or 0
+    if isinstance(error, urllib.error.HTTPError):
+        if error.code not in RETRYABLE_HTTP_STATUS or (not idempotent and error.code != 429):
+            return None
+        return parse_retry_after(error.headers.get('Retry-After') if error.headers else None)
+    if isinstance(error, urllib.error.URLError):
+        # DNS failure / connection refused never reached Slack; a reset or timeout might have
+        if idempotent or isinstance(error.reason, (socket.gaierror, ConnectionRefusedError)):
+            return 0
+        return None
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict) and response.get('Error', {}).get('Code') in RETRYABLE_AWS_ERRORS:
+        return parse_retry_after(response.get('ResponseMetadata', {}).get('HTTPHeaders', {}).get('retry-after'))
+    return None
+
+# Invocation deadline: the Lambda's remaining time at the start of the invocation,
+# less a margin for posting a fallback. No retry or model call runs past it.
+INVOCATION_DEADLINE_MARGIN_SECONDS = float(os.environ.get('INVOCATION_DEADLINE_MARGIN_SECONDS', '3'))
+invocation_deadline = {'at': None}
+
+def set_invocation_deadline(context):
+    remaining_ms = context.get_remaining_time_in_millis() if hasattr(context, 'get_remaining_time_in_millis') else None
+    invocation_deadline['at'] = time.time() + remaining_ms / 1000.0 - INVOCATION_DEADLINE_MARGIN_SECONDS if remaining_ms else None
+
+def time_remaining():
+    """Seconds left before the invocation deadline, None when there is none"""
+    return invocation_deadline['at'] - time.time() if invocation_deadline['at'] else None
+
+def call_with_retry(api, fn, deadline=None, idempotent=True):
+    """Call fn() under api's rate limit, retrying throttles and transient errors until deadline
+    
+    Raises RateLimitedError without calling fn() when the rate limit wait would pass the deadline.
+    """
+    if deadline is None:
+        deadline = time.time() + RETRY_DEADLINE_SECONDS
+    if invocation_deadline['at']:
+        deadline = min(deadline, invocation_deadline['at'])
+    bucket = get_rate_limit_bucket(api)
+    attempt = 0
+    while True:
+        if not bucket.acquire(deadline):
+            record_retry_metric(api, 'gave_up')
+            raise RateLimitedError(f"{api} rate limit wait would pass the deadline")
+        record_retry_metric(api, 'calls')
+        try:
+            return fn()
+        except Exception as e:
+            retry_after = get_retry_after(e, idempotent)
+            if retry_after is None:
+                raise
+            if isinstance(e, RateLimitedError) or getattr(e, 'code', None) == 429 or retry_after:
+                record_retry_metric(api, 'throttled')
+                bucket.penalize(retry_after)
+            attempt += 1
+            # Full jitter, but never retry sooner than the server asked
+            delay = max(retry_after, random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** attempt))))
+            if attempt >= RETRY_MAX_ATTEMPTS or time.time() + delay > deadline:
+                record_retry_metric(api, 'gave_up')
+                get_logger().error('❌ %s call failed after %s attempt(s): %s', api, attempt, e)
+                raise
+            record_retry_metric(api, 'retries')
+            get_logger().info('⏳ %s throttled/unavailable (%s), retry %s in %.1fs', api, e, attempt, delay)
+            time.sleep(delay)
+
+def urlopen_json(req, api, deadline=None, idempotent=True):
+    """urlopen + JSON decode through call_with_retry; Slack's "ratelimited" body counts as a 429"""
+    def do_call():
+        with urllib.request.urlopen(req) as response:
+            result = json.loads(response.read().decode('utf-8'))
+        if api.startswith('slack') and result.get('error') == 'ratelimited':
+            raise RateLimitedError(f"{api} ratelimited")
+        return result
+    return call_with_retry(api, do_call, deadline, idempotent)
+
+def emit_retry_metrics():
+    """Publish throttle/retry counters as CloudWatch embedded metrics and reset them"""
+    with retry_metrics_lock:
+        metrics = dict(retry_metrics)
+        retry_metrics.clear()
+    if not any(c['throttled'] or c['retries'] or c['gave_up'] for c in metrics.values()):
+        return
+    for api, counters in metrics.items():
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': 'BrieITAgent',
+                    'Dimensions': [['Api']],
+                    'Metrics': [{'Name': name, 'Unit': 'Count'} for name in ('calls', 'throttled', 'retries', 'gave_up')]
+                }]
+            },
+            'Api': api,
+            **counters
+        }))
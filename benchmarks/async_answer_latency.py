@@ -0,0 +1,124 @@
+"""Time to first answer text and total time of the async_processing branch
+
+AWS, Slack and Confluence are replaced with in-process fakes with fixed
+latencies (SCENARIO below), so runs are repeatable and need no credentials:
+Slack Web API calls take 50 ms, the Bedrock stream takes 0.8 s to its first
+token and 2.2 s for the rest, every other AWS call fails immediately as if
+the resource were empty or unreachable.
+
+    python benchmarks/async_answer_latency.py                  # this tree
+    git show <rev>:lambda_function.py > /tmp/lambda_function.py
+    python benchmarks/async_answer_latency.py /tmp/lambda_function.py
+"""
+import importlib.util
+import json
+import os
+import sys
+import time
+import types
+import urllib.request
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+SCENARIO = {
+    'slack_call_seconds': 0.05,
+    'bedrock_first_token_seconds': 0.8,
+    'bedrock_chunks': 11,
+    'bedrock_chunk_seconds': 0.2
+}
+
+class OfflineAwsExceptions:
+    def __getattr__(self, name):
+        return type(name, (Exception,), {})
+
+class OfflineAws:
+    """Stands in for every boto3 client/resource; operations fail like an unreachable service"""
+    
+    exceptions = OfflineAwsExceptions()
+    
+    def __getattr__(self, name):
+        # dynamodb.Table(...), s3.Bucket(...) build resources; lowercase names are API calls
+        if name == 'meta':
+            return OfflineAws()
+        if name[:1].isupper():
+            return lambda *args, **kwargs: OfflineAws()
+        
+        def operation(*args, **kwargs):
+            raise ConnectionError(f'{name}: offline (benchmark)')
+        return operation
+
+def install_fake_aws():
+    boto3 = types.ModuleType('boto3')
+    boto3.client = boto3.resource = lambda *args, **kwargs: OfflineAws()
+    botocore = types.ModuleType('botocore')
+    botocore_config = types.ModuleType('botocore.config')
+    botocore_config.Config = lambda **kwargs: kwargs
+    botocore.config = botocore_config
+    sys.modules.update({'boto3': boto3, 'botocore': botocore, 'botocore.config': botocore_config})
+
+class FakeBedrock:
+    def invoke_model_with_response_stream(self, **kwargs):
+        def events():
+            time.sleep(SCENARIO['bedrock_first_token_seconds'])
+            for i in range(SCENARIO['bedrock_chunks']):
+                time.sleep(SCENARIO['bedrock_chunk_seconds'])
+                chunk = {'type': 'content_block_delta', 'delta': {'text': f'Step {i}. '}}
+                yield {'chunk': {'bytes': json.dumps(chunk).encode('utf-8')}}
+        return {'body': events()}
+
+def load_bot(path):
+    install_fake_aws()
+    # Shared modules (structured_logger) come from this tree when the bot is a copy elsewhere
+    sys.path[:0] = [os.path.dirname(os.path.abspath(path)), REPO_DIR]
+    spec = importlib.util.spec_from_file_location('bench_bot', path)
+    bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bot)
+    return bot
+
+def run(path):
+    bot = load_bot(path)
+    with open(os.path.join(BENCHMARK_DIR, 'async_answer_event.json')) as f:
+        event = json.load(f)
+    
+    started = [0.0]
+    first_answer = [None]
+    
+    def fake_slack_api_call(method, payload, form=False, deadline=None, **kwargs):
+        time.sleep(SCENARIO['slack_call_seconds'])
+        text = payload.get('text') or ''
+        # Answer text is posted with the wrench prefix; the placeholder is not an answer
+        if first_answer[0] is None and '🔧' in text and 'Let me think' not in text:
+            first_answer[0] = time.time() - started[0]
+        return {'ok': True, 'ts': '1.2'}
+    
+    def offline(*args, **kwargs):
+        raise OSError('offline (benchmark)')
+    
+    bot.slack_api_call = fake_slack_api_call
+    urllib.request.urlopen = offline
+    bot.bedrock = FakeBedrock()
+    if hasattr(bot, 'get_bedrock_client'):
+        bot.get_bedrock_client = lambda *args, **kwargs: FakeBedrock()
+    if hasattr(bot, 'get_confluence_content'):
+        bot.get_confluence_content = lambda: ''
+    for name in ('update_conversation', 'track_user_message', 'schedule_auto_resolve'):
+        if hasattr(bot, name):
+            setattr(bot, name, lambda *args, **kwargs: None)
+    
+    started[0] = time.time()
+    bot.lambda_handler(event, None)
+    total = time.time() - started[0]
+    first = f"{first_answer[0]:.1f}s" if first_answer[0] is not None else 'never'
+    return f"{path}: first answer text {first}, total {total:.1f}s"
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(REPO_DIR, 'lambda_function.py')
+    # The bot logs every step; keep only the result line on stdout
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        result = run(path)
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+    print(result)
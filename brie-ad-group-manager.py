@@ -4,11 +4,14 @@ import time
 import os
 import urllib.request
 from datetime import datetime
+from structured_logger import get_logger
 
 ssm = boto3.client('ssm')
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('it-actions')  # Use existing table
 
+logger = get_logger('brie-ad-group-manager')
+
 BESPIN_INSTANCE_ID = "i-0dca7766c8de43f08"
 SLACK_BOT_TOKEN = os.environ.get('SLACK_BOT_TOKEN', 'SLACK_BOT_TOKEN')
 IT_APPROVAL_CHANNEL = "C09KB40PL9J"
@@ -16,7 +19,7 @@ IT_APPROVAL_CHANNEL = "C09KB40PL9J"
 def send_slack_message(channel, text):
     """Send message to Slack channel"""
     try:
-        print(f"🔍 Sending to channel: {channel}, token: {SLACK_BOT_TOKEN[:20]}...")
+        logger.info('🔍 Sending to channel: %s, token: %s...', channel, SLACK_BOT_TOKEN[:20])
         url = 'https://slack.com/api/chat.postMessage'
         data = json.dumps({
             'channel': channel,
@@ -32,12 +35,12 @@ def send_slack_message(channel, text):
         req = urllib.request.Request(url, data=data, headers=headers)
         with urllib.request.urlopen(req) as response:
             result = json.loads(response.read().decode('utf-8'))
-            print(f"📤 Slack API response: {result}")
+            logger.info('📤 Slack API response: %s', result)
             if not result.get('ok'):
-                print(f"❌ Slack API error: {result.get('error')}")
+                logger.error('❌ Slack API error: %s', result.get('error'))
             return result.get('ok', False)
     except Exception as e:
-        print(f"❌ Error sending Slack message: {e}")
+        logger.error('❌ Error sending Slack message: %s', e)
         return False
 
 def search_similar_groups(search_term):
@@ -83,13 +86,14 @@ try {{
         return []
         
     except Exception as e:
-        print(f"Error searching groups: {e}")
+        logger.error('Error searching groups: %s', e)
         return []
 
 def lambda_handler(event, context):
     """Execute AD group add/remove operation"""
+    logger.begin(context)
     try:
-        print(f"Executing SSO group operation: {json.dumps(event)}")
+        logger.debug('Executing SSO group operation', event=event)
         
         # Handle multiple parameter formats
         if event.get('action') == 'execute':
@@ -133,15 +137,15 @@ def lambda_handler(event, context):
         action = sso_request.get('action', 'add')
         requester = sso_request.get('requester')
         
-        print(f"🔍 SSO Request Details:")
-        print(f"user_emails: {user_emails} (batch of {len(user_emails)})")
-        print(f"group_name: {group_name}")
-        print(f"action: {action}")
-        print(f"requester: {requester}")
+        logger.info('🔍 SSO Request Details:')
+        logger.info('user_emails: %s (batch of %s)', user_emails, len(user_emails))
+        logger.info('group_name: %s', group_name)
+        logger.info('action: %s', action)
+        logger.info('requester: %s', requester)
         
         if not user_emails:
             error_msg = "ERROR: user_email/user_emails is missing from SSO request"
-            print(f"❌ {error_msg}")
+            logger.warning('❌ %s', error_msg)
             return {
                 'statusCode': 400,
                 'body': json.dumps({'error': error_msg})
@@ -157,16 +161,16 @@ def lambda_handler(event, context):
                 approval_response = approvals_table.get_item(Key={'approval_id': approval_id})
                 if 'Item' in approval_response:
                     approved_by = approval_response['Item'].get('approver', 'Unknown')
-                    print(f"📝 Found approver from approval record: {approved_by}")
+                    logger.info('📝 Found approver from approval record: %s', approved_by)
             except Exception as e:
-                print(f"⚠️ Could not look up approver: {e}")
+                logger.warning('⚠️ Could not look up approver: %s', e)
         
         approved_at = approval_info.get('timestamp', int(time.time()))
         
         # Process each user
         results = []
         for user_email in user_emails:
-            print(f"Processing user: {user_email}")
+            logger.info('Processing user: %s', user_email)
             
             # PowerShell script to add/remove user from AD group
             ps_command = 'Add-ADGroupMember' if action == 'add' else 'Remove-ADGroupMember'
@@ -228,7 +232,7 @@ try {{
             )
             
             command_id = response['Command']['CommandId']
-            print(f"Execution command ID for {user_email}: {command_id}")
+            logger.info('Execution command ID for %s: %s', user_email, command_id)
             
             # Wait for completion
             for _ in range(10):
@@ -244,7 +248,7 @@ try {{
             output = result.get('StandardOutputContent', '').strip()
             error_output = result.get('StandardErrorContent', '').strip()
             
-            print(f"Execution output for {user_email}: {output}")
+            logger.info('Execution output for %s: %s', user_email, output)
             
             # Check result
             already_member = 'already a member' in output.lower()
@@ -268,11 +272,11 @@ try {{
         suggestions_sent = False
         
         if group_not_found and source == 'it-helpdesk-bot':
-            print(f"🔍 Group '{group_name}' not found, searching for similar groups...")
+            logger.info("🔍 Group '%s' not found, searching for similar groups...", group_name)
             similar_groups = search_similar_groups(group_name.split()[0])  # Search first word
             
             if similar_groups:
-                print(f"Found {len(similar_groups)} similar groups: {similar_groups}")
+                logger.info('Found %s similar groups: %s', len(similar_groups), similar_groups)
                 
                 # Get Slack context for messaging
                 slack_context = event.get('slackContext')
@@ -340,7 +344,7 @@ try {{
         # If not in approval_info, try to find it in tracking table
         if not interaction_id:
             try:
-                print(f"🔍 Looking up interaction tracking for {user_email}")
+                logger.info('🔍 Looking up interaction tracking for %s', user_email)
                 # Retry up to 3 times with delay for eventual consistency
                 for attempt in range(3):
                     tracking_response = table.scan(
@@ -356,17 +360,17 @@ try {{
                         tracking = max(items, key=lambda x: int(x.get('timestamp', 0)))
                         interaction_id = tracking.get('interaction_id')
                         interaction_timestamp = tracking.get('interaction_timestamp')
-                        print(f"✅ Found interaction tracking: {interaction_id}")
+                        logger.info('✅ Found interaction tracking: %s', interaction_id)
                         # Clean up tracking record
                         table.delete_item(Key={'action_id': tracking['action_id']})
                         break
                     elif attempt < 2:
-                        print(f"⚠️ No tracking found, retrying... (attempt {attempt + 1})")
+                        logger.warning('⚠️ No tracking found, retrying... (attempt %s)', attempt + 1)
                         time.sleep(2)
                     else:
-                        print(f"⚠️ No tracking record found for {user_email} after 3 attempts")
+                        logger.warning('⚠️ No tracking record found for %s after 3 attempts', user_email)
             except Exception as e:
-                print(f"⚠️ Failed to lookup interaction tracking: {e}")
+                logger.error('⚠️ Failed to lookup interaction tracking: %s', e)
         
         # Don't update conversation directly - let callback_result handle it
         # This preserves awaiting_approval flag for callback to find
@@ -404,7 +408,7 @@ try {{
                 if failed_users:
                     it_message += f"\n\n⚠️ Failed: {', '.join(failed_users)}"
                 send_slack_message(IT_APPROVAL_CHANNEL, it_message)
-                print(f"Slack notifications sent to user and IT channel")
+                logger.info('Slack notifications sent to user and IT channel')
             else:
                 # Only send error message if suggestions were NOT sent
                 if not suggestions_sent:
@@ -414,7 +418,7 @@ try {{
                     # Post to IT channel
                     it_message = f"❌ **Request Failed**\n\nUsers: {', '.join(user_emails)}\nGroup: {group_name}\nFailed: {', '.join(failed_users)}"
                     send_slack_message(IT_APPROVAL_CHANNEL, it_message)
-                    print(f"Slack error notifications sent")
+                    logger.info('Slack error notifications sent')
         
         return {
             'statusCode': 200 if all_success else 400,
@@ -428,7 +432,7 @@ try {{
         }
         
     except Exception as e:
-        print(f"Error executing SSO group operation: {e}")
+        logger.error('Error executing SSO group operation: %s', e)
         return {
             'statusCode': 500,
             'body': json.dumps({
@@ -1,9 +1,12 @@
 import json
 import boto3
+from structured_logger import get_logger
 
 ssm = boto3.client('ssm')
 BESPIN_INSTANCE_ID = "i-0dca7766c8de43f08"
 
+logger = get_logger('brie-ad-group-validator')
+
 def check_membership(user_email, group_name):
     """Check if user is already a member of the group"""
     try:
@@ -60,7 +63,7 @@ try {{
         )
         
         output = output_response['StandardOutputContent'].strip()
-        print(f"Membership check output: {output}")
+        logger.info('Membership check output: %s', output)
         
         if "ALREADY_MEMBER" in output:
             return "ALREADY_MEMBER"
@@ -74,7 +77,7 @@ try {{
             return "ERROR"
         
     except Exception as e:
-        print(f"Error checking membership: {e}")
+        logger.error('Error checking membership: %s', e)
         return "ERROR"
 
 def check_group_type(group_name):
@@ -193,17 +196,17 @@ Write-Output "END"
         
         output = output_response['StandardOutputContent'].strip()
         error_output = output_response.get('StandardErrorContent', '').strip()
-        print(f"SSM Command Status: {status}")
-        print(f"Group type check output length: {len(output)} chars")
+        logger.info('SSM Command Status: %s', status)
+        logger.info('Group type check output length: %s chars', len(output))
         if error_output:
-            print(f"Group type check errors: {error_output}")
+            logger.warning('Group type check errors: %s', error_output)
         
         if status not in ['Success', 'Failed']:
-            print(f"PowerShell script timed out after 30 seconds, status: {status}")
+            logger.error('PowerShell script timed out after 30 seconds, status: %s', status)
             return None
         
         if not output or "END" not in output:
-            print(f"PowerShell script did not complete successfully. Output: {output[:500]}")
+            logger.error('PowerShell script did not complete successfully. Output: %s', output[:500])
             return None
         
         # Parse results
@@ -220,13 +223,14 @@ Write-Output "END"
         return matches if matches else None
         
     except Exception as e:
-        print(f"Error checking group type: {e}")
+        logger.error('Error checking group type: %s', e)
         return None
 
 def lambda_handler(event, context):
     """Validate SSO group request - check user and group exist in AD"""
+    logger.begin(context, route=event.get('action'))
     try:
-        print(f"Validating SSO group request: {json.dumps(event)}")
+        logger.debug('Validating SSO group request', event=event)
         
         # Handle check_group_type action
         if event.get('action') == 'check_group_type':
@@ -313,7 +317,7 @@ try {{
         )
         
         command_id = response['Command']['CommandId']
-        print(f"Validation command ID: {command_id}")
+        logger.info('Validation command ID: %s', command_id)
         
         # Wait for command to complete
         import time
@@ -331,8 +335,8 @@ try {{
         error_output = result.get('StandardErrorContent', '').strip()
         exit_code = result.get('ResponseCode', -1)
         
-        print(f"Validation output: {output}")
-        print(f"Exit code: {exit_code}")
+        logger.info('Validation output: %s', output)
+        logger.info('Exit code: %s', exit_code)
         
         # Parse result
         if exit_code == 0 and 'VALID:' in output:
@@ -367,7 +371,7 @@ try {{
             }
         
     except Exception as e:
-        print(f"Error validating SSO group request: {e}")
+        logger.error('Error validating SSO group request: %s', e)
         return {
             'statusCode': 500,
             'valid': False,
@@ -6,11 +6,24 @@ Real connections to everagglobal.com domain and Office 365
 
 import json
 import urllib.request
+import urllib.error
 import urllib.parse
 import boto3
 import os
+import random
 import time
 from datetime import datetime
+from structured_logger import get_logger
+from directory_mirror import (
+    MIRROR_SELECT, find_mirror_user, load_directory_mirror, mirror_user_email,
+    save_directory_mirror, search_mirror_groups
+)
+from api_retry import (
+    RETRY_DEADLINE_SECONDS, RETRY_MAX_ATTEMPTS, emit_retry_metrics, parse_retry_after,
+    record_retry_metric, set_invocation_deadline, slack_rate_limit_api, urlopen_json
+)
+
+logger = get_logger('brie-infrastructure-connector')
 
 # Configuration
 BESPIN_INSTANCE_ID = "i-0dca7766c8de43f08"  # Bespin domain controller
@@ -25,17 +38,23 @@ interactions_table = dynamodb.Table('brie-it-helpdesk-bot-interactions')
 
 def lookup_tracking(user_email):
     """Look up tracking record for user"""
-    for attempt in range(3):
-        try:
-            response = actions_table.scan(
-                FilterExpression='action_type = :type AND user_email = :email',
-                ExpressionAttributeValues={':type': 'sso_interaction_tracking', ':email': user_email}
-            )
+    # A strongly consistent, fully paginated scan sees the record on the first pass -
+    # a filtered scan can return an empty first page even when a later page matches
+    scan_kwargs = {
+        'FilterExpression': 'action_type = :type AND user_email = :email',
+        'ExpressionAttributeValues': {':type': 'sso_interaction_tracking', ':email': user_email},
+        'ConsistentRead': True
+    }
+    try:
+        while True:
+            response = actions_table.scan(**scan_kwargs)
             if response.get('Items'):
                 return response['Items'][0]
-            time.sleep(2)
-        except Exception as e:
-            print(f"Tracking lookup attempt {attempt + 1} failed: {e}")
+            if 'LastEvaluatedKey' not in response:
+                return None
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except Exception as e:
+        logger.info('Tracking lookup failed: %s', e)
     return None
 
 def update_conversation(interaction_id, timestamp, message_text):
@@ -54,7 +73,7 @@ def update_conversation(interaction_id, timestamp, message_text):
         )
         return True
     except Exception as e:
-        print(f"Error updating conversation: {e}")
+        logger.error('Error updating conversation: %s', e)
         return False
 
 def send_slack_message(channel, text):
@@ -72,15 +91,24 @@ def send_slack_message(channel, text):
         }
         
         req = urllib.request.Request(url, data=data, headers=headers)
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            return result.get('ok', False)
+        result = urlopen_json(req, slack_rate_limit_api('chat.postMessage', channel), idempotent=False)
+        return result.get('ok', False)
     except Exception as e:
-        print(f"Error sending Slack message: {e}")
+        logger.error('Error sending Slack message: %s', e)
         return False
 
+# Microsoft Graph
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+GRAPH_BATCH_LIMIT = 20  # Graph rejects $batch payloads with more than 20 sub-requests
+
+# Cached app token - client credential tokens are valid for ~60 minutes
+graph_token_cache = {'access_token': None, 'expires_at': 0}
+
 def get_graph_access_token():
     """Get Microsoft Graph access token for Office 365 operations"""
+    if graph_token_cache['access_token'] and time.time() < graph_token_cache['expires_at']:
+        return graph_token_cache['access_token']
+    
     # Dedicated credentials for IT Group Management
     TENANT_ID = "3d90a358-2976-40f4-8588-45ed47a26302"
     CLIENT_ID = "c33fc45c-9313-4f45-ac31-baf568616137"  # Brie-IT-Automation-Group-Manager
@@ -99,103 +127,273 @@ def get_graph_access_token():
     req = urllib.request.Request(url, data=encoded_data)
     req.add_header('Content-Type', 'application/x-www-form-urlencoded')
     
-    with urllib.request.urlopen(req) as response:
-        result = json.loads(response.read().decode())
-        return result.get('access_token')
+    result = urlopen_json(req, 'graph')
+    access_token = result.get('access_token')
+    if access_token:
+        # Refresh 5 minutes early so a token never expires mid-request
+        graph_token_cache['access_token'] = access_token
+        graph_token_cache['expires_at'] = time.time() + int(result.get('expires_in', 3600)) - 300
+    return access_token
 
-def search_office365_groups(access_token, group_name):
-    """Search for groups in Office 365 by name or email address"""
-    try:
-        # Check if group_name looks like an email address or email prefix
-        if '@' in group_name:
-            # Full email provided - search by email prefix
-            email_part = group_name.split('@')[0]
-            # Try multiple case variations
-            variations = [email_part.lower(), email_part.upper(), email_part]
-            filter_parts = []
-            for var in variations:
-                filter_parts.append(f"startswith(mail,'{var}')")
-                filter_parts.append(f"startswith(mailNickname,'{var}')")
-            filter_param = ' or '.join(filter_parts)
-        elif group_name.lower().startswith('dl_'):
-            # Looks like an email prefix - try multiple case variations
-            variations = [
-                group_name.lower(),  # dl_everag_corp_it
-                group_name.upper(),  # DL_EVERAG_CORP_IT
-                group_name.title().replace('_', '_'),  # Dl_Everag_Corp_It
-                'DL_' + '_'.join(word.capitalize() for word in group_name[3:].split('_'))  # DL_Everag_Corp_It
-            ]
-            filter_parts = []
-            for var in set(variations):  # Remove duplicates
-                filter_parts.append(f"startswith(mail,'{var}')")
-                filter_parts.append(f"startswith(mailNickname,'{var}')")
-            filter_param = ' or '.join(filter_parts)
-        else:
-            # Search by display name or mailNickname
-            filter_param = f"displayName eq '{group_name}' or mailNickname eq '{group_name}'"
-        
-        encoded_filter = urllib.parse.quote(filter_param)
+class GraphBatch:
+    """Queue independent Graph GET requests and send them as JSON $batch calls.
+    
+    Each call to get() returns a request id; execute() sends the queued requests
+    in chunks of up to 20 and maps every response back to the id it was queued under.
+    """
+    
+    def __init__(self, access_token):
+        self.access_token = access_token
+        self.requests = []
+    
+    def get(self, path, headers=None):
+        """Queue a GET for a path relative to /v1.0 (e.g. "/users/x@ever.ag") and return its id"""
+        request_id = str(len(self.requests) + 1)
+        sub_request = {'id': request_id, 'method': 'GET', 'url': path}
+        if headers:
+            sub_request['headers'] = headers
+        self.requests.append(sub_request)
+        return request_id
+    
+    def execute(self):
+        """Send queued requests and return {id: {'status': int, 'body': dict}}"""
+        responses = {}
+        deadline = time.time() + RETRY_DEADLINE_SECONDS
+        for i in range(0, len(self.requests), GRAPH_BATCH_LIMIT):
+            pending = self.requests[i:i + GRAPH_BATCH_LIMIT]
+            for attempt in range(RETRY_MAX_ATTEMPTS):
+                req = urllib.request.Request(
+                    f"{GRAPH_BASE_URL}/$batch",
+                    data=json.dumps({'requests': pending}).encode('utf-8'),
+                    headers={
+                        'Authorization': f'Bearer {self.access_token}',
+                        'Content-Type': 'application/json'
+                    }
+                )
+                try:
+                    result = urlopen_json(req, 'graph', deadline)
+                except Exception as e:
+                    logger.error('❌ Graph $batch request failed: %s', e)
+                    break
+                
+                # Sub-requests are throttled individually - resend only those, after their Retry-After
+                throttled = {}
+                for sub_response in result.get('responses', []):
+                    if sub_response.get('status') == 429:
+                        throttled[sub_response['id']] = parse_retry_after((sub_response.get('headers') or {}).get('Retry-After'))
+                        continue
+                    responses[sub_response['id']] = {
+                        'status': sub_response.get('status', 500),
+                        'body': sub_response.get('body') or {}
+                    }
+                if not throttled:
+                    break
+                record_retry_metric('graph', 'throttled')
+                delay = max(max(throttled.values()), random.uniform(0, 0.5 * (2 ** attempt)))
+                # No point waiting out a Retry-After that no resend will follow
+                if attempt + 1 >= RETRY_MAX_ATTEMPTS or time.time() + delay > deadline:
+                    record_retry_metric('graph', 'gave_up')
+                    break
+                record_retry_metric('graph', 'retries')
+                time.sleep(delay)
+                pending = [r for r in pending if r['id'] in throttled]
+            
+            # Anything Graph didn't answer is reported as a failure rather than missing
+            for sub_request in self.requests[i:i + GRAPH_BATCH_LIMIT]:
+                responses.setdefault(sub_request['id'], {'status': 500, 'body': {}})
         
-        # Build the search URL with encoded filter
-        search_url = f"https://graph.microsoft.com/v1.0/groups?$filter={encoded_filter}"
+        logger.info('📦 Graph $batch: %s lookups in %s round trip(s)', len(self.requests), (len(self.requests) + GRAPH_BATCH_LIMIT - 1) // GRAPH_BATCH_LIMIT)
+        self.requests = []
+        return responses
+
+def lookup_graph_users(access_token, user_emails):
+    """Look up several users by UPN/email: the directory mirror first, then one $batch call for the rest.
+    
+    A 404 comes back as {'found': False}; any other failure also carries 'error'
+    (the HTTP status) so callers don't mistake an outage for an unknown user.
+    """
+    users = {}
+    batch = GraphBatch(access_token)
+    request_ids = {}
+    for email in user_emails:
+        user = find_mirror_user(email)
+        if user:
+            users[email] = {
+                'found': True,
+                'id': user.get('id'),
+                'displayName': user.get('displayName'),
+                'mail': mirror_user_email(user)
+            }
+        else:
+            request_ids[email] = batch.get(f"/users/{urllib.parse.quote(email)}?$select=id,displayName,mail,userPrincipalName")
+    results = batch.execute() if request_ids else {}
+    
+    for email, request_id in request_ids.items():
+        result = results[request_id]
+        if result['status'] == 200:
+            users[email] = {
+                'found': True,
+                'id': result['body'].get('id'),
+                'displayName': result['body'].get('displayName'),
+                'mail': result['body'].get('mail') or result['body'].get('userPrincipalName')
+            }
+        elif result['status'] == 404:
+            users[email] = {'found': False}
+        else:
+            logger.error('❌ Graph lookup for %s failed with status %s', email, result['status'])
+            users[email] = {'found': False, 'error': result['status']}
+    return users
+
+def classify_office365_group(group):
+    """Normalize a Graph group object and work out what kind of group it is"""
+    group_types = group.get('groupTypes', [])
+    mail_enabled = group.get('mailEnabled', False)
+    security_enabled = group.get('securityEnabled', False)
+    
+    # Determine group type
+    if not group_types and mail_enabled and not security_enabled:
+        group_type = "distribution"
+    elif "Unified" in group_types:
+        group_type = "microsoft365"
+    elif security_enabled and not mail_enabled:
+        group_type = "security"
+    elif security_enabled and mail_enabled:
+        group_type = "mail_security"
+    else:
+        group_type = "unknown"
+    
+    # Override for known Distribution Lists that might be misclassified
+    known_distribution_lists = ['ittest', 'IT Test', 'ITTest1']
+    if any(known_dl in group['displayName'] for known_dl in known_distribution_lists):
+        group_type = "distribution"
+        logger.info('🔧 Override: Forcing %s to be classified as distribution list', group['displayName'])
+    
+    return {
+        'id': group['id'],
+        'displayName': group['displayName'],
+        'mail': group.get('mail'),
+        'groupTypes': group_types,
+        'mailEnabled': mail_enabled,
+        'securityEnabled': security_enabled,
+        'groupType': group_type,
+        'location': 'office365'
+    }
+
+# Entra ID delta mirror
+# Groups and users are kept current with /groups/delta and /users/delta so lookups
+# can be answered from memory instead of a filtered Graph call per request. The
+# snapshot format and readers live in directory_mirror.py; this connector writes it.
+def apply_delta_changes(access_token, resource, entries, delta_link):
+    """Follow a /delta round to completion, applying changes to entries. Returns the new deltaLink."""
+    if delta_link:
+        url = delta_link
+    else:
+        url = f"{GRAPH_BASE_URL}/{resource}/delta?$select={MIRROR_SELECT[resource]}"
+    
+    fields = MIRROR_SELECT[resource].split(',')
+    changed = 0
+    while url:
+        req = urllib.request.Request(url)
+        req.add_header('Authorization', f'Bearer {access_token}')
+        page = urlopen_json(req, 'graph')
         
-        print(f"🔍 Office 365 search with {len(filter_parts) if '@' in group_name or group_name.lower().startswith('dl_') else 2} variations")
+        for item in page.get('value', []):
+            changed += 1
+            if '@removed' in item:
+                entries.pop(item['id'], None)
+                continue
+            # Delta pages only carry properties that changed, so merge rather than replace
+            entry = entries.setdefault(item['id'], {'id': item['id']})
+            for field in fields:
+                if field in item:
+                    entry[field] = item[field]
+        
+        if '@odata.deltaLink' in page:
+            logger.info('🔄 %s delta applied %s change(s)', resource, changed)
+            return page['@odata.deltaLink']
+        url = page.get('@odata.nextLink')
+    return delta_link
+
+def sync_directory_mirror():
+    """Bring the groups/users mirror up to date using stored delta tokens"""
+    access_token = get_graph_access_token()
+    if not access_token:
+        logger.error('❌ Failed to get Office 365 access token')
+        return None
+    
+    mirror = load_directory_mirror(force=True) or {'groups': {}, 'users': {}, 'delta_links': {}}
+    for resource in ('groups', 'users'):
+        try:
+            mirror['delta_links'][resource] = apply_delta_changes(access_token, resource, mirror[resource], mirror['delta_links'].get(resource))
+        except urllib.error.HTTPError as e:
+            if e.code == 410:
+                # Delta token expired (resync required) - rebuild this resource from scratch
+                logger.warning('⚠️ %s delta token expired, resyncing', resource)
+                mirror[resource] = {}
+                mirror['delta_links'][resource] = apply_delta_changes(access_token, resource, mirror[resource], None)
+            else:
+                raise
+    mirror['synced_at'] = datetime.utcnow().isoformat()
+    save_directory_mirror(mirror)
+    return mirror
+
+def search_office365_groups(access_token, group_name, max_results=25):
+    """Search for groups in Office 365 by name or email address"""
+    # Answer from the delta mirror when possible; fall back to Graph on a miss
+    # because the mirror can lag group creation by one sync interval
+    mirror_groups = search_mirror_groups(group_name)
+    if mirror_groups:
+        all_groups = [classify_office365_group(group) for group in mirror_groups]
+        logger.info("🪞 Found %s Office 365 groups matching '%s' in directory mirror", len(all_groups), group_name)
+        return [g for g in all_groups if g['groupType'] in ['distribution', 'mail_security', 'microsoft365']]
+    
+    try:
+        groups = []
+        for group in iter_office365_groups(access_token, group_name):
+            groups.append(group)
+            if len(groups) >= max_results:
+                break
         
-        req = urllib.request.Request(search_url)
-        req.add_header('Authorization', f'Bearer {access_token}')
+        logger.info("📧 Found %s Office 365 groups matching '%s'", len(groups), group_name)
+        for group in groups:
+            logger.info('   - %s (%s) - Mail: %s', group['displayName'], group['groupType'], group.get('mail', 'None'))
         
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode())
-            groups = result.get('value', [])
-            
-            # For now, return all groups to see what we find
-            all_groups = []
-            for group in groups:
-                group_types = group.get('groupTypes', [])
-                mail_enabled = group.get('mailEnabled', False)
-                security_enabled = group.get('securityEnabled', False)
-                
-                # Determine group type
-                if not group_types and mail_enabled and not security_enabled:
-                    group_type = "distribution"
-                elif "Unified" in group_types:
-                    group_type = "microsoft365"
-                elif security_enabled and not mail_enabled:
-                    group_type = "security"
-                elif security_enabled and mail_enabled:
-                    group_type = "mail_security"
-                else:
-                    group_type = "unknown"
-                
-                # Override for known Distribution Lists that might be misclassified
-                known_distribution_lists = ['ittest', 'IT Test', 'ITTest1']
-                if any(known_dl in group['displayName'] for known_dl in known_distribution_lists):
-                    group_type = "distribution"
-                    print(f"🔧 Override: Forcing {group['displayName']} to be classified as distribution list")
-                
-                all_groups.append({
-                    'id': group['id'],
-                    'displayName': group['displayName'],
-                    'mail': group.get('mail'),
-                    'groupTypes': group_types,
-                    'mailEnabled': mail_enabled,
-                    'securityEnabled': security_enabled,
-                    'groupType': group_type,
-                    'location': 'office365'
-                })
-            
-            print(f"📧 Found {len(all_groups)} Office 365 groups matching '{group_name}'")
-            for group in all_groups:
-                print(f"   - {group['displayName']} ({group['groupType']}) - Mail: {group.get('mail', 'None')}")
-            
-            # Return distribution groups and mail-enabled security groups
-            usable_groups = [g for g in all_groups if g['groupType'] in ['distribution', 'mail_security', 'microsoft365']]
-            return usable_groups
+        # Return distribution groups and mail-enabled security groups
+        usable_groups = [g for g in groups if g['groupType'] in ['distribution', 'mail_security', 'microsoft365']]
+        return usable_groups
             
     except Exception as e:
-        print(f"❌ Error searching Office 365 groups: {e}")
+        logger.error('❌ Error searching Office 365 groups: %s', e)
         return []
 
+def iter_office365_groups(access_token, group_name, page_size=50):
+    """Yield matching Office 365 groups one page at a time, following @odata.nextLink lazily.
+    
+    Uses server-side $search (case-insensitive, so no case-variation OR chains) and a
+    $select projection of only the fields classify_office365_group reads. $search is
+    token based, so results are re-checked with group_matches_name to keep the old
+    exact/prefix semantics.
+    """
+    term = group_name.split('@')[0].replace('"', '')
+    params = urllib.parse.urlencode({
+        '$search': f'"displayName:{term}" OR "mail:{term}" OR "mailNickname:{term}"',
+        '$select': 'id,displayName,mail,mailNickname,groupTypes,mailEnabled,securityEnabled',
+        '$top': page_size
+    }, safe='$', quote_via=urllib.parse.quote)
+    url = f"{GRAPH_BASE_URL}/groups?{params}"
+    
+    while url:
+        req = urllib.request.Request(url)
+        req.add_header('Authorization', f'Bearer {access_token}')
+        req.add_header('ConsistencyLevel', 'eventual')  # required for $search on directory objects
+        page = urlopen_json(req, 'graph')
+        
+        for group in page.get('value', []):
+            if group_matches_name(group, group_name):
+                yield classify_office365_group(group)
+        
+        url = page.get('@odata.nextLink')
+
 def search_onprem_ad_groups(group_name):
     """Search for distribution groups in on-premises AD via Systems Manager"""
     try:
@@ -248,10 +446,10 @@ def search_onprem_ad_groups(group_name):
         output = output_response.get('StandardOutputContent', '').strip()
         
         if output == "NO_GROUPS_FOUND":
-            print(f"🏢 No on-prem AD groups found matching '{group_name}'")
+            logger.info("🏢 No on-prem AD groups found matching '%s'", group_name)
             return []
         elif output.startswith("ERROR:"):
-            print(f"❌ AD search error: {output}")
+            logger.error('❌ AD search error: %s', output)
             return []
         else:
             # Parse JSON output
@@ -270,21 +468,21 @@ def search_onprem_ad_groups(group_name):
                     'location': 'onprem_ad'
                 })
             
-            print(f"🏢 Found {len(onprem_groups)} on-prem AD groups matching '{group_name}'")
+            logger.info("🏢 Found %s on-prem AD groups matching '%s'", len(onprem_groups), group_name)
             return onprem_groups
         
     except Exception as e:
-        print(f"❌ Error searching on-prem AD groups: {e}")
+        logger.error('❌ Error searching on-prem AD groups: %s', e)
         return []
 
 def find_distribution_group(group_name):
     """Search for distribution group in both Office 365 and on-prem AD, with Microsoft 365 Group detection"""
-    print(f"🔍 Searching for distribution group: {group_name}")
+    logger.info('🔍 Searching for distribution group: %s', group_name)
     
     # Get Office 365 access token
     access_token = get_graph_access_token()
     if not access_token:
-        print("❌ Failed to get Office 365 access token")
+        logger.error('❌ Failed to get Office 365 access token')
         return None
     
     # Search Office 365 first (including Microsoft 365 Groups for detection)
@@ -294,7 +492,7 @@ def find_distribution_group(group_name):
     microsoft365_groups = [g for g in o365_groups if g['groupType'] == 'microsoft365']
     if microsoft365_groups:
         group = microsoft365_groups[0]
-        print(f"⚠️ Found Microsoft 365 Group: {group['displayName']} ({group.get('mail', 'No email')})")
+        logger.warning('⚠️ Found Microsoft 365 Group: %s (%s)', group['displayName'], group.get('mail', 'No email'))
         # Return special indicator for Microsoft 365 Group
         return {
             'Name': group['displayName'],
@@ -314,46 +512,39 @@ def find_distribution_group(group_name):
     all_groups = supported_groups + onprem_groups
     
     if not all_groups:
-        print(f"❌ No distribution groups found for '{group_name}'")
+        logger.warning("❌ No distribution groups found for '%s'", group_name)
         return None
     
     # Return the first match (Office 365 preferred)
     group = all_groups[0]
-    print(f"✅ Found group: {group}")
+    logger.info('✅ Found group: %s', group)
     return group
 
-def add_user_to_exchange_online_group(group_name, user_email):
-    """Add user to Exchange Online distribution group via PowerShell with service account"""
+def add_user_to_exchange_online_group(group, user_email):
+    """Add user to Exchange Online distribution group via PowerShell with service account
+    
+    group is the group find_distribution_group already resolved, so its mail is used as is.
+    """
     try:
         ssm = boto3.client('ssm', region_name='us-east-1')
+        group_email = group.get('mail') or group['displayName']
         
-        # Get the group email address first
-        access_token = get_graph_access_token()
-        if access_token:
-            # Search for the group to get its email address
-            filter_param = f"displayName eq '{group_name}'"
-            encoded_filter = urllib.parse.quote(filter_param)
-            search_url = f"https://graph.microsoft.com/v1.0/groups?$filter={encoded_filter}"
-            
-            req = urllib.request.Request(search_url)
-            req.add_header('Authorization', f'Bearer {access_token}')
-            
-            try:
-                with urllib.request.urlopen(req) as response:
-                    result = json.loads(response.read().decode())
-                    groups = result.get('value', [])
-                    
-                    if groups:
-                        group_email = groups[0].get('mail', group_name)
-                        print(f"🔍 Using group email: {group_email} for display name: {group_name}")
-                    else:
-                        group_email = group_name
-                        print(f"⚠️ Group not found, using original name: {group_name}")
-            except Exception as e:
-                print(f"⚠️ Error getting group email, using display name: {e}")
-                group_email = group_name
+        # The member's primary address comes from the mirror; Graph is only asked when it has no entry
+        user = find_mirror_user(user_email)
+        if user:
+            primary_email = mirror_user_email(user)
         else:
-            group_email = group_name
+            access_token = get_graph_access_token()
+            found = lookup_graph_users(access_token, [user_email])[user_email] if access_token else {}
+            if found.get('error'):
+                logger.error('❌ Could not verify %s in Entra ID (Graph status %s)', user_email, found['error'])
+                return False
+            primary_email = found.get('mail')
+            if found and not found.get('found'):
+                logger.warning('⚠️ %s not found in Entra ID, continuing with Exchange lookup', user_email)
+        if primary_email and primary_email.lower() != user_email.lower():
+            logger.info('🔍 Using primary address %s for %s', primary_email, user_email)
+            user_email = primary_email
         
         # First check if user is already a member - USE GROUP EMAIL
         check_command = f"""
@@ -399,20 +590,20 @@ def add_user_to_exchange_online_group(group_name, user_email):
                 time.sleep(5)
                 continue
             else:
-                print(f"❌ Command failed with status: {status}")
+                logger.error('❌ Command failed with status: %s', status)
                 return False
         
         output = output_response.get('StandardOutputContent', '').strip()
-        print(f"🔍 Membership check result: {output}")
+        logger.info('🔍 Membership check result: %s', output)
         
         if output.startswith("ALREADY_MEMBER:"):
-            print(f"✅ {output}")
+            logger.info('✅ %s', output)
             return "already_member"
         elif output.startswith("NOT_MEMBER:"):
-            print(f"📝 {output}")
+            logger.info('📝 %s', output)
             # Continue to add user
         else:
-            print(f"❌ Membership check failed: {output}")
+            logger.error('❌ Membership check failed: %s', output)
             return False
         
         # PowerShell command for Exchange Online with certificate auth
@@ -456,24 +647,24 @@ def add_user_to_exchange_online_group(group_name, user_email):
                 time.sleep(5)
                 continue
             else:
-                print(f"❌ Add command failed with status: {status}")
+                logger.error('❌ Add command failed with status: %s', status)
                 return False
         
         output = output_response.get('StandardOutputContent', '').strip()
         error_output = output_response.get('StandardErrorContent', '').strip()
-        print(f"🔍 Add operation result: {output}")
+        logger.info('🔍 Add operation result: %s', output)
         if error_output:
-            print(f"🔍 Error output: {error_output}")
+            logger.error('🔍 Error output: %s', error_output)
         
         if output.startswith("SUCCESS:"):
-            print(f"✅ {output}")
+            logger.info('✅ %s', output)
             return True
         else:
-            print(f"❌ Exchange Online PowerShell failed: {output}")
+            logger.error('❌ Exchange Online PowerShell failed: %s', output)
             return False
         
     except Exception as e:
-        print(f"❌ Error with Exchange Online PowerShell: {e}")
+        logger.error('❌ Error with Exchange Online PowerShell: %s', e)
         return False
 
 def check_onprem_membership(group_name, user_email):
@@ -523,20 +714,20 @@ def check_onprem_membership(group_name, user_email):
         output = output_response.get('StandardOutputContent', '').strip()
         
         if output.startswith("ALREADY_MEMBER:"):
-            print(f"✅ {output}")
+            logger.info('✅ %s', output)
             return True
         elif output.startswith("NOT_MEMBER:"):
-            print(f"📝 {output}")
+            logger.info('📝 %s', output)
             return False
         elif "Cannot find an object with identity" in output:
-            print(f"🚫 Group not found in on-prem AD: {output}")
+            logger.info('🚫 Group not found in on-prem AD: %s', output)
             return None  # Group doesn't exist
         else:
-            print(f"❌ Membership check failed: {output}")
+            logger.error('❌ Membership check failed: %s', output)
             return False
         
     except Exception as e:
-        print(f"❌ Error checking on-prem membership: {e}")
+        logger.error('❌ Error checking on-prem membership: %s', e)
         return False
 
 def add_user_to_onprem_group(group_name, user_email):
@@ -578,19 +769,19 @@ def add_user_to_onprem_group(group_name, user_email):
         output = output_response.get('StandardOutputContent', '').strip()
         
         if output.startswith("SUCCESS:"):
-            print(f"✅ {output}")
+            logger.info('✅ %s', output)
             return True
         else:
-            print(f"❌ Failed to add user: {output}")
+            logger.error('❌ Failed to add user: %s', output)
             return False
         
     except Exception as e:
-        print(f"❌ Error adding user to on-prem group: {e}")
+        logger.error('❌ Error adding user to on-prem group: %s', e)
         return False
 
 def add_user_to_distribution_group(user_email, group_name):
     """Add user to distribution group (searches both locations and checks membership)"""
-    print(f"🎯 Adding {user_email} to {group_name}")
+    logger.info('🎯 Adding %s to %s', user_email, group_name)
     
     # Find the group
     group = find_distribution_group(group_name)
@@ -611,26 +802,26 @@ def add_user_to_distribution_group(user_email, group_name):
     if group['location'] == 'office365':
         # Special handling for distribution lists - check location and be honest
         if group.get('groupType') == 'distribution':
-            print(f"📧 Distribution list detected: {group_name}")
+            logger.info('📧 Distribution list detected: %s', group_name)
             
             # Check if this is Office 365 only or also exists on-premises
             if group.get('location') == 'office365':
-                print(f"☁️ This is an Office 365-only distribution list")
+                logger.info('☁️ This is an Office 365-only distribution list')
                 
                 # Check if it also exists on-premises
                 onprem_exists = check_onprem_membership(group_name, user_email) is not None
                 
                 if onprem_exists:
-                    print(f"🏢 Group also exists on-premises, trying AD method")
+                    logger.info('🏢 Group also exists on-premises, trying AD method')
                     success = add_user_to_onprem_group(group_name, user_email)
                     if success:
                         return True, f"Successfully added {user_email} to distribution list {group_name} via on-premises AD"
                     else:
                         return False, f"Failed to add {user_email} to distribution list {group_name} via on-premises AD"
                 else:
-                    print(f"☁️ Office 365-only distribution list - using Exchange Online PowerShell")
+                    logger.info('☁️ Office 365-only distribution list - using Exchange Online PowerShell')
                     # Use Exchange Online PowerShell via domain controller
-                    success = add_user_to_exchange_online_group(group['mail'], user_email)
+                    success = add_user_to_exchange_online_group(group, user_email)
                     if success == "already_member":
                         return True, f"{user_email} already has access to {group_name}"
                     elif success:
@@ -659,10 +850,19 @@ def add_user_to_shared_mailbox(user_email, mailbox_email):
 
 def lambda_handler(event, context):
     """Lambda handler for group management operations"""
-    print(f"🔍 DEBUG: Received event: {json.dumps(event)}")
+    logger.begin(context, route=event.get('action'))
+    set_invocation_deadline(context)
+    try:
+        return handle_action(event, context)
+    finally:
+        emit_retry_metrics()
+
+def handle_action(event, context):
+    """Dispatch a connector action"""
+    logger.debug('🔍 Received event', event=event)
     
     action = event.get('action')
-    print(f"🔍 DEBUG: Action = {action}")
+    logger.debug('🔍 Action = %s', action)
     
     if action == 'add_user_to_group':
         # Support both user_emails (array) and user_email (string) for backwards compatibility
@@ -694,6 +894,30 @@ def lambda_handler(event, context):
             })
         }
     
+    elif action == 'resolve_users':
+        # Verify a list of candidate addresses (e.g. parsed "add alex and chris") in one round trip
+        user_emails = [e for e in event.get('user_emails', []) if e]
+        access_token = get_graph_access_token() if user_emails else None
+        users = lookup_graph_users(access_token, user_emails) if access_token else {}
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'users': users})
+        }
+    
+    elif action == 'sync_directory_mirror':
+        # Triggered on a schedule by EventBridge
+        mirror = sync_directory_mirror()
+        
+        return {
+            'statusCode': 200 if mirror else 500,
+            'body': json.dumps({
+                'synced': mirror is not None,
+                'groups': len(mirror['groups']) if mirror else 0,
+                'users': len(mirror['users']) if mirror else 0
+            })
+        }
+    
     elif action == 'search_mailbox':
         mailbox_name = event.get('mailbox_name')
         
@@ -754,7 +978,7 @@ Disconnect-ExchangeOnline -Confirm:$false
                     })
                 }
         except Exception as e:
-            print(f"Error searching mailbox: {e}")
+            logger.error('Error searching mailbox: %s', e)
         
         return {
             'statusCode': 200,
@@ -789,7 +1013,7 @@ Disconnect-ExchangeOnline -Confirm:$false
         
         try:
             # Check existing permissions
-            print(f"🔍 Checking if {user_email} already has access to {mailbox_email}")
+            logger.info('🔍 Checking if %s already has access to %s', user_email, mailbox_email)
             response = ssm.send_command(
                 InstanceIds=[BESPIN_INSTANCE_ID],
                 DocumentName='AWS-RunPowerShellScript',
@@ -807,7 +1031,7 @@ Disconnect-ExchangeOnline -Confirm:$false
                 )
                 
                 status = result.get('Status')
-                print(f"📊 Check command status: {status}")
+                logger.info('📊 Check command status: %s', status)
                 
                 if status in ['Success', 'Failed']:
                     break
@@ -816,11 +1040,11 @@ Disconnect-ExchangeOnline -Confirm:$false
             
             output = result.get('StandardOutputContent', '')
             error = result.get('StandardErrorContent', '')
-            print(f"📋 Permission check output: {output}")
-            print(f"📋 Permission check error: {error}")
+            logger.info('📋 Permission check output: %s', output)
+            logger.info('📋 Permission check error: %s', error)
             
             if 'ALREADY_HAS_ACCESS' in output:
-                print(f"✅ User already has access")
+                logger.info('✅ User already has access')
                 
                 # Send IT channel notification
                 try:
@@ -838,10 +1062,10 @@ Disconnect-ExchangeOnline -Confirm:$false
                         data=json.dumps(slack_data).encode('utf-8'),
                         headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {SLACK_BOT_TOKEN}'}
                     )
-                    with urllib.request.urlopen(req) as response:
-                        print(f"📤 IT channel notification sent")
+                    urlopen_json(req, slack_rate_limit_api('chat.postMessage', IT_CHANNEL), idempotent=False)
+                    logger.info('📤 IT channel notification sent')
                 except Exception as e:
-                    print(f"⚠️ Failed to send IT channel notification: {e}")
+                    logger.error('⚠️ Failed to send IT channel notification: %s', e)
                 
                 return {
                     'statusCode': 200,
@@ -852,7 +1076,7 @@ Disconnect-ExchangeOnline -Confirm:$false
                 }
             
             # User doesn't have access, add them
-            print(f"➕ Adding {user_email} to {mailbox_email}")
+            logger.info('➕ Adding %s to %s', user_email, mailbox_email)
             add_script = f"""
 $AppId = 'c33fc45c-9313-4f45-ac31-baf568616137'
 $Organization = 'ever.ag'
@@ -895,10 +1119,10 @@ Disconnect-ExchangeOnline -Confirm:$false
                             data=json.dumps(slack_data).encode('utf-8'),
                             headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {SLACK_BOT_TOKEN}'}
                         )
-                        with urllib.request.urlopen(req) as response:
-                            print(f"📤 IT channel notification sent")
+                        urlopen_json(req, slack_rate_limit_api('chat.postMessage', IT_CHANNEL), idempotent=False)
+                        logger.info('📤 IT channel notification sent')
                     except Exception as e:
-                        print(f"⚠️ Failed to send IT channel notification: {e}")
+                        logger.error('⚠️ Failed to send IT channel notification: %s', e)
                     
                     return {
                         'statusCode': 200,
@@ -931,18 +1155,18 @@ Disconnect-ExchangeOnline -Confirm:$false
     elif action == 'execute':
         # Handle approval callback execution
         params = event.get('params', {})
-        print(f"🔍 DEBUG: Execute action - params = {json.dumps(params)}")
+        logger.debug('🔍 Execute action - params', params=params)
         
         # Check if this is a shared mailbox request
         if 'action' in params and params['action'] == 'add_user_to_shared_mailbox':
-            print(f"🔍 DEBUG: Detected shared mailbox request")
+            logger.debug('🔍 Detected shared mailbox request')
             # Support both user_emails (array) and user_email (string)
             user_email = params.get('user_emails', [None])[0] if params.get('user_emails') else params.get('user_email')
             mailbox_email = params.get('mailbox_email')
-            print(f"🔍 DEBUG: user_email={user_email}, mailbox_email={mailbox_email}")
+            logger.debug('🔍 user_email=%s, mailbox_email=%s', user_email, mailbox_email)
             
             # Call the existing shared mailbox handler
-            return lambda_handler({
+            return handle_action({
                 'action': 'add_user_to_shared_mailbox',
                 'user_email': user_email,
                 'mailbox_email': mailbox_email
@@ -998,17 +1222,17 @@ Disconnect-ExchangeOnline -Confirm:$false
                                     }
                                 })
                             )
-                            print(f"✅ Sent callback to it-helpdesk-bot for user {slack_context.get('user_id')}")
+                            logger.info('✅ Sent callback to it-helpdesk-bot for user %s', slack_context.get('user_id'))
                     except Exception as e:
-                        print(f"⚠️ Failed to send callback: {e}")
+                        logger.error('⚠️ Failed to send callback: %s', e)
                 elif channel and not success:
                     # Look up tracking record
-                    print(f"🔍 Looking up tracking for {user_email}")
+                    logger.info('🔍 Looking up tracking for %s', user_email)
                     tracking = lookup_tracking(user_email)
                     if tracking:
-                        print(f"✅ Found tracking: {tracking['interaction_id']}")
+                        logger.info('✅ Found tracking: %s', tracking['interaction_id'])
                     else:
-                        print(f"❌ No tracking found for {user_email}")
+                        logger.warning('❌ No tracking found for %s', user_email)
                     
                     # Send to user
                     user_msg = f"❌ **Request Failed**\n\nUnable to add you to **{group_name}**.\n\nError: {message}"
@@ -1016,7 +1240,7 @@ Disconnect-ExchangeOnline -Confirm:$false
                     
                     # Update conversation history
                     if tracking:
-                        print(f"📝 Updating conversation history")
+                        logger.info('📝 Updating conversation history')
                         update_conversation(tracking['interaction_id'], tracking['interaction_timestamp'], user_msg)
                     
                     # Post to IT channel
@@ -1098,13 +1322,13 @@ Disconnect-ExchangeOnline -Confirm:$false
         return {
             'statusCode': 400,
             'body': json.dumps({
-                'error': 'Invalid action. Use: add_user_to_group, search_group, or execute'
+                'error': 'Invalid action. Use: add_user_to_group, search_group, resolve_users, sync_directory_mirror, or execute'
             })
         }
 
 if __name__ == "__main__":
     # Test the functions
-    print("🧪 Testing Group Management System")
+    logger.info('🧪 Testing Group Management System')
     
     # Test search
     group = find_distribution_group("IT")
@@ -1112,4 +1336,4 @@ if __name__ == "__main__":
     # Test add user
     if group:
         success, message = add_user_to_distribution_group("matthew.denecke@ever.ag", "IT")
-        print(f"Add result: {success} - {message}")
+        logger.info('Add result: %s - %s', success, message)
@@ -0,0 +1,109 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+import boto3
+
+from structured_logger import get_logger
+
+# Entra ID delta mirror, shared by brie-infrastructure-connector (which keeps it
+# current with /groups/delta and /users/delta, see sync_directory_mirror) and
+# it-helpdesk-bot (which only reads it). Bundle this file next to the handler,
+# like structured_logger.py.
+# The snapshot is one gzipped JSON object in S3; each container keeps the parsed
+# copy, plus address and display-name indexes over its users, for
+# DIRECTORY_MIRROR_MAX_AGE_SECONDS.
+DIRECTORY_MIRROR_BUCKET = os.environ.get('DIRECTORY_MIRROR_BUCKET', 'brie-it-agent-cache')
+DIRECTORY_MIRROR_KEY = os.environ.get('DIRECTORY_MIRROR_KEY', 'directory/graph-mirror.json.gz')
+DIRECTORY_MIRROR_MAX_AGE_SECONDS = 900
+MIRROR_SELECT = {
+    'groups': 'displayName,mail,mailNickname,groupTypes,mailEnabled,securityEnabled',
+    'users': 'displayName,mail,userPrincipalName,proxyAddresses'
+}
+
+directory_mirror_cache = {'mirror': None, 'index': None, 'loaded_at': 0}
+directory_mirror_lock = threading.Lock()
+
+def index_mirror_users(mirror):
+    """{'by_address': {address: user}, 'by_name': {display name: [user, ...]}}, all keys lowercase"""
+    by_address, by_name = {}, {}
+    for user in (mirror or {}).get('users', {}).values():
+        addresses = [user.get('mail'), user.get('userPrincipalName')]
+        addresses += [address.split(':', 1)[-1] for address in user.get('proxyAddresses') or []]
+        for address in addresses:
+            if address:
+                by_address.setdefault(address.lower(), user)
+        name = (user.get('displayName') or '').lower().strip()
+        if name:
+            by_name.setdefault(name, []).append(user)
+    return {'by_address': by_address, 'by_name': by_name}
+
+def remember_directory_mirror(mirror):
+    with directory_mirror_lock:
+        directory_mirror_cache.update(mirror=mirror, index=index_mirror_users(mirror), loaded_at=time.time())
+
+def load_directory_mirror(force=False):
+    """Load the mirror snapshot from S3, reusing the in-memory copy while it is fresh"""
+    with directory_mirror_lock:
+        if not force and directory_mirror_cache['loaded_at'] and \
+                time.time() - directory_mirror_cache['loaded_at'] < DIRECTORY_MIRROR_MAX_AGE_SECONDS:
+            return directory_mirror_cache['mirror']
+    
+    try:
+        s3 = boto3.client('s3')
+        obj = s3.get_object(Bucket=DIRECTORY_MIRROR_BUCKET, Key=DIRECTORY_MIRROR_KEY)
+        mirror = json.loads(gzip.decompress(obj['Body'].read()).decode('utf-8'))
+        get_logger().info('🪞 Loaded directory mirror: %s groups, %s users', len(mirror.get('groups', {})), len(mirror.get('users', {})))
+    except Exception as e:
+        get_logger().warning('⚠️ Directory mirror unavailable: %s', e)
+        mirror = None
+    
+    remember_directory_mirror(mirror)
+    return mirror
+
+def save_directory_mirror(mirror):
+    """Write the mirror snapshot back to S3 as compact gzipped JSON"""
+    s3 = boto3.client('s3')
+    body = gzip.compress(json.dumps(mirror, separators=(',', ':')).encode('utf-8'))
+    s3.put_object(Bucket=DIRECTORY_MIRROR_BUCKET, Key=DIRECTORY_MIRROR_KEY, Body=body, ContentType='application/json', ContentEncoding='gzip')
+    remember_directory_mirror(mirror)
+    get_logger().info('💾 Saved directory mirror: %s groups, %s users (%s bytes)', len(mirror['groups']), len(mirror['users']), len(body))
+
+def group_matches_name(group, group_name):
+    """Case-insensitive match: email/dl_ prefixes match mail or mailNickname, anything else must be exact"""
+    name = group_name.lower()
+    if '@' in name or name.startswith('dl_'):
+        prefix = name.split('@')[0]
+        return any((group.get(field) or '').lower().startswith(prefix) for field in ('mail', 'mailNickname'))
+    return (group.get('displayName') or '').lower() == name or (group.get('mailNickname') or '').lower() == name
+
+def search_mirror_groups(group_name):
+    """Match groups in the mirror the same way search_office365_groups filters Graph.
+    
+    Returns None when no mirror is loaded so callers know to fall back to Graph.
+    """
+    mirror = load_directory_mirror()
+    if not mirror or not mirror.get('groups'):
+        return None
+    
+    return [group for group in mirror['groups'].values() if group_matches_name(group, group_name)]
+
+def find_mirror_user(name_or_email):
+    """Find a user in the mirror by mail, UPN, proxy address or display name (None if unknown or ambiguous)"""
+    if not name_or_email or not load_directory_mirror():
+        return None
+    index = directory_mirror_cache['index']
+    needle = name_or_email.lower().strip()
+    if needle in index['by_address']:
+        return index['by_address'][needle]
+    matches = index['by_name'].get(needle, [])
+    if len(matches) == 1:
+        return matches[0]
+    # Several people share the name - prefer the @ever.ag account if there is exactly one
+    ever_ag = [user for user in matches if mirror_user_email(user).lower().endswith('@ever.ag')]
+    return ever_ag[0] if len(ever_ag) == 1 else None
+
+def mirror_user_email(user):
+    return user.get('mail') or user.get('userPrincipalName') or ''
@@ -11,6 +11,7 @@ import urllib.parse
 from datetime import datetime, timedelta
 import os
 from decimal import Decimal
+from structured_logger import get_logger
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -18,6 +19,8 @@ class DecimalEncoder(json.JSONEncoder):
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+logger = get_logger('it-approval-system')
+
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb')
 lambda_client = boto3.client('lambda')
@@ -31,13 +34,13 @@ try:
     approvals_table = dynamodb.Table('it-approvals')
 except:
     approvals_table = None
-    print("⚠️ IT approvals table not available")
+    logger.warning('⚠️ IT approvals table not available')
 
 def process_approval_response(approval_id, action, approver):
     """Process approval/denial response from Slack buttons"""
     
     if not approvals_table:
-        print("❌ Approvals table not available")
+        logger.error('❌ Approvals table not available')
         return False
     
     try:
@@ -45,14 +48,14 @@ def process_approval_response(approval_id, action, approver):
         response = approvals_table.get_item(Key={'approval_id': approval_id})
         
         if 'Item' not in response:
-            print(f"❌ Approval request not found: {approval_id}")
+            logger.error('❌ Approval request not found: %s', approval_id)
             return False
         
         approval = response['Item']
         
         # Check if already processed
         if approval['status'] != 'pending':
-            print(f"⚠️ Approval already processed: {approval_id} - {approval['status']}")
+            logger.warning('⚠️ Approval already processed: %s - %s', approval_id, approval['status'])
             return False
         
         # Update approval status
@@ -69,7 +72,7 @@ def process_approval_response(approval_id, action, approver):
             }
         )
         
-        print(f"✅ Approval {new_status}: {approval_id} by {approver}")
+        logger.info('✅ Approval %s: %s by %s', new_status, approval_id, approver)
         
         # Send confirmation to Slack
         status_emoji = "✅" if new_status == 'approved' else "❌"
@@ -89,9 +92,9 @@ def process_approval_response(approval_id, action, approver):
         
         try:
             with urllib.request.urlopen(req) as response:
-                print(f"📧 Confirmation sent to Slack")
+                logger.info('📧 Confirmation sent to Slack')
         except Exception as e:
-            print(f"⚠️ Error sending confirmation: {e}")
+            logger.warning('⚠️ Error sending confirmation: %s', e)
         
         # Handle approval/denial
         if new_status == 'denied':
@@ -117,9 +120,9 @@ Brie IT Agent"""
                         approval['original_message_id']
                     )
                     if success:
-                        print(f"📧 Denial reply sent to {approval['requester']} for {approval_id}")
+                        logger.info('📧 Denial reply sent to %s for %s', approval['requester'], approval_id)
             except Exception as e:
-                print(f"❌ Error sending denial reply: {e}")
+                logger.error('❌ Error sending denial reply: %s', e)
         
         elif new_status == 'approved' and approval.get('callback_function'):
             # Execute callback and wait for result
@@ -144,7 +147,7 @@ Brie IT Agent"""
                 
                 # Parse the response
                 response_payload = json.loads(response['Payload'].read())
-                print(f"🔍 Callback response: {response_payload}")
+                logger.debug('🔍 Callback response: %s', response_payload)
                 
                 # Extract the actual result
                 if response_payload.get('statusCode') == 200:
@@ -164,10 +167,10 @@ Brie IT Agent"""
                     message
                 )
                 
-                print(f"📧 Execution result email sent: {success} - {message}")
+                logger.info('📧 Execution result email sent: %s - %s', success, message)
                 
             except Exception as e:
-                print(f"❌ Error executing callback: {e}")
+                logger.error('❌ Error executing callback: %s', e)
                 # Send failure email
                 send_execution_result_email(
                     approval['original_message_id'],
@@ -180,7 +183,7 @@ Brie IT Agent"""
         return True
         
     except Exception as e:
-        print(f"❌ Error processing approval response: {e}")
+        logger.error('❌ Error processing approval response: %s', e)
         return False
 
 def send_execution_result_email(original_message_id, original_subject, requester_email, success, message):
@@ -241,11 +244,11 @@ Automated IT Support System"""
             Payload=json.dumps(email_payload, cls=DecimalEncoder)
         )
         
-        print(f"📧 Execution result email queued for {requester_email}")
+        logger.info('📧 Execution result email queued for %s', requester_email)
         return True
                 
     except Exception as e:
-        print(f"❌ Error sending execution result email: {e}")
+        logger.error('❌ Error sending execution result email: %s', e)
         return False
 
 def get_access_token():
@@ -286,7 +289,7 @@ def send_email_reply_via_graph(access_token, to_email, original_subject, body, o
     MAILBOX_EMAIL = "brieitagent@ever.ag"
     
     if TESTING_MODE:
-        print(f"🧪 TESTING MODE: Redirecting email from {to_email} to {TEST_EMAIL}")
+        logger.info('🧪 TESTING MODE: Redirecting email from %s to %s', to_email, TEST_EMAIL)
         to_email = TEST_EMAIL
     
     try:
@@ -316,14 +319,14 @@ def send_email_reply_via_graph(access_token, to_email, original_subject, body, o
         
         with urllib.request.urlopen(req) as response:
             if response.status == 202:
-                print(f"✅ Email sent successfully to {to_email}")
+                logger.info('✅ Email sent successfully to %s', to_email)
                 return True
             else:
-                print(f"❌ Email reply failed with status: {response.status}")
+                logger.error('❌ Email reply failed with status: %s', response.status)
                 return False
                 
     except Exception as e:
-        print(f"❌ Error sending email reply: {e}")
+        logger.error('❌ Error sending email reply: %s', e)
         return False
 
 def send_slack_approval_with_buttons(approval_id, request_type, details, requester, urgency="normal", ticket_number=None, ticket_url=None, callback_params=None):
@@ -455,14 +458,14 @@ def send_slack_approval_with_buttons(approval_id, request_type, details, request
             result = json.loads(response.read().decode())
             
             if result.get('ok'):
-                print(f"📧 Approval request sent to Slack: {approval_id}")
+                logger.info('📧 Approval request sent to Slack: %s', approval_id)
                 return True
             else:
-                print(f"❌ Slack API error: {result.get('error', 'Unknown error')}")
+                logger.error('❌ Slack API error: %s', result.get('error', 'Unknown error'))
                 return False
         
     except Exception as e:
-        print(f"❌ Error sending Slack approval: {e}")
+        logger.error('❌ Error sending Slack approval: %s', e)
         return False
 
 def create_approval_request(request_type, details, requester, callback_function=None, callback_params=None, urgency="normal", ticket_number=None, ticket_url=None, original_message_id=None, original_subject=None):
@@ -493,9 +496,9 @@ def create_approval_request(request_type, details, requester, callback_function=
     if approvals_table:
         try:
             approvals_table.put_item(Item=approval_record)
-            print(f"✅ Approval request created: {approval_id}")
+            logger.info('✅ Approval request created: %s', approval_id)
         except Exception as e:
-            print(f"❌ Error storing approval request: {e}")
+            logger.error('❌ Error storing approval request: %s', e)
             return None
     
     # Send to Slack with buttons
@@ -506,52 +509,51 @@ def create_approval_request(request_type, details, requester, callback_function=
 
 def handle_slack_interaction(event, context):
     """Handle Slack button interactions"""
-    print(f"🔔 BUTTON HANDLER INVOKED - Event keys: {list(event.keys())}")
+    logger.debug('🔔 BUTTON HANDLER INVOKED - Event keys: %s', list(event.keys()))
     try:
         body = event.get('body', '')
-        print(f"📦 Body length: {len(body)}")
+        logger.debug('📦 Body length: %s', len(body))
         parsed_data = urllib.parse.parse_qs(body)
-        print(f"📦 Parsed data keys: {list(parsed_data.keys())}")
+        logger.debug('📦 Parsed data keys: %s', list(parsed_data.keys()))
         
         if 'payload' in parsed_data:
             payload = json.loads(parsed_data['payload'][0])
-            print(f"📦 Payload type: {payload.get('type')}")
+            logger.debug('📦 Payload type: %s', payload.get('type'))
             
             if payload.get('type') == 'block_actions':
                 action = payload['actions'][0]['action_id']
                 user = payload['user']['username']
-                print(f"🔘 Button clicked: {action} by {user}")
+                logger.info('🔘 Button clicked: %s by %s', action, user)
                 
                 if action.startswith('approve_'):
                     approval_id = action.replace('approve_', '')
-                    print(f"✅ APPROVING: {approval_id}")
+                    logger.info('✅ APPROVING: %s', approval_id)
                     process_approval_response(approval_id, 'approved', user)
                     return {'statusCode': 200, 'body': json.dumps({'message': 'Approved'})}
                 elif action.startswith('deny_'):
                     approval_id = action.replace('deny_', '')
-                    print(f"❌ DENYING: {approval_id}")
+                    logger.info('❌ DENYING: %s', approval_id)
                     process_approval_response(approval_id, 'denied', user)
                     return {'statusCode': 200, 'body': json.dumps({'message': 'Denied'})}
         else:
-            print(f"⚠️ No payload in parsed data")
+            logger.warning('⚠️ No payload in parsed data')
         
         return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid request'})}
     except Exception as e:
-        print(f"❌ Error handling interaction: {e}")
+        logger.error('❌ Error handling interaction: %s', e)
         import traceback
-        print(f"❌ Traceback: {traceback.format_exc()}")
+        logger.error('❌ Traceback: %s', traceback.format_exc())
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
 
 
 def lambda_handler(event, context):
     """Main Lambda handler for IT Approval System"""
-    print(f"🚀 LAMBDA INVOKED - Event keys: {list(event.keys())}")
-    print(f"🚀 Has httpMethod: {'httpMethod' in event}")
-    print(f"🚀 Action: {event.get('action', 'NONE')}")
+    logger.begin(context, route=event.get('action') or ('slack' if 'httpMethod' in event else None))
+    logger.debug('Received event', event=event)
     
     # Handle API Gateway events (Slack button clicks)
     if 'httpMethod' in event:
-        print(f"🌐 Routing to handle_slack_interaction")
+        logger.debug('🌐 Routing to handle_slack_interaction')
         return handle_slack_interaction(event, context)
     
     action = event.get('action')
@@ -0,0 +1 @@
+../api_retry.py
\ No newline at end of file
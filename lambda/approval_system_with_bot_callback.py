@@ -11,6 +11,7 @@ import urllib.parse
 from datetime import datetime, timedelta
 import os
 from decimal import Decimal
+from structured_logger import get_logger
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -22,12 +23,14 @@ class DecimalEncoder(json.JSONEncoder):
 dynamodb = boto3.resource('dynamodb')
 lambda_client = boto3.client('lambda')
 
+logger = get_logger('it-approval-system')
+
 # DynamoDB table
 approvals_table = None
 try:
     approvals_table = dynamodb.Table('it-approvals')
 except Exception as e:
-    print(f"Warning: Could not connect to DynamoDB table: {e}")
+    logger.warning('Warning: Could not connect to DynamoDB table: %s', e)
 
 # Slack configuration
 SLACK_BOT_TOKEN = os.environ.get('SLACK_BOT_TOKEN')
@@ -61,7 +64,7 @@ def notify_bot_approval_processed(approval_id, status, result_message, slack_con
                 'action_taken': 'Already a member' if 'already a member' in result_message.lower() else 'Added to group'
             })
         
-        print(f"🔔 Notifying bot of approval {approval_id} status: {status}")
+        logger.info('🔔 Notifying bot of approval %s status: %s', approval_id, status)
         
         response = lambda_client.invoke(
             FunctionName='it-helpdesk-bot',
@@ -69,18 +72,18 @@ def notify_bot_approval_processed(approval_id, status, result_message, slack_con
             Payload=json.dumps(callback_payload, cls=DecimalEncoder)
         )
         
-        print(f"✅ Bot notification sent for approval {approval_id}")
+        logger.info('✅ Bot notification sent for approval %s', approval_id)
         return True
         
     except Exception as e:
-        print(f"❌ Failed to notify bot: {str(e)}")
+        logger.error('❌ Failed to notify bot: %s', str(e))
         return False
 
 def process_approval_response(approval_id, action, approver):
     """Process approval or denial response"""
     
     if not approvals_table:
-        print("❌ No DynamoDB table available")
+        logger.error('❌ No DynamoDB table available')
         return False
     
     try:
@@ -88,7 +91,7 @@ def process_approval_response(approval_id, action, approver):
         response = approvals_table.get_item(Key={'approval_id': approval_id})
         
         if 'Item' not in response:
-            print(f"❌ Approval {approval_id} not found")
+            logger.error('❌ Approval %s not found', approval_id)
             return False
         
         approval = response['Item']
@@ -107,7 +110,7 @@ def process_approval_response(approval_id, action, approver):
             }
         )
         
-        print(f"✅ Approval {new_status}: {approval_id} by {approver}")
+        logger.info('✅ Approval %s: %s by %s', new_status, approval_id, approver)
         
         # Send confirmation to Slack
         send_slack_confirmation(approval_id, new_status, approver, approval.get('request_type', 'Unknown'))
@@ -150,7 +153,7 @@ def process_approval_response(approval_id, action, approver):
                 
                 # Parse the response
                 response_payload = json.loads(response['Payload'].read())
-                print(f"🔍 Callback response: {response_payload}")
+                logger.info('🔍 Callback response: %s', response_payload)
                 
                 # Extract the actual result - handle both formats
                 if response_payload.get('statusCode') == 200:
@@ -178,7 +181,7 @@ def process_approval_response(approval_id, action, approver):
                     message
                 )
                 
-                print(f"📧 Execution result email sent: {success} - {message}")
+                logger.info('📧 Execution result email sent: %s - %s', success, message)
                 
                 # Extract resource data and slack context based on request type
                 request_data = {}
@@ -213,7 +216,7 @@ def process_approval_response(approval_id, action, approver):
                 )
                 
             except Exception as e:
-                print(f"❌ Error executing callback: {e}")
+                logger.error('❌ Error executing callback: %s', e)
                 result_message = f"System error during execution: {str(e)}"
                 
                 # Send failure email
@@ -258,7 +261,7 @@ def process_approval_response(approval_id, action, approver):
         return True
         
     except Exception as e:
-        print(f"❌ Error processing approval response: {e}")
+        logger.error('❌ Error processing approval response: %s', e)
         return False
 
 def send_slack_confirmation(approval_id, status, approver, request_type):
@@ -285,14 +288,14 @@ def send_slack_confirmation(approval_id, status, approver, request_type):
         with urllib.request.urlopen(req) as response:
             result = json.loads(response.read().decode('utf-8'))
             if result.get('ok'):
-                print("📧 Confirmation sent to Slack")
+                logger.info('📧 Confirmation sent to Slack')
                 return True
             else:
-                print(f"❌ Slack error: {result.get('error')}")
+                logger.error('❌ Slack error: %s', result.get('error'))
                 return False
                 
     except Exception as e:
-        print(f"❌ Error sending Slack confirmation: {e}")
+        logger.error('❌ Error sending Slack confirmation: %s', e)
         return False
 
 def send_execution_result_email(original_message_id, original_subject, requester_email, success, message):
@@ -323,10 +326,10 @@ Please contact IT support for assistance.
 """
         
         # Queue email for sending
-        print(f"📧 Execution result email queued for {requester_email}")
+        logger.info('📧 Execution result email queued for %s', requester_email)
         
     except Exception as e:
-        print(f"❌ Error sending email reply: {e}")
+        logger.error('❌ Error sending email reply: %s', e)
         return False
 
 def send_slack_approval_with_buttons(approval_id, request_type, details, requester, urgency="normal", ticket_number=None, ticket_url=None, callback_params=None):
@@ -481,14 +484,14 @@ def send_slack_approval_with_buttons(approval_id, request_type, details, request
         with urllib.request.urlopen(req) as response:
             result = json.loads(response.read().decode('utf-8'))
             if result.get('ok'):
-                print(f"📧 Approval request sent to Slack: {approval_id}")
+                logger.info('📧 Approval request sent to Slack: %s', approval_id)
                 return True
             else:
-                print(f"❌ Slack error: {result.get('error')}")
+                logger.error('❌ Slack error: %s', result.get('error'))
                 return False
         
     except Exception as e:
-        print(f"❌ Error sending Slack approval: {e}")
+        logger.error('❌ Error sending Slack approval: %s', e)
         return False
 
 def create_approval_request(request_type, details, requester, callback_function=None, callback_params=None, urgency="normal", ticket_number=None, ticket_url=None, original_message_id=None, original_subject=None):
@@ -519,9 +522,9 @@ def create_approval_request(request_type, details, requester, callback_function=
     if approvals_table:
         try:
             approvals_table.put_item(Item=approval_record)
-            print(f"✅ Approval request created: {approval_id}")
+            logger.info('✅ Approval request created: %s', approval_id)
         except Exception as e:
-            print(f"❌ Error storing approval request: {e}")
+            logger.error('❌ Error storing approval request: %s', e)
             return None
     
     # Send to Slack with buttons
@@ -545,7 +548,7 @@ def handle_slack_interaction(event, context):
                 
                 if action.startswith('approve_'):
                     approval_id = action.replace('approve_', '')
-                    print(f"🔘 Button action: {action} by {user} - APPROVING")
+                    logger.info('🔘 Button action: %s by %s - APPROVING', action, user)
                     
                     if process_approval_response(approval_id, 'APPROVE', user):
                         return {
@@ -560,7 +563,7 @@ def handle_slack_interaction(event, context):
                 
                 elif action.startswith('deny_'):
                     approval_id = action.replace('deny_', '')
-                    print(f"🔘 Button action: {action} by {user} - DENYING")
+                    logger.info('🔘 Button action: %s by %s - DENYING', action, user)
                     
                     if process_approval_response(approval_id, 'DENY', user):
                         return {
@@ -579,7 +582,7 @@ def handle_slack_interaction(event, context):
         }
         
     except Exception as e:
-        print(f"❌ Error handling Slack interaction: {e}")
+        logger.error('❌ Error handling Slack interaction: %s', e)
         return {
             'statusCode': 500,
             'body': json.dumps({'text': 'Error processing request'})
@@ -588,7 +591,8 @@ def handle_slack_interaction(event, context):
 def lambda_handler(event, context):
     """Main Lambda handler"""
     
-    print(f"Received event: {json.dumps(event)}")
+    logger.begin(context, route=event.get('action') or ('slack' if 'body' in event else None))
+    logger.debug('Received event', event=event)
     
     # Handle Slack webhook interactions FIRST
     if event.get('httpMethod') == 'POST' and 'body' in event:
@@ -0,0 +1 @@
+../directory_mirror.py
\ No newline at end of file
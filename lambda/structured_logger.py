@@ -0,0 +1 @@
+../structured_logger.py
\ No newline at end of file
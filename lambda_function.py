@@ -4,22 +4,67 @@ import os
 import time
 from datetime import datetime, timedelta
 from decimal import Decimal
-import random
+import re
+import threading
 import urllib.request
 import urllib.parse
 import base64
+import hashlib
+import hmac
+import math
+import gzip
+import io
+from html.parser import HTMLParser
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 from email import encoders
 import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from botocore.config import Config
+from structured_logger import get_logger
+from directory_mirror import find_mirror_user, mirror_user_email
+from api_retry import (
+    SLACK_NON_IDEMPOTENT_METHODS, RateLimitedError, call_with_retry, emit_retry_metrics,
+    invocation_deadline, set_invocation_deadline, slack_rate_limit_api, time_remaining
+)
+
+# Optional: Pillow (Lambda layer) lets screenshots be downscaled before vision calls
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
 # Initialize AWS services
 dynamodb = boto3.resource('dynamodb')
 ses = boto3.client('ses')
-bedrock = boto3.client('bedrock-runtime')
+# Bedrock: fail fast on connect, a pool big enough for the worker threads, and no
+# botocore retries - call_with_retry paces and retries Bedrock calls within the
+# invocation deadline. The read timeout (the wait for a response, or between streamed
+# chunks) is capped by the time left, so there is one client per timeout step.
+BEDROCK_CONNECT_TIMEOUT = float(os.environ.get('BEDROCK_CONNECT_TIMEOUT', '3'))
+BEDROCK_READ_TIMEOUT = float(os.environ.get('BEDROCK_READ_TIMEOUT', '30'))
+BEDROCK_READ_TIMEOUT_STEP = 5
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.environ.get('BEDROCK_MAX_POOL_CONNECTIONS', '20'))
+bedrock_clients = {}  # {read timeout: client}
+bedrock_clients_lock = threading.Lock()
+
+def get_bedrock_client(read_timeout=BEDROCK_READ_TIMEOUT):
+    with bedrock_clients_lock:
+        if read_timeout not in bedrock_clients:
+            bedrock_clients[read_timeout] = boto3.client('bedrock-runtime', config=Config(
+                connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+                read_timeout=read_timeout,
+                retries={'mode': 'standard', 'total_max_attempts': 1},
+                max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS
+            ))
+        return bedrock_clients[read_timeout]
+
 sfn_client = boto3.client('stepfunctions')
 
+logger = get_logger('brie-it-helpdesk-bot')
+
 # Helper to convert Decimal to int/float for JSON serialization
 def decimal_to_number(obj):
     if isinstance(obj, Decimal):
@@ -43,14 +88,14 @@ def get_or_create_conversation(user_id, user_name, message_text):
         )
         
         items = response.get('Items', [])
-        print(f"DEBUG: Found {len(items)} conversations within timeout window")
+        logger.debug('Found %s conversations within timeout window', len(items))
         if items:
             items.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
             active = items[0]
-            print(f"DEBUG: Most recent conversation - ID: {active.get('interaction_id')}, Outcome: {active.get('outcome')}, Timestamp: {active.get('timestamp')}")
+            logger.debug('Most recent conversation - ID: %s, Outcome: %s, Timestamp: %s', active.get('interaction_id'), active.get('outcome'), active.get('timestamp'))
             # Check if conversation is still active (outcome is "In Progress")
             if active.get('outcome') == 'In Progress' and not active.get('awaiting_approval'):
-                print(f"DEBUG: Returning active In Progress conversation")
+                logger.debug('Returning active In Progress conversation')
                 return active['interaction_id'], active['timestamp'], False, None
         
         # Check for recent timeouts (past 24 hours) with similar topics
@@ -87,7 +132,7 @@ def get_or_create_conversation(user_id, user_name, message_text):
                             pending_ts = int(pending.get('timestamp', 0))
                             current_ts = int(time.time())
                             if current_ts - pending_ts < 300:  # 5 minutes
-                                print(f"DEBUG: Recent pending resumption exists, skipping")
+                                logger.debug('Recent pending resumption exists, skipping')
                                 has_recent = True
                                 break
                         
@@ -98,11 +143,11 @@ def get_or_create_conversation(user_id, user_name, message_text):
                             for pending in pending_check.get('Items', []):
                                 try:
                                     actions_table.delete_item(Key={'action_id': pending['action_id']})
-                                    print(f"🧹 Cleaned up stale pending resumption: {pending['action_id']}")
+                                    logger.info('🧹 Cleaned up stale pending resumption: %s', pending['action_id'])
                                 except Exception as e:
-                                    print(f"Error cleaning up stale resumption: {e}")
+                                    logger.error('Error cleaning up stale resumption: %s', e)
                 except Exception as e:
-                    print(f"Error checking pending resumption: {e}")
+                    logger.error('Error checking pending resumption: %s', e)
                     skip_this_conversation = True
                 
                 if skip_this_conversation:
@@ -110,10 +155,10 @@ def get_or_create_conversation(user_id, user_name, message_text):
                     
                 # Compare topics using AI
                 if compare_topics(message_text, recent.get('description', '')):
-                    print(f"✅ Found related timeout conversation: {recent.get('interaction_id')}")
+                    logger.info('✅ Found related timeout conversation: %s', recent.get('interaction_id'))
                     return None, None, True, recent
         
-        print(f"DEBUG: Creating new conversation")
+        logger.debug('Creating new conversation')
         # Create new conversation
         interaction_id = str(uuid.uuid4())
         timestamp = int(datetime.utcnow().timestamp())
@@ -138,13 +183,13 @@ def get_or_create_conversation(user_id, user_name, message_text):
         interactions_table.put_item(Item=item)
         return interaction_id, timestamp, True, None
     except Exception as e:
-        print(f"Error in conversation tracking: {e}")
+        logger.error('Error in conversation tracking: %s', e)
         return None, 0, True, None
 
 def compare_topics(new_message, previous_description):
     """Use AI to determine if messages are about the same or related issues"""
     try:
-        print(f"🤖 AI comparing: NEW='{new_message}' vs OLD='{previous_description}'")
+        logger.info("🤖 AI comparing: NEW='%s' vs OLD='%s'", new_message, previous_description)
         
         # Build AI prompt for semantic comparison
         prompt = f"""You are analyzing IT support requests to determine if they are about the same or closely related issues.
@@ -170,37 +215,31 @@ Respond with ONLY one word:
 
 Your response:"""
 
-        # Call Claude via Bedrock
-        response = bedrock.invoke_model(
-            modelId='us.anthropic.claude-sonnet-4-20250514-v1:0',
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 10,
-                "temperature": 0,
-                "messages": [{
-                    "role": "user",
-                    "content": prompt
-                }]
-            })
-        )
-        
-        response_body = json.loads(response['body'].read())
-        ai_decision = response_body['content'][0]['text'].strip().upper()
+        # A one-word classification - the fast model is plenty
+        ai_decision = invoke_model_text(MODEL_TIERS['fast'] if MODEL_ROUTING_ENABLED else MODEL_TIERS['standard'], {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 10,
+            "temperature": 0,
+            "messages": [{
+                "role": "user",
+                "content": prompt
+            }]
+        }).strip().upper()
         
-        print(f"🤖 AI decision: {ai_decision}")
+        logger.info('🤖 AI decision: %s', ai_decision)
         
         # Return True if AI says RELATED
         is_related = "RELATED" in ai_decision
         
         if is_related:
-            print(f"✅ AI confirmed: Issues are RELATED")
+            logger.info('✅ AI confirmed: Issues are RELATED')
         else:
-            print(f"❌ AI confirmed: Issues are UNRELATED")
+            logger.info('❌ AI confirmed: Issues are UNRELATED')
             
         return is_related
         
     except Exception as e:
-        print(f"❌ Error in AI topic comparison: {e}")
+        logger.error('❌ Error in AI topic comparison: %s', e)
         # Fallback to False (create new conversation) if AI fails
         return False
 
@@ -234,9 +273,9 @@ def mark_conversation_awaiting_approval(interaction_id, timestamp):
             UpdateExpression='SET awaiting_approval = :val, outcome = :outcome',
             ExpressionAttributeValues={':val': True, ':outcome': 'Awaiting Approval'}
         )
-        print(f"✅ Marked {interaction_id} as awaiting approval")
+        logger.info('✅ Marked %s as awaiting approval', interaction_id)
     except Exception as e:
-        print(f"Error marking conversation as awaiting approval: {e}")
+        logger.error('Error marking conversation as awaiting approval: %s', e)
 
 def update_conversation(interaction_id, timestamp, message_text, from_bot=False, outcome=None):
     """Update existing conversation"""
@@ -264,7 +303,7 @@ def update_conversation(interaction_id, timestamp, message_text, from_bot=False,
             # Cancel schedules when conversation is closed
             if outcome != 'In Progress':
                 cancel_schedules(timestamp, interaction_id)
-                print(f"✅ Cancelled schedules for closed conversation {interaction_id}")
+                logger.info('✅ Cancelled schedules for closed conversation %s', interaction_id)
         
         interactions_table.update_item(
             Key={'interaction_id': interaction_id, 'timestamp': timestamp},
@@ -273,7 +312,7 @@ def update_conversation(interaction_id, timestamp, message_text, from_bot=False,
         )
         return True
     except Exception as e:
-        print(f"Error updating conversation: {e}")
+        logger.error('Error updating conversation: %s', e)
         return False
 
 def detect_resolution(message_text):
@@ -282,14 +321,9 @@ def detect_resolution(message_text):
     resolved_phrases = ['thank', 'thanks', 'that worked', 'that fixed', 'that helped', 'resolved', 'solved', 'fixed', 'working now', 'all set', 'perfect', 'great', 'awesome', 'got it', 'that did it']
     return any(phrase in text for phrase in resolved_phrases)
 
-def send_resolution_prompt(channel, user_id, interaction_id, timestamp):
-    """Send follow-up message asking if issue was resolved"""
+def send_resolution_prompt(channel, user_id, interaction_id, timestamp, status=None):
+    """Ask if the issue was resolved - appended to the status message when there is one"""
     try:
-        headers = {
-            'Authorization': f'Bearer {SLACK_BOT_TOKEN}',
-            'Content-Type': 'application/json'
-        }
-        
         message = {
             "channel": channel,
             "text": "Did that help resolve your issue?",
@@ -337,24 +371,21 @@ def send_resolution_prompt(channel, user_id, interaction_id, timestamp):
             ]
         }
         
-        req = urllib.request.Request(
-            'https://slack.com/api/chat.postMessage',
-            data=json.dumps(message).encode('utf-8'),
-            headers=headers
-        )
-        
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            if result.get('ok'):
-                print(f"✅ Sent resolution prompt to {channel}")
-                
-                # Schedule auto-resolve after 15 minutes if no response
-                schedule_auto_resolve(interaction_id, timestamp, user_id)
-            else:
-                print(f"❌ Failed to send resolution prompt: {result.get('error')}")
+        if status:
+            blocks = text_to_section_blocks(status.text) + message['blocks'][1:]
+            result = status.update(status.text, blocks=blocks, force=True)
+        else:
+            result = slack_outbox.post(message).result()
+        if result.get('ok'):
+            logger.info('✅ Sent resolution prompt to %s', channel)
+            
+            # Schedule auto-resolve after 15 minutes if no response
+            schedule_auto_resolve(interaction_id, timestamp, user_id)
+        else:
+            logger.error('❌ Failed to send resolution prompt: %s', result.get('error'))
                 
     except Exception as e:
-        print(f"Error sending resolution prompt: {e}")
+        logger.error('Error sending resolution prompt: %s', e)
 
 def cancel_schedules(timestamp, interaction_id=None):
     """Cancel existing engagement and auto-resolve schedules"""
@@ -365,13 +396,13 @@ def cancel_schedules(timestamp, interaction_id=None):
         for prefix in ['e5', 'e10', 'ar']:
             try:
                 scheduler_client.delete_schedule(Name=f"{prefix}-{schedule_suffix}", GroupName='default')
-                print(f"✅ Cancelled schedule {prefix}-{schedule_suffix}")
+                logger.info('✅ Cancelled schedule %s-%s', prefix, schedule_suffix)
             except scheduler_client.exceptions.ResourceNotFoundException:
-                print(f"⏭️ Schedule {prefix}-{schedule_suffix} not found (already deleted)")
+                logger.info('⏭️ Schedule %s-%s not found (already deleted)', prefix, schedule_suffix)
             except Exception as e:
-                print(f"❌ Error cancelling schedule {prefix}-{schedule_suffix}: {e}")
+                logger.error('❌ Error cancelling schedule %s-%s: %s', prefix, schedule_suffix, e)
     except Exception as e:
-        print(f"Error cancelling schedules: {e}")
+        logger.error('Error cancelling schedules: %s', e)
 
 def schedule_auto_resolve(interaction_id, timestamp, user_id):
     """Schedule engagement prompts at 5, 10 minutes and auto-resolve at 15 minutes"""
@@ -404,7 +435,7 @@ def schedule_auto_resolve(interaction_id, timestamp, user_id):
                 FlexibleTimeWindow={'Mode': 'OFF'}
             )
         except scheduler_client.exceptions.ConflictException:
-            print(f"Schedule e5-{timestamp} already exists, skipping")
+            logger.info('Schedule e5-%s already exists, skipping', timestamp)
         
         # Schedule 10-minute engagement prompt
         schedule_time_10 = datetime.utcnow() + timedelta(minutes=10)
@@ -427,7 +458,7 @@ def schedule_auto_resolve(interaction_id, timestamp, user_id):
                 FlexibleTimeWindow={'Mode': 'OFF'}
             )
         except scheduler_client.exceptions.ConflictException:
-            print(f"Schedule e10-{timestamp} already exists, skipping")
+            logger.info('Schedule e10-%s already exists, skipping', timestamp)
         
         # Schedule 15-minute auto-resolve
         schedule_time_15 = datetime.utcnow() + timedelta(minutes=15)
@@ -449,9 +480,9 @@ def schedule_auto_resolve(interaction_id, timestamp, user_id):
                 FlexibleTimeWindow={'Mode': 'OFF'}
             )
         except scheduler_client.exceptions.ConflictException:
-            print(f"Schedule ar-{timestamp} already exists, skipping")
+            logger.info('Schedule ar-%s already exists, skipping', timestamp)
         
-        print(f"✅ Scheduled engagement prompts (5, 10 min) and auto-resolve (15 min) for {interaction_id}")
+        logger.info('✅ Scheduled engagement prompts (5, 10 min) and auto-resolve (15 min) for %s', interaction_id)
         
         # Update DynamoDB with next engagement time for dashboard
         try:
@@ -461,10 +492,10 @@ def schedule_auto_resolve(interaction_id, timestamp, user_id):
                 ExpressionAttributeValues={':time': int(schedule_time_5.timestamp())}
             )
         except Exception as e:
-            print(f"Error updating next_engagement_time: {e}")
+            logger.error('Error updating next_engagement_time: %s', e)
     except Exception as e:
-        print(f"Error scheduling engagement prompts: {e}")
-        print(f"Error scheduling auto-resolve: {e}")
+        logger.error('Error scheduling engagement prompts: %s', e)
+        logger.error('Error scheduling auto-resolve: %s', e)
 
 def schedule_engagement_restart(interaction_id, user_id, timestamp):
     """Restart full engagement cycle (5/10/15 min) after button press"""
@@ -494,7 +525,7 @@ def schedule_engagement_restart(interaction_id, user_id, timestamp):
                 FlexibleTimeWindow={'Mode': 'OFF'}
             )
         except Exception as e:
-            print(f"Error creating e5 schedule: {e}")
+            logger.error('Error creating e5 schedule: %s', e)
         
         # Schedule 10-minute engagement prompt
         schedule_time_10 = datetime.utcnow() + timedelta(minutes=10)
@@ -517,7 +548,7 @@ def schedule_engagement_restart(interaction_id, user_id, timestamp):
                 FlexibleTimeWindow={'Mode': 'OFF'}
             )
         except Exception as e:
-            print(f"Error creating e10 schedule: {e}")
+            logger.error('Error creating e10 schedule: %s', e)
         
         # Schedule 15-minute auto-resolve
         schedule_time_15 = datetime.utcnow() + timedelta(minutes=15)
@@ -539,9 +570,9 @@ def schedule_engagement_restart(interaction_id, user_id, timestamp):
                 FlexibleTimeWindow={'Mode': 'OFF'}
             )
         except Exception as e:
-            print(f"Error creating ar schedule: {e}")
+            logger.error('Error creating ar schedule: %s', e)
         
-        print(f"✅ Restarted full engagement cycle (5/10/15 min) for {interaction_id}")
+        logger.info('✅ Restarted full engagement cycle (5/10/15 min) for %s', interaction_id)
         
         # Update DynamoDB with next engagement time for dashboard
         try:
@@ -551,9 +582,9 @@ def schedule_engagement_restart(interaction_id, user_id, timestamp):
                 ExpressionAttributeValues={':time': int(schedule_time_5.timestamp())}
             )
         except Exception as e:
-            print(f"Error updating next_engagement_time: {e}")
+            logger.error('Error updating next_engagement_time: %s', e)
     except Exception as e:
-        print(f"Error in schedule_engagement_restart: {e}")
+        logger.error('Error in schedule_engagement_restart: %s', e)
 
 def handle_resolution_button(action_id, user_id, channel):
     """Handle resolution button clicks"""
@@ -569,8 +600,13 @@ def handle_resolution_button(action_id, user_id, channel):
             send_slack_message(channel, "✅ Great! Glad I could help! Feel free to reach out anytime.")
             
         elif action_type == 'needhelp':
-            # Keep conversation open
+            # Keep conversation open; the rest of it is answered by the standard model
             send_slack_message(channel, "👍 No problem! What else can I help you with?")
+            interactions_table.update_item(
+                Key={'interaction_id': interaction_id, 'timestamp': timestamp},
+                UpdateExpression='SET model_escalated = :true',
+                ExpressionAttributeValues={':true': True}
+            )
             
         elif action_type == 'ticket':
             # Create ticket with conversation history
@@ -583,7 +619,7 @@ def handle_resolution_button(action_id, user_id, channel):
                 send_slack_message(channel, "❌ Error creating ticket. Please try again.")
                 
     except Exception as e:
-        print(f"Error handling resolution button: {e}")
+        logger.error('Error handling resolution button: %s', e)
 
 def categorize_interaction(message_text):
     """Auto-categorize interaction type"""
@@ -616,7 +652,7 @@ def get_conversation_summary(interaction_id, timestamp):
             summary += f"\n[{msg['timestamp']}] {from_label}: {msg['message']}\n"
         return summary
     except Exception as e:
-        print(f"Error getting conversation summary: {e}")
+        logger.error('Error getting conversation summary: %s', e)
         return None
 
 def log_bot_interaction(user_name, message_text, action_taken, ticket_created=False, metadata=None):
@@ -640,6 +676,435 @@ pending_executions = {}  # NEW: Track Step Functions executions
 IT_APPROVAL_CHANNEL = "C09KB40PL9J"  # IT channel ID
 STEP_FUNCTIONS_ARN = "arn:aws:states:us-east-1:843046951786:stateMachine:brie-ticket-processor"
 
+def slack_api_call(method, payload, form=False, deadline=None):
+    """Call a Slack Web API method with pacing and retries; returns the parsed response"""
+    if form:
+        data = urllib.parse.urlencode(payload).encode('utf-8')
+        content_type = 'application/x-www-form-urlencoded'
+    else:
+        data = json.dumps(payload).encode('utf-8')
+        content_type = 'application/json; charset=utf-8'
+    
+    def do_call():
+        req = urllib.request.Request(
+            f'https://slack.com/api/{method}',
+            data=data,
+            headers={'Authorization': f'Bearer {SLACK_BOT_TOKEN}', 'Content-Type': content_type}
+        )
+        with urllib.request.urlopen(req) as response:
+            result = json.loads(response.read().decode('utf-8'))
+        if result.get('error') == 'ratelimited':
+            raise RateLimitedError(f"Slack {method} ratelimited")
+        return result
+    
+    # chat.postMessage is limited per channel, other methods per workspace
+    api = slack_rate_limit_api(method, payload.get('channel'))
+    try:
+        return call_with_retry(api, do_call, deadline, idempotent=method not in SLACK_NON_IDEMPOTENT_METHODS)
+    except Exception as e:
+        logger.error('Error calling Slack %s: %s', method, e)
+        return {'ok': False, 'error': str(e)}
+
+# Outbound Slack message queue
+# Messages for one channel are sent in order by a single drain task (paced by the
+# per-channel bucket in slack_api_call); different channels drain in parallel.
+# Plain-text posts that pile up behind the pacing are merged into one message.
+SLACK_OUTBOX_WORKERS = 4
+SLACK_COALESCE_MAX_CHARS = 3000
+
+class SlackOutbox:
+    """Per-channel ordered, paced, coalescing chat.postMessage queue"""
+    
+    def __init__(self, max_workers):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='slack-outbox')
+        self.lock = threading.Lock()
+        self.queues = {}  # {channel: deque of pending entries}
+        self.active = {}  # {channel: drain future}
+        self.stats = {'posted': 0, 'coalesced': 0, 'failed': 0, 'latencies_ms': []}
+    
+    def post(self, message, coalesce=True):
+        """Queue a chat.postMessage payload; the returned Future resolves to the Slack response"""
+        future = Future()
+        channel = message['channel']
+        entry = {
+            'message': dict(message),
+            'futures': [future],
+            'queued_at': time.monotonic(),
+            'coalesce': coalesce and not message.get('blocks') and not message.get('attachments')
+        }
+        
+        with self.lock:
+            queue = self.queues.setdefault(channel, deque())
+            last = queue[-1] if queue else None
+            if (last and entry['coalesce'] and last['coalesce'] and
+                    last['message'].get('thread_ts') == message.get('thread_ts') and
+                    len(last['message'].get('text') or '') + len(message.get('text') or '') < SLACK_COALESCE_MAX_CHARS):
+                last['message']['text'] = '\n\n'.join(filter(None, [last['message'].get('text'), message.get('text')]))
+                last['futures'].append(future)
+                self.stats['coalesced'] += 1
+            else:
+                queue.append(entry)
+            if channel not in self.active:
+                self.active[channel] = self.executor.submit(self._drain, channel)
+        return future
+    
+    def _drain(self, channel):
+        while True:
+            with self.lock:
+                queue = self.queues.get(channel)
+                if not queue:
+                    self.queues.pop(channel, None)
+                    self.active.pop(channel, None)
+                    return
+                entry = queue.popleft()
+            
+            try:
+                result = slack_api_call('chat.postMessage', entry['message'])
+            except Exception as e:
+                result = {'ok': False, 'error': str(e)}
+            
+            with self.lock:
+                self.stats['posted' if result.get('ok') else 'failed'] += 1
+                self.stats['latencies_ms'].append((time.monotonic() - entry['queued_at']) * 1000)
+            if not result.get('ok'):
+                logger.error('❌ Slack post to %s failed: %s', channel, result.get('error'))
+            for future in entry['futures']:
+                future.set_result(result)
+    
+    def flush(self, channel=None, timeout=None):
+        """Block until the channel (or every channel) has nothing left to send"""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            with self.lock:
+                pending = [f for c, f in self.active.items() if channel is None or c == channel]
+            if not pending:
+                return True
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                return False
+            wait(pending, timeout=remaining)
+    
+    def emit_metrics(self):
+        """Print delivery counters and latency in CloudWatch embedded metric format, then reset"""
+        with self.lock:
+            stats = self.stats
+            self.stats = {'posted': 0, 'coalesced': 0, 'failed': 0, 'latencies_ms': []}
+        latencies = stats['latencies_ms']
+        if not latencies:
+            return
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': 'BrieITAgent',
+                    'Dimensions': [[]],
+                    'Metrics': [
+                        {'Name': 'SlackPosted', 'Unit': 'Count'},
+                        {'Name': 'SlackCoalesced', 'Unit': 'Count'},
+                        {'Name': 'SlackFailed', 'Unit': 'Count'},
+                        {'Name': 'SlackDeliveryLatency', 'Unit': 'Milliseconds'}
+                    ]
+                }]
+            },
+            'SlackPosted': stats['posted'],
+            'SlackCoalesced': stats['coalesced'],
+            'SlackFailed': stats['failed'],
+            'SlackDeliveryLatency': latencies
+        }))
+
+slack_outbox = SlackOutbox(SLACK_OUTBOX_WORKERS)
+
+# Progressively updated status message
+# The answer flow posts one message and edits it with chat.update as it advances
+# (checking -> analyzing -> answer + buttons). Intermediate edits are debounced.
+STATUS_UPDATE_MIN_INTERVAL = 1.0
+PROGRESS_MESSAGE_DELAY_SECONDS = float(os.environ.get('PROGRESS_MESSAGE_DELAY_SECONDS', '4'))
+SLACK_SECTION_MAX_CHARS = 3000
+
+def text_to_section_blocks(text):
+    """Split text into mrkdwn section blocks under Slack's per-section limit ([] for empty text)"""
+    remaining = text or ''
+    if not remaining.strip():
+        return []
+    blocks = []
+    while remaining:
+        chunk = remaining[:SLACK_SECTION_MAX_CHARS]
+        if len(remaining) > SLACK_SECTION_MAX_CHARS:
+            # Prefer breaking at a paragraph, then a line
+            cut = max(chunk.rfind('\n\n'), chunk.rfind('\n'))
+            if cut > SLACK_SECTION_MAX_CHARS // 2:
+                chunk = chunk[:cut]
+        blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": chunk}})
+        remaining = remaining[len(chunk):].lstrip('\n')
+    return blocks
+
+class StatusMessage:
+    """A single Slack message that is edited in place as processing advances"""
+    
+    def __init__(self, channel, ts=None, thread_ts=None):
+        self.channel = channel
+        self.ts = ts
+        self.thread_ts = thread_ts
+        self.text = ''
+        self.blocks = None
+        self.lock = threading.Lock()
+        self.last_sent = 0
+        self.pending = False
+        self.timer = None
+    
+    def update(self, text, blocks=None, force=False):
+        """Set the message content; returns the Slack response if sent now, None if deferred"""
+        with self.lock:
+            self.text = text
+            self.blocks = blocks
+            if not self.ts:
+                return self._post()
+            
+            wait_seconds = STATUS_UPDATE_MIN_INTERVAL - (time.monotonic() - self.last_sent)
+            if force or wait_seconds <= 0:
+                return self._send()
+            
+            # Too soon after the last edit - send whatever is latest when the interval is up
+            self.pending = True
+            if not self.timer:
+                self.timer = threading.Timer(wait_seconds, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+            return None
+    
+    def flush(self):
+        """Push a deferred update now"""
+        with self.lock:
+            if self.pending:
+                self._send()
+    
+    def _post(self):
+        message = {'channel': self.channel, 'text': self.text}
+        if self.blocks:
+            message['blocks'] = self.blocks
+        if self.thread_ts:
+            message['thread_ts'] = self.thread_ts
+        result = slack_outbox.post(message, coalesce=False).result()
+        self.ts = result.get('ts')
+        self.last_sent = time.monotonic()
+        return result
+    
+    def _send(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        self.pending = False
+        # Queued posts to this channel must land before we edit
+        slack_outbox.flush(self.channel)
+        payload = {'channel': self.channel, 'ts': self.ts, 'text': self.text}
+        # Slack rejects empty and whitespace-only sections, so blank text goes without blocks
+        blocks = self.blocks or text_to_section_blocks(self.text)
+        if blocks:
+            payload['blocks'] = blocks
+        result = slack_api_call('chat.update', payload)
+        self.last_sent = time.monotonic()
+        if not result.get('ok'):
+            logger.error('❌ chat.update failed for %s/%s: %s', self.channel, self.ts, result.get('error'))
+        return result
+
+def bedrock_read_timeout():
+    """BEDROCK_READ_TIMEOUT, or less when the invocation deadline is closer (whole steps, rounded down)"""
+    remaining = time_remaining()
+    if remaining is None or remaining >= BEDROCK_READ_TIMEOUT:
+        return BEDROCK_READ_TIMEOUT
+    return max(1, int(remaining // BEDROCK_READ_TIMEOUT_STEP) * BEDROCK_READ_TIMEOUT_STEP)
+
+def invoke_bedrock(**kwargs):
+    """bedrock.invoke_model with client-side pacing and throttle retries"""
+    return call_with_retry('bedrock', lambda: get_bedrock_client(bedrock_read_timeout()).invoke_model(**kwargs))
+
+# Model tiers
+# Short text-only questions with a confident KB match go to the fast model; images,
+# long questions, weak KB matches and users who clicked "Still need help" go to the
+# standard model. The fast model can also hand a question up by answering ESCALATE.
+# Prices are USD per million input/output tokens, for the per-tier cost metric.
+MODEL_TIERS = {
+    'fast': os.environ.get('BEDROCK_FAST_MODEL_ID', 'us.anthropic.claude-3-5-haiku-20241022-v1:0'),
+    'standard': os.environ.get('BEDROCK_MODEL_ID', 'us.anthropic.claude-sonnet-4-20250514-v1:0')
+}
+MODEL_PRICES = json.loads(os.environ.get('BEDROCK_MODEL_PRICES', '{"fast": [0.8, 4.0], "standard": [3.0, 15.0]}'))
+MODEL_ROUTING_ENABLED = os.environ.get('MODEL_ROUTING_ENABLED', 'true').lower() == 'true'
+FAST_MODEL_MAX_WORDS = int(os.environ.get('FAST_MODEL_MAX_WORDS', '25'))
+FAST_MODEL_SMALL_TALK_WORDS = 4  # "thanks!", "hi brie" - fast regardless of KB match
+FAST_MODEL_MIN_KB_SCORE = float(os.environ.get('FAST_MODEL_MIN_KB_SCORE', '4.0'))
+ESCALATE_TOKEN = 'ESCALATE'
+FAST_MODEL_INSTRUCTIONS = (
+    f"If the excerpts do not cover this question and you are not confident in a correct, "
+    f"specific answer, reply with only the word {ESCALATE_TOKEN} and nothing else."
+)
+
+def tier_of_model(model_id):
+    return next((tier for tier, tier_model in MODEL_TIERS.items() if tier_model == model_id), 'standard')
+
+def choose_model_tier(user_message, image_analysis=None, kb_chunks=(), escalate=False):
+    """(tier, reason) for an answer"""
+    if not MODEL_ROUTING_ENABLED:
+        return 'standard', 'routing_disabled'
+    if escalate:
+        return 'standard', 'needhelp'
+    if image_analysis:
+        return 'standard', 'image'
+    words = len(user_message.split())
+    if words <= FAST_MODEL_SMALL_TALK_WORDS and not kb_chunks:
+        return 'fast', 'small_talk'
+    if words > FAST_MODEL_MAX_WORDS:
+        return 'standard', 'long_question'
+    if not kb_chunks or kb_chunks[0]['score'] < FAST_MODEL_MIN_KB_SCORE:
+        return 'standard', 'weak_kb_match'
+    return 'fast', 'simple'
+
+CONVERSATION_CONTEXT_TURNS = 6
+
+def load_conversation_turns(interaction_id, timestamp, current_message=None):
+    """{'escalated': True once the user clicked "Still need help", 'history': recent turns as "User: ..." lines}"""
+    context = {'escalated': False, 'history': []}
+    if not (interaction_id and timestamp):
+        return context
+    try:
+        item = interactions_table.get_item(
+            Key={'interaction_id': interaction_id, 'timestamp': timestamp},
+            ProjectionExpression='model_escalated, conversation_history'
+        ).get('Item', {})
+    except Exception as e:
+        logger.warning('⚠️ Could not read conversation %s: %s', interaction_id, e)
+        return context
+    history = json.loads(item.get('conversation_history') or '[]')
+    # The question being answered is usually already the last entry
+    if history and history[-1].get('from') == 'user' and history[-1].get('message') == current_message:
+        history = history[:-1]
+    context['escalated'] = bool(item.get('model_escalated'))
+    context['history'] = [f"{'User' if msg.get('from') == 'user' else 'Brie'}: {msg.get('message', '')}"
+                          for msg in history[-CONVERSATION_CONTEXT_TURNS:]]
+    return context
+
+# Prompt caching: the stable part of a system prompt goes first with cache_control,
+# per-request text (retrieved excerpts) after it. Bedrock only caches prefixes of at
+# least 1024 tokens for Sonnet, so shorter prefixes are sent without the marker.
+BEDROCK_PROMPT_CACHING = os.environ.get('BEDROCK_PROMPT_CACHING', 'true').lower() == 'true'
+BEDROCK_CACHE_MIN_TOKENS = int(os.environ.get('BEDROCK_CACHE_MIN_TOKENS', '1024'))
+BEDROCK_USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+# {tier: {field: tokens, 'latency_ms': [...], 'cost_usd': x}}, emitted per invocation by emit_bedrock_usage_metrics
+bedrock_usage = {}
+bedrock_usage_lock = threading.Lock()  # parallel stages and SQS workers record concurrently
+
+def cached_system_prompt(stable_text, dynamic_text=''):
+    """System prompt blocks with the stable prefix marked for prompt caching (if it is long enough to be cached)"""
+    stable_block = {'type': 'text', 'text': stable_text}
+    if BEDROCK_PROMPT_CACHING and estimate_tokens(stable_text) >= BEDROCK_CACHE_MIN_TOKENS:
+        stable_block['cache_control'] = {'type': 'ephemeral'}
+    blocks = [stable_block]
+    if dynamic_text:
+        blocks.append({'type': 'text', 'text': dynamic_text})
+    return blocks
+
+def model_call_cost(tier, usage):
+    """USD for one call; cache reads bill at 0.1x and cache writes at 1.25x the input price"""
+    input_price, output_price = MODEL_PRICES.get(tier, MODEL_PRICES['standard'])
+    input_equivalent = ((usage.get('input_tokens') or 0) + 0.1 * (usage.get('cache_read_input_tokens') or 0) +
+                        1.25 * (usage.get('cache_creation_input_tokens') or 0))
+    return (input_equivalent * input_price + (usage.get('output_tokens') or 0) * output_price) / 1_000_000
+
+def record_bedrock_usage(usage, model_id, latency_ms):
+    """Add one response's token usage, latency and cost to this invocation's per-tier totals"""
+    tier = tier_of_model(model_id)
+    cost = model_call_cost(tier, usage)
+    with bedrock_usage_lock:
+        totals = bedrock_usage.setdefault(tier, {'latency_ms': [], 'cost_usd': 0})
+        for field in BEDROCK_USAGE_FIELDS:
+            totals[field] = totals.get(field, 0) + (usage.get(field) or 0)
+        totals['latency_ms'].append(round(latency_ms))
+        totals['cost_usd'] += cost
+    logger.info('🧮 Bedrock %s: %s in, %s out, cache read %s, cache write %s, %.0fms, $%.5f', tier,
+                usage.get('input_tokens'), usage.get('output_tokens'),
+                usage.get('cache_read_input_tokens', 0), usage.get('cache_creation_input_tokens', 0), latency_ms, cost)
+
+def emit_bedrock_usage_metrics():
+    """Print per-tier tokens (including prompt cache reads/writes), latency and cost as CloudWatch embedded metrics, then reset"""
+    with bedrock_usage_lock:
+        usage_by_tier = dict(bedrock_usage)
+        bedrock_usage.clear()
+    for tier, totals in usage_by_tier.items():
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': 'BrieITAgent',
+                    'Dimensions': [['ModelTier']],
+                    'Metrics': [{'Name': field, 'Unit': 'Count'} for field in BEDROCK_USAGE_FIELDS] +
+                               [{'Name': 'latency_ms', 'Unit': 'Milliseconds'}, {'Name': 'cost_usd', 'Unit': 'None'}]
+                }]
+            },
+            'ModelTier': tier,
+            **totals
+        }))
+
+def invoke_model_text(model_id, request_body):
+    """Non-streaming invoke_model returning the answer text, with usage recorded"""
+    check_bedrock_budget()
+    started = time.monotonic()
+    response = invoke_bedrock(modelId=model_id, body=json.dumps(request_body))
+    response_body = json.loads(response['body'].read())
+    record_bedrock_usage(response_body.get('usage', {}), model_id, (time.monotonic() - started) * 1000)
+    return response_body['content'][0]['text']
+
+# Streamed answers: push partial text at sentence ends or every STREAM_UPDATE_INTERVAL
+# seconds; StatusMessage debouncing keeps the resulting chat.update calls within tier 3
+BEDROCK_STREAMING = os.environ.get('BEDROCK_STREAMING', 'true').lower() == 'true'
+STREAM_UPDATE_INTERVAL = 0.5
+BEDROCK_MIN_BUDGET_SECONDS = float(os.environ.get('BEDROCK_MIN_BUDGET_SECONDS', '5'))
+
+class BedrockDeadlineExceeded(Exception):
+    """The invocation ran out of time; partial_text is whatever the model had produced"""
+    def __init__(self, partial_text=''):
+        super().__init__('invocation deadline reached')
+        self.partial_text = partial_text
+
+def check_bedrock_budget():
+    """Refuse to start a model call that cannot finish before the invocation deadline"""
+    remaining = time_remaining()
+    if remaining is not None and remaining < BEDROCK_MIN_BUDGET_SECONDS:
+        raise BedrockDeadlineExceeded()
+
+def invoke_bedrock_stream(on_text, **kwargs):
+    """invoke_model_with_response_stream, calling on_text(text_so_far) as tokens arrive; returns the full text"""
+    check_bedrock_budget()
+    started = time.monotonic()
+    response = call_with_retry('bedrock', lambda: get_bedrock_client(bedrock_read_timeout()).invoke_model_with_response_stream(**kwargs))
+    text = ''
+    usage = {}
+    last_push = time.monotonic()
+    for stream_event in response['body']:
+        if invocation_deadline['at'] and time.time() > invocation_deadline['at']:
+            response['body'].close()
+            raise BedrockDeadlineExceeded(text)
+        if 'chunk' not in stream_event:
+            # throttlingException, modelStreamErrorException, ...
+            raise RuntimeError(f"Bedrock stream error: {list(stream_event.keys())}")
+        chunk = json.loads(stream_event['chunk']['bytes'])
+        # Input and cache usage arrive with message_start, the output count with message_delta
+        if chunk.get('type') == 'message_start':
+            usage.update(chunk.get('message', {}).get('usage', {}))
+        elif chunk.get('type') == 'message_delta':
+            usage.update(chunk.get('usage', {}))
+        elif chunk.get('type') == 'message_stop':
+            record_bedrock_usage(usage, kwargs.get('modelId'), (time.monotonic() - started) * 1000)
+        if chunk.get('type') != 'content_block_delta':
+            continue
+        delta = chunk.get('delta', {}).get('text', '')
+        if not delta:
+            continue
+        text += delta
+        now = time.monotonic()
+        if now - last_push >= STREAM_UPDATE_INTERVAL or delta.rstrip(' ').endswith(('.', '!', '?', '\n')):
+            on_text(text)
+            last_push = now
+    return text
+
 def check_membership(user_email, group_name):
     """Check if user is already a member of the group"""
     try:
@@ -658,7 +1123,7 @@ def check_membership(user_email, group_name):
         )
         
         result = json.loads(response['Payload'].read())
-        print(f"Membership check result: {result}")
+        logger.info('Membership check result: %s', result)
         
         if result.get('statusCode') == 200:
             body = json.loads(result.get('body', '{}'))
@@ -667,7 +1132,7 @@ def check_membership(user_email, group_name):
         return "ERROR"
         
     except Exception as e:
-        print(f"Error checking membership: {e}")
+        logger.error('Error checking membership: %s', e)
         return "ERROR"
 
 def query_group_type(group_name):
@@ -688,7 +1153,7 @@ def query_group_type(group_name):
         )
         
         result = json.loads(response['Payload'].read())
-        print(f"Group type query result: {result}")
+        logger.info('Group type query result: %s', result)
         
         if result.get('statusCode') == 200:
             body = json.loads(result.get('body', '{}'))
@@ -697,7 +1162,7 @@ def query_group_type(group_name):
         return None
         
     except Exception as e:
-        print(f"Error querying group type: {e}")
+        logger.error('Error querying group type: %s', e)
         return None
 
 def parse_multiple_users(user_string, requester_email):
@@ -706,14 +1171,33 @@ def parse_multiple_users(user_string, requester_email):
     # Split on 'and' or ','
     users = re.split(r'\s+and\s+|,\s*', user_string, flags=re.IGNORECASE)
     emails = []
+    unverified = []
     for user in users:
         user = user.strip()
         if not user:
             continue
         if user.lower() == 'me':
             emails.append(requester_email)
-        else:
-            emails.append(f"{user.lower().replace(' ', '.')}@ever.ag")
+            continue
+        # Names and typed addresses are answered from the directory mirror, without a network call
+        email = lookup_directory_email(user)
+        if email:
+            emails.append(email.lower())
+            continue
+        email = user.lower() if '@' in user else f"{user.lower().replace(' ', '.')}@ever.ag"
+        unverified.append(email)
+        emails.append(email)
+    
+    # Only what the mirror doesn't know goes to the connector, together, in one call
+    resolved = resolve_directory_users(unverified)
+    for i, email in enumerate(emails):
+        user = resolved.get(email)
+        if user and user.get('found') and user.get('mail'):
+            emails[i] = user['mail'].lower()
+        elif user and user.get('error'):
+            logger.warning('⚠️ Could not verify %s in the directory (status %s)', email, user['error'])
+        elif user is not None:
+            logger.warning('⚠️ %s was not found in the directory', email)
     return emails
 
 def detect_automation_request(message):
@@ -745,12 +1229,12 @@ def detect_automation_request(message):
                 match = re.search(pattern, message_lower)
                 if match:
                     potential_group = match.group(1).strip()
-                    print(f"Extracted potential group name: {potential_group}")
+                    logger.info('Extracted potential group name: %s', potential_group)
                     
                     # Query AD to get matches
                     matches = query_group_type(potential_group)
                     if matches:
-                        print(f"Found {len(matches)} matching groups")
+                        logger.info('Found %s matching groups', len(matches))
                         
                         # Filter by explicit type if user specified "dl" or "sso"
                         if 'dl' in message_lower or 'distribution list' in message_lower:
@@ -759,20 +1243,20 @@ def detect_automation_request(message):
                                 return 'DISTRIBUTION_LIST'
                             else:
                                 # User asked for DL but only SSO groups found
-                                print(f"User requested DL but only found SSO groups")
+                                logger.info('User requested DL but only found SSO groups')
                                 return None
                         elif 'sso' in message_lower or 'ad group' in message_lower:
                             sso_matches = [m for m in matches if m['type'] == 'SSO_GROUP']
                             if sso_matches:
                                 return 'SSO_GROUP'
                             else:
-                                print(f"User requested SSO but only found DLs")
+                                logger.info('User requested SSO but only found DLs')
                                 return None
                         else:
                             # No explicit type - return first match type
                             return matches[0]['type']
                     else:
-                        print(f"No groups found matching: {potential_group}")
+                        logger.info('No groups found matching: %s', potential_group)
     
     # Distribution List - DISABLED: Use simple detect_distribution_list_request() instead
     # The it-action-processor Lambda regex doesn't work well with Slack messages
@@ -830,7 +1314,7 @@ def check_pending_group_selection(user_email):
         
         return None
     except Exception as e:
-        print(f"Error checking pending selection: {e}")
+        logger.error('Error checking pending selection: %s', e)
         return None
 
 def detect_distribution_list_request(message):
@@ -937,7 +1421,7 @@ def send_slack_message(message_data):
         with urllib.request.urlopen(req) as response:
             return json.loads(response.read().decode())
     except Exception as e:
-        print(f"Error sending Slack message: {e}")
+        logger.error('Error sending Slack message: %s', e)
         return None
 
 def extract_distribution_list_name(message):
@@ -1031,25 +1515,12 @@ def send_approval_request(user_id, user_name, user_email, distribution_list, ori
 
 def send_slack_message_to_channel(message_data):
     """Send message to Slack channel"""
-    headers = {
-        'Authorization': f'Bearer {SLACK_BOT_TOKEN}',
-        'Content-Type': 'application/json'
-    }
-    
-    data = json.dumps(message_data).encode('utf-8')
-    req = urllib.request.Request('https://slack.com/api/chat.postMessage', data=data, headers=headers)
-    
-    try:
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode())
-            if not result.get('ok'):
-                print(f"❌ Slack API error: {result.get('error')}")
-            else:
-                print(f"✅ Approval message sent to channel")
-            return result
-    except Exception as e:
-        print(f"Error sending Slack message: {e}")
+    result = slack_outbox.post(message_data).result()
+    if not result.get('ok'):
+        logger.error('❌ Slack API error: %s', result.get('error'))
         return None
+    logger.info('✅ Approval message sent to channel')
+    return result
 
 def track_user_message(user_id, message, is_bot_response=False, image_url=None):
     """Track user's messages and bot responses for full conversation history"""
@@ -1099,156 +1570,950 @@ def get_full_conversation_history(user_id):
     
     return "\n\n".join(conversation) if conversation else "No previous conversation history"
 
+# Screenshot store
+# Slack screenshots are fetched from Slack once and kept as raw bytes under their
+# sha256 (/tmp and S3), with a pointer per Slack file ID, so image analysis (async
+# invocation) and ticket emails (message handler) read the same copy - whichever
+# container gets there second never goes back to Slack.
+SCREENSHOT_BUCKET = os.environ.get('SCREENSHOT_BUCKET', 'brie-it-agent-cache')
+SCREENSHOT_PREFIX = os.environ.get('SCREENSHOT_PREFIX', 'screenshots/')
+SCREENSHOT_DIR = '/tmp/screenshots'
+screenshot_hashes = {}  # {file key: sha256}, file key is the Slack file ID (or a URL hash)
+screenshot_lock = threading.Lock()
+
+def screenshot_file_key(image_url, file_id=None):
+    """Slack file ID for an image URL - url_private and every thumb_* URL of a file share it"""
+    if file_id:
+        return file_id
+    match = re.search(r'/files-(?:pri|tmb)/T[A-Z0-9]+-(F[A-Z0-9]+)', image_url)
+    return match.group(1) if match else 'url-' + hashlib.sha256(image_url.encode('utf-8')).hexdigest()[:32]
+
+def read_screenshot(digest):
+    """Raw bytes for a content hash from /tmp, then S3; None if neither has them"""
+    path = os.path.join(SCREENSHOT_DIR, digest)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        pass
+    try:
+        image_bytes = boto3.client('s3').get_object(Bucket=SCREENSHOT_BUCKET, Key=f"{SCREENSHOT_PREFIX}sha256/{digest}")['Body'].read()
+    except Exception:
+        return None
+    write_screenshot_file(digest, image_bytes)
+    return image_bytes
+
+def write_screenshot_file(digest, image_bytes):
+    try:
+        os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+        with open(os.path.join(SCREENSHOT_DIR, digest), 'wb') as f:
+            f.write(image_bytes)
+    except OSError as e:
+        logger.warning('⚠️ Could not write screenshot to /tmp: %s', e)
+
+def store_screenshot(file_key, image_bytes):
+    """Keep bytes by content hash plus a file-key pointer; returns the hash"""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    write_screenshot_file(digest, image_bytes)
+    try:
+        s3 = boto3.client('s3')
+        s3.put_object(Bucket=SCREENSHOT_BUCKET, Key=f"{SCREENSHOT_PREFIX}sha256/{digest}", Body=image_bytes)
+        s3.put_object(Bucket=SCREENSHOT_BUCKET, Key=f"{SCREENSHOT_PREFIX}files/{file_key}", Body=digest.encode('ascii'))
+    except Exception as e:
+        logger.warning('⚠️ Could not write screenshot to S3: %s', e)
+    with screenshot_lock:
+        screenshot_hashes[file_key] = digest
+    return digest
+
+def get_screenshot(image_url, file_id=None):
+    """Raw bytes of a Slack image, downloading it only if the store doesn't have it
+    
+    Download errors (urllib.error.HTTPError etc.) propagate to the caller.
+    """
+    file_key = screenshot_file_key(image_url, file_id)
+    with screenshot_lock:
+        digest = screenshot_hashes.get(file_key)
+    if not digest:
+        try:
+            obj = boto3.client('s3').get_object(Bucket=SCREENSHOT_BUCKET, Key=f"{SCREENSHOT_PREFIX}files/{file_key}")
+            digest = obj['Body'].read().decode('ascii')
+        except Exception:
+            digest = None
+    if digest:
+        image_bytes = read_screenshot(digest)
+        if image_bytes:
+            with screenshot_lock:
+                screenshot_hashes[file_key] = digest
+            logger.info('🖼️ Screenshot %s from store (%s bytes)', file_key, len(image_bytes))
+            return image_bytes
+    
+    logger.info('Attempting to download image from: %s', image_url)
+    req = urllib.request.Request(image_url, headers={'Authorization': f'Bearer {SLACK_BOT_TOKEN}'})
+    with urllib.request.urlopen(req, timeout=10) as response:
+        image_bytes = response.read()
+    logger.info('Downloaded %s bytes', len(image_bytes))
+    if image_bytes:
+        store_screenshot(file_key, image_bytes)
+    return image_bytes
+
 def download_slack_image(image_url):
-    """Download image from Slack and return base64 encoded data"""
+    """Raw bytes of a Slack image (via the screenshot store), None on failure"""
     try:
-        print(f"Attempting to download image from: {image_url}")
-        headers = {'Authorization': f'Bearer {SLACK_BOT_TOKEN}'}
-        req = urllib.request.Request(image_url, headers=headers)
-        
-        with urllib.request.urlopen(req, timeout=10) as response:
-            print(f"Response status: {response.status}")
-            if response.status == 200:
-                image_data = response.read()
-                print(f"Downloaded {len(image_data)} bytes")
-                if len(image_data) > 0:
-                    b64_data = base64.b64encode(image_data).decode('utf-8')
-                    print(f"Encoded to base64: {len(b64_data)} characters")
-                    return b64_data
-                else:
-                    print("Downloaded image is empty")
-            else:
-                print(f"HTTP error: {response.status}")
+        image_data = get_screenshot(image_url)
+        if image_data:
+            return image_data
+        logger.info('Downloaded image is empty')
     except Exception as e:
-        print(f"Error downloading image: {str(e)}")
+        logger.error('Error downloading image: %s', str(e))
+    return None
+
+# Screenshot preprocessing for vision
+# The real format comes from magic bytes and the size from the image header, so
+# nothing is decoded when a screenshot is already fine. With Pillow available
+# (Lambda layer), larger images are downscaled to VISION_MAX_LONG_EDGE, tall or
+# wide ones (scrolling captures) are cut into tiles first, and the output is
+# re-encoded as PNG or, if that is still big, JPEG. Without Pillow, images Bedrock
+# would refuse are rejected with a message instead. Results are cached by source hash.
+VISION_MAX_LONG_EDGE = 1568  # larger images are downscaled by the model anyway
+VISION_HARD_MAX_EDGE = 8000  # Bedrock rejects images beyond this
+VISION_MAX_IMAGE_BYTES = int(3.75 * 1024 * 1024)
+VISION_TARGET_BYTES = 1024 * 1024
+VISION_TILE_ASPECT = 2.5  # long/short edge ratio above which an image is tiled
+VISION_MAX_TILES = 4
+VISION_PIPELINE_VERSION = 1
+VISION_MEDIA_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'image/webp')
+vision_image_cache = OrderedDict()  # {source sha256: [image, ...]}
+vision_image_lock = threading.Lock()
+VISION_IMAGE_CACHE_SIZE = 32
+
+class ImageRejected(Exception):
+    """A screenshot that cannot be sent to the model; str(e) is shown to the user"""
+
+def sniff_image_type(image_bytes):
+    if image_bytes.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if image_bytes.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if image_bytes[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'image/webp'
     return None
 
-def get_confluence_content():
-    """Fetch content from Confluence pages with foritchatbot label"""
+def image_dimensions(image_bytes, media_type):
+    """(width, height) read from the header, None if it can't be found"""
     try:
-        # Create authentication header
-        auth_string = f"{CONFLUENCE_EMAIL}:{CONFLUENCE_API_TOKEN}"
-        auth_bytes = auth_string.encode('ascii')
-        auth_b64 = base64.b64encode(auth_bytes).decode('ascii')
-        
-        # Search for pages with foritchatbot label
-        search_url = f"{CONFLUENCE_BASE_URL}/rest/api/content/search?cql=label=foritchatbot&expand=body.storage"
-        
-        req = urllib.request.Request(search_url)
-        req.add_header('Authorization', f'Basic {auth_b64}')
-        req.add_header('Accept', 'application/json')
-        
-        with urllib.request.urlopen(req) as response:
-            data = json.loads(response.read().decode('utf-8'))
-            
-            confluence_knowledge = []
-            for page in data.get('results', []):
-                title = page.get('title', '')
-                content = page.get('body', {}).get('storage', {}).get('value', '')
-                
-                # Clean up HTML content (basic cleanup)
-                import re
-                clean_content = re.sub(r'<[^>]+>', '', content)
-                clean_content = re.sub(r'\s+', ' ', clean_content).strip()
-                
-                confluence_knowledge.append(f"TITLE: {title}\nCONTENT: {clean_content}")
-            
-            return "\n\n---\n\n".join(confluence_knowledge)
-            
+        if media_type == 'image/png':
+            return int.from_bytes(image_bytes[16:20], 'big'), int.from_bytes(image_bytes[20:24], 'big')
+        if media_type == 'image/gif':
+            return int.from_bytes(image_bytes[6:8], 'little'), int.from_bytes(image_bytes[8:10], 'little')
+        if media_type == 'image/webp':
+            chunk = image_bytes[12:16]
+            if chunk == b'VP8X':
+                return int.from_bytes(image_bytes[24:27], 'little') + 1, int.from_bytes(image_bytes[27:30], 'little') + 1
+            if chunk == b'VP8L':
+                bits = int.from_bytes(image_bytes[21:25], 'little')
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b'VP8 ':
+                return int.from_bytes(image_bytes[26:28], 'little') & 0x3FFF, int.from_bytes(image_bytes[28:30], 'little') & 0x3FFF
+        if media_type == 'image/jpeg':
+            # Walk the segments to the first start-of-frame marker
+            index = 2
+            while index + 9 < len(image_bytes):
+                if image_bytes[index] != 0xFF:
+                    return None
+                marker = image_bytes[index + 1]
+                if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                    return int.from_bytes(image_bytes[index + 7:index + 9], 'big'), int.from_bytes(image_bytes[index + 5:index + 7], 'big')
+                index += 2 + int.from_bytes(image_bytes[index + 2:index + 4], 'big')
+    except (IndexError, ValueError):
+        pass
+    return None
+
+def encode_vision_image(image):
+    """PNG (text stays sharp) unless it is over VISION_TARGET_BYTES, then JPEG"""
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    if buffer.tell() <= VISION_TARGET_BYTES:
+        return {'media_type': 'image/png', 'data': buffer.getvalue(), 'width': image.width, 'height': image.height}
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='JPEG', quality=85, optimize=True)
+    return {'media_type': 'image/jpeg', 'data': buffer.getvalue(), 'width': image.width, 'height': image.height}
+
+def resize_for_vision(image_bytes, width, height):
+    """Tiles (for extreme aspect ratios) each scaled to VISION_MAX_LONG_EDGE"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.seek(0)  # first frame of an animated GIF
+    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    long_edge, short_edge = max(width, height), min(width, height)
+    tiles = 1
+    if long_edge / max(short_edge, 1) > VISION_TILE_ASPECT:
+        tiles = min(VISION_MAX_TILES, math.ceil(long_edge / (short_edge * VISION_TILE_ASPECT)))
+    results = []
+    for tile in range(tiles):
+        if height >= width:
+            box = (0, height * tile // tiles, width, height * (tile + 1) // tiles)
+        else:
+            box = (width * tile // tiles, 0, width * (tile + 1) // tiles, height)
+        part = image.crop(box) if tiles > 1 else image
+        scale = VISION_MAX_LONG_EDGE / max(part.size)
+        if scale < 1:
+            part = part.resize((max(1, round(part.width * scale)), max(1, round(part.height * scale))), Image.LANCZOS)
+        results.append(encode_vision_image(part))
+    return results
+
+def prepare_image_for_vision(image_bytes):
+    """[{'media_type', 'data', 'width', 'height'}, ...] ready for Bedrock, or raise ImageRejected"""
+    started = time.monotonic()
+    media_type = sniff_image_type(image_bytes)
+    if media_type not in VISION_MEDIA_TYPES:
+        raise ImageRejected("I can only read PNG, JPEG, GIF or WebP screenshots. Please upload it in one of those formats or describe what it shows.")
+    size = image_dimensions(image_bytes, media_type)
+    width, height = size or (0, 0)
+    if size and max(size) <= VISION_MAX_LONG_EDGE and len(image_bytes) <= VISION_MAX_IMAGE_BYTES:
+        # Already fits - sent as-is, so there is nothing to cache or look up
+        return [{'media_type': media_type, 'data': image_bytes, 'width': width, 'height': height}]
+    
+    source_hash = hashlib.sha256(image_bytes).hexdigest()
+    with vision_image_lock:
+        if source_hash in vision_image_cache:
+            vision_image_cache.move_to_end(source_hash)
+            return vision_image_cache[source_hash]
+    manifest_key = f"{SCREENSHOT_PREFIX}vision/v{VISION_PIPELINE_VERSION}/{source_hash}.json"
+    try:
+        manifest = json.loads(boto3.client('s3').get_object(Bucket=SCREENSHOT_BUCKET, Key=manifest_key)['Body'].read())
+        images = [dict(entry, data=read_screenshot(entry['sha256'])) for entry in manifest]
+        if all(image['data'] for image in images):
+            return remember_vision_images(source_hash, images)
+    except Exception:
+        pass
+    
+    if Image is not None:
+        try:
+            if not size:
+                width, height = Image.open(io.BytesIO(image_bytes)).size
+            images = resize_for_vision(image_bytes, width, height)
+        except Exception as e:
+            logger.warning('⚠️ Could not preprocess image: %s', e)
+            raise ImageRejected("I couldn't open that screenshot. Please try uploading it again or describe what it shows.")
+    elif (not size or max(size) <= VISION_HARD_MAX_EDGE) and len(image_bytes) <= VISION_MAX_IMAGE_BYTES:
+        # No Pillow: the model downscales it itself
+        images = [{'media_type': media_type, 'data': image_bytes, 'width': width, 'height': height}]
+    else:
+        raise ImageRejected("That screenshot is too large for me to read. Please crop it to the relevant part or describe what it shows.")
+    
+    logger.info('🖼️ Prepared %s image(s) for vision from %sx%s %s (%s -> %s bytes) in %.0fms',
+                len(images), width, height, media_type, len(image_bytes), sum(len(image['data']) for image in images),
+                (time.monotonic() - started) * 1000)
+    if images[0]['data'] is not image_bytes:
+        manifest = []
+        for image in images:
+            digest = hashlib.sha256(image['data']).hexdigest()
+            write_screenshot_file(digest, image['data'])
+            manifest.append({'media_type': image['media_type'], 'sha256': digest, 'width': image['width'], 'height': image['height']})
+        try:
+            s3 = boto3.client('s3')
+            for image, entry in zip(images, manifest):
+                s3.put_object(Bucket=SCREENSHOT_BUCKET, Key=f"{SCREENSHOT_PREFIX}sha256/{entry['sha256']}", Body=image['data'])
+            s3.put_object(Bucket=SCREENSHOT_BUCKET, Key=manifest_key, Body=json.dumps(manifest).encode('utf-8'))
+        except Exception as e:
+            logger.warning('⚠️ Could not cache preprocessed image: %s', e)
+    return remember_vision_images(source_hash, images)
+
+def remember_vision_images(source_hash, images):
+    # Called from answer-stage worker threads
+    with vision_image_lock:
+        vision_image_cache[source_hash] = images
+        vision_image_cache.move_to_end(source_hash)
+        while len(vision_image_cache) > VISION_IMAGE_CACHE_SIZE:
+            vision_image_cache.popitem(last=False)
+    return images
+
+# Storage-format conversion
+# Confluence storage XHTML is converted once, at ingestion, into compact
+# structured text: heading-delimited sections, numbered steps, bulleted items,
+# table rows as "cell | cell", code blocks verbatim and admonition macros as
+# "Note:" lines. Navigation/embed macros are dropped. Nothing on the answer path
+# parses HTML.
+KB_FORMAT_VERSION = 2  # bump to force a full re-ingest when the conversion changes
+STORAGE_BLOCK_TAGS = frozenset(
+    'p div br hr pre blockquote table thead tbody ul ol li tr ac:task-list ac:task ac:layout-section ac:layout-cell'.split()
+)
+STORAGE_DROPPED_MACROS = frozenset(
+    'toc children anchor attachments pagetree livesearch contentbylabel recently-updated jira '
+    'include excerpt-include create-from-template status profile'.split()
+)
+STORAGE_ADMONITION_MACROS = {'info': 'Info', 'note': 'Note', 'warning': 'Warning', 'tip': 'Tip', 'panel': 'Note'}
+STORAGE_CODE_MACROS = frozenset(['code', 'noformat'])
+STORAGE_SKIPPED_TAGS = frozenset(['ac:parameter', 'ac:task-id', 'ac:task-status', 'ac:emoticon', 'style', 'script'])
+
+class StorageConverter(HTMLParser):
+    """Collects [(heading, text)] sections from one page of storage-format XHTML"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections = []
+        self.heading = ''
+        self.lines = []
+        self.line = []
+        self.heading_parts = None  # collecting a heading's text when not None
+        self.lists = []  # [tag, items so far] per open <ol>/<ul>
+        self.row = None  # cells of the open <tr>
+        self.cell = None
+        self.macros = []
+        self.skip_depth = 0
+        self.link_target = None
+        self.link_has_text = False
+        self.prefix = ''  # list marker or "Note: ", put in front of the next line written
+    
+    def dropping(self):
+        return self.skip_depth or any(name in STORAGE_DROPPED_MACROS for name in self.macros)
+    
+    def emit(self, text):
+        if self.dropping():
+            return
+        if self.link_target is not None and text.strip():
+            self.link_has_text = True
+        if self.heading_parts is not None:
+            self.heading_parts.append(text)
+        elif self.cell is not None:
+            self.cell.append(text)
+        else:
+            self.line.append(text)
+    
+    def end_line(self):
+        text = ' '.join(''.join(self.line).split())
+        self.line = []
+        if text:
+            self.lines.append(self.prefix + text)
+            self.prefix = ''
+    
+    def end_section(self):
+        self.end_line()
+        if self.lines:
+            self.sections.append((self.heading, '\n'.join(self.lines)))
+        self.lines = []
+    
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in STORAGE_SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag == 'ac:structured-macro':
+            name = attrs.get('ac:name', '')
+            self.macros.append(name)
+            if name in STORAGE_ADMONITION_MACROS and not self.dropping():
+                self.end_line()
+                self.prefix = f"{STORAGE_ADMONITION_MACROS[name]}: "
+            elif name in STORAGE_CODE_MACROS:
+                self.end_line()
+        elif re.fullmatch(r'h[1-6]', tag) and self.cell is None:
+            self.end_section()
+            self.heading_parts = []
+        elif tag in ('td', 'th'):
+            self.cell = []
+        elif tag == 'tr':
+            self.end_line()
+            self.row = []
+        elif tag in ('ol', 'ul', 'ac:task-list'):
+            self.end_line()
+            self.lists.append([tag, 0])
+        elif tag in ('li', 'ac:task'):
+            self.end_line()
+            if self.lists:
+                self.lists[-1][1] += 1
+                kind, count = self.lists[-1]
+                marker = f"{count}." if kind == 'ol' else '-'
+                self.prefix = '  ' * (len(self.lists) - 1) + marker + ' '
+        elif tag == 'ac:link':
+            self.link_target = ''
+            self.link_has_text = False
+        elif tag == 'ri:page' and self.link_target is not None:
+            self.link_target = attrs.get('ri:content-title', '')
+        elif tag == 'ri:attachment' and self.link_target is None and not self.dropping():
+            self.emit(f" [image: {attrs.get('ri:filename', '')}] ")
+        elif tag in STORAGE_BLOCK_TAGS:
+            if self.cell is not None:
+                self.cell.append(' ')
+            else:
+                self.end_line()
+    
+    def handle_endtag(self, tag):
+        if tag in STORAGE_SKIPPED_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag == 'ac:structured-macro':
+            name = self.macros.pop() if self.macros else ''
+            if name in STORAGE_ADMONITION_MACROS or name in STORAGE_CODE_MACROS:
+                self.end_line()
+                self.prefix = ''
+        elif re.fullmatch(r'h[1-6]', tag) and self.heading_parts is not None:
+            self.heading = ' '.join(''.join(self.heading_parts).split())
+            self.heading_parts = None
+        elif tag in ('td', 'th') and self.cell is not None:
+            if self.row is not None:
+                self.row.append(' '.join(''.join(self.cell).split()))
+            self.cell = None
+        elif tag == 'tr' and self.row is not None:
+            if any(self.row):
+                self.line.append(' | '.join(self.row))
+            self.end_line()
+            self.row = None
+        elif tag in ('ol', 'ul', 'ac:task-list'):
+            self.end_line()
+            if self.lists:
+                self.lists.pop()
+        elif tag == 'ac:link' and self.link_target is not None:
+            target = self.link_target
+            self.link_target = None
+            if target and not self.link_has_text:
+                self.emit(target)
+        elif tag in STORAGE_BLOCK_TAGS and self.cell is None:
+            self.end_line()
+    
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+    
+    def handle_data(self, data):
+        self.emit(data)
+    
+    def unknown_decl(self, data):
+        # <![CDATA[...]]> holds code macro bodies and plain-text link bodies
+        if not data.startswith('CDATA['):
+            return
+        text = data[len('CDATA['):]
+        if self.macros and self.macros[-1] in STORAGE_CODE_MACROS and not self.dropping():
+            self.end_line()
+            self.lines.extend(line.rstrip() for line in text.strip('\n').splitlines() if line.strip())
+        else:
+            self.emit(text)
+    
+    def close(self):
+        super().close()
+        self.end_section()
+
+def convert_storage(storage_html):
+    """[(heading, text)] sections of structured text for a page's storage-format body"""
+    converter = StorageConverter()
+    converter.feed(storage_html)
+    converter.close()
+    return converter.sections
+
+def sections_to_text(sections):
+    return '\n\n'.join(f"{heading}\n{text}" if heading else text for heading, text in sections)
+
+# Confluence knowledge base cache
+# Labeled pages are kept as structured text in memory, /tmp and S3. A refresh lists
+# page versions only (no bodies) and re-fetches just the pages whose
+# version.number changed. The warm_kb event (scheduled) does the refreshing, so
+# answers read whatever is cached and only a brand-new container with no /tmp
+# and no S3 copy ever waits on Confluence.
+KB_LABEL = 'foritchatbot'
+KB_CACHE_BUCKET = os.environ.get('KB_CACHE_BUCKET', 'brie-it-agent-cache')
+KB_CACHE_KEY = os.environ.get('KB_CACHE_KEY', 'confluence/kb.json.gz')
+KB_CACHE_PATH = '/tmp/confluence-kb.json.gz'
+KB_MEMORY_TTL_SECONDS = 300  # how often a warm container re-checks S3 for a newer KB
+KB_MANIFEST_KEY = os.environ.get('KB_MANIFEST_KEY', 'confluence/kb-manifest.json')
+KB_PAGE_SIZE = 50
+KB_FETCH_CONCURRENCY = int(os.environ.get('KB_FETCH_CONCURRENCY', '6'))
+KB_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+kb_cache = {'kb': None, 'etag': None, 'checked_at': 0}
+kb_refresh_lock = threading.Lock()
+
+def confluence_auth_header():
+    auth_string = f"{CONFLUENCE_EMAIL}:{CONFLUENCE_API_TOKEN}"
+    return 'Basic ' + base64.b64encode(auth_string.encode('ascii')).decode('ascii')
+
+def confluence_get(path_and_query):
+    """GET a Confluence REST path and return parsed JSON"""
+    req = urllib.request.Request(f"{CONFLUENCE_BASE_URL}{path_and_query}")
+    req.add_header('Authorization', confluence_auth_header())
+    req.add_header('Accept', 'application/json')
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+def kb_version_of(pages):
+    """Stable identifier of a KB state: changes whenever any page is added, removed or edited"""
+    signature = f"v{KB_FORMAT_VERSION}," + ','.join(f"{page_id}:{pages[page_id]['version']}" for page_id in sorted(pages))
+    return hashlib.sha256(signature.encode('utf-8')).hexdigest()[:16]
+
+def confluence_get_all(path_and_query):
+    """Every result of a paged Confluence listing, following _links.next"""
+    results = []
+    while path_and_query:
+        data = confluence_get(path_and_query)
+        results.extend(data.get('results', []))
+        path_and_query = data.get('_links', {}).get('next')
+    return results
+
+def list_kb_page_versions():
+    """{page_id: version number} for every labeled page - metadata only, no bodies"""
+    query = urllib.parse.urlencode({'cql': f'label={KB_LABEL}', 'expand': 'version', 'limit': KB_PAGE_SIZE})
+    return {page['id']: page.get('version', {}).get('number', 0)
+            for page in confluence_get_all(f"/rest/api/content/search?{query}")}
+
+def list_page_attachments(page_id):
+    """Normalized attachment metadata for a page"""
+    query = urllib.parse.urlencode({'limit': KB_PAGE_SIZE, 'expand': 'version'})
+    return [{
+        'id': attachment['id'],
+        'title': attachment.get('title', ''),
+        'media_type': attachment.get('metadata', {}).get('mediaType', '') or attachment.get('extensions', {}).get('mediaType', ''),
+        'file_size': attachment.get('extensions', {}).get('fileSize'),
+        'version': attachment.get('version', {}).get('number', 0),
+        'download_url': f"{CONFLUENCE_BASE_URL}{attachment['_links']['download']}"
+    } for attachment in confluence_get_all(f"/rest/api/content/{page_id}/child/attachment?{query}")]
+
+def download_confluence_attachment(download_url):
+    req = urllib.request.Request(download_url)
+    req.add_header('Authorization', confluence_auth_header())
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return response.read()
+
+# Content-addressed image cache: bytes stored under their sha256 in /tmp and S3
+IMAGE_CACHE_DIR = '/tmp/confluence-images'
+IMAGE_CACHE_PREFIX = os.environ.get('IMAGE_CACHE_PREFIX', 'confluence/images/')
+
+def put_cached_image(image_bytes):
+    """Store image bytes by content hash and return the hash"""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    path = os.path.join(IMAGE_CACHE_DIR, digest)
+    if not os.path.exists(path):
+        try:
+            os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(image_bytes)
+        except OSError as e:
+            logger.warning('⚠️ Could not write image to /tmp: %s', e)
+        try:
+            boto3.client('s3').put_object(Bucket=KB_CACHE_BUCKET, Key=IMAGE_CACHE_PREFIX + digest, Body=image_bytes)
+        except Exception as e:
+            logger.warning('⚠️ Could not write image to S3: %s', e)
+    return digest
+
+def get_cached_image(digest):
+    """Image bytes for a content hash from /tmp or S3, None if neither has them"""
+    path = os.path.join(IMAGE_CACHE_DIR, digest)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        pass
+    try:
+        image_bytes = boto3.client('s3').get_object(Bucket=KB_CACHE_BUCKET, Key=IMAGE_CACHE_PREFIX + digest)['Body'].read()
     except Exception as e:
-        print(f"Error fetching Confluence content: {e}")
-        return ""
+        logger.warning('⚠️ Image %s not in S3: %s', digest[:12], e)
+        return None
+    if hashlib.sha256(image_bytes).hexdigest() != digest:
+        return None
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(image_bytes)
+    except OSError:
+        pass
+    return image_bytes
+
+def fetch_kb_page(page_id, previous=None):
+    """Body and attachment listing for one page, normalized for the KB artifact
+    
+    Image attachments are copied into the content-addressed image cache and get a
+    'sha256'; ones already cached at the same version (per previous) are not downloaded again.
+    """
+    started = time.time()
+    page = confluence_get(f"/rest/api/content/{page_id}?expand=body.storage,version")
+    storage = page.get('body', {}).get('storage', {}).get('value', '')
+    attachments = list_page_attachments(page_id)
+    known = {(a['id'], a['version']): a.get('sha256') for a in (previous or {}).get('attachments', [])}
+    for attachment in attachments:
+        if not attachment['media_type'].startswith('image/') or (attachment['file_size'] or 0) > KB_IMAGE_MAX_BYTES:
+            continue
+        try:
+            attachment['sha256'] = known.get((attachment['id'], attachment['version'])) or \
+                put_cached_image(download_confluence_attachment(attachment['download_url']))
+        except Exception as e:
+            logger.warning('⚠️ Could not cache image %s from page %s: %s', attachment['title'], page_id, e)
+    sections = convert_storage(storage)
+    return {
+        'id': page_id,
+        'title': page.get('title', ''),
+        'version': page.get('version', {}).get('number', 0),
+        'url': f"{CONFLUENCE_BASE_URL}{page.get('_links', {}).get('webui', '')}",
+        'text': sections_to_text(sections),
+        'sections': sections,
+        'attachments': attachments,
+        'fetch_ms': int((time.time() - started) * 1000)
+    }
+
+def build_kb_manifest(pages):
+    """Per-page version, content checksum and fetch timing, plus a checksum over all of it"""
+    entries = {
+        page_id: {
+            'title': page['title'],
+            'version': page['version'],
+            'sha256': hashlib.sha256(page['text'].encode('utf-8')).hexdigest(),
+            'attachments': len(page.get('attachments', [])),
+            'fetch_ms': page.get('fetch_ms')
+        } for page_id, page in sorted(pages.items())
+    }
+    checksum = hashlib.sha256(json.dumps(
+        {page_id: [entry['version'], entry['sha256']] for page_id, entry in entries.items()}, sort_keys=True
+    ).encode('utf-8')).hexdigest()
+    return {'checksum': checksum, 'page_count': len(entries), 'pages': entries}
+
+def save_kb(kb):
+    """Write the KB to /tmp and S3"""
+    blob = gzip.compress(json.dumps(kb).encode('utf-8'))
+    try:
+        with open(KB_CACHE_PATH, 'wb') as f:
+            f.write(blob)
+    except OSError as e:
+        logger.warning('⚠️ Could not write KB to /tmp: %s', e)
+    try:
+        s3 = boto3.client('s3')
+        result = s3.put_object(Bucket=KB_CACHE_BUCKET, Key=KB_CACHE_KEY, Body=blob)
+        kb_cache['etag'] = result.get('ETag')
+        if kb.get('manifest'):
+            s3.put_object(Bucket=KB_CACHE_BUCKET, Key=KB_MANIFEST_KEY, Body=json.dumps(kb['manifest'], indent=2).encode('utf-8'),
+                          ContentType='application/json')
+    except Exception as e:
+        logger.warning('⚠️ Could not write KB to S3: %s', e)
 
-def get_confluence_images(page_id):
-    """Get image attachments from a Confluence page"""
+def load_kb_from_storage():
+    """Newest KB from S3 (conditional on ETag), else /tmp; None if neither has one"""
+    try:
+        params = {'Bucket': KB_CACHE_BUCKET, 'Key': KB_CACHE_KEY}
+        if kb_cache['etag'] and kb_cache['kb']:
+            params['IfNoneMatch'] = kb_cache['etag']
+        obj = boto3.client('s3').get_object(**params)
+        kb = json.loads(gzip.decompress(obj['Body'].read()).decode('utf-8'))
+        kb_cache['etag'] = obj.get('ETag')
+        return kb
+    except Exception as e:
+        code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+        if code in ('304', 'NotModified'):
+            return kb_cache['kb']
+        logger.warning('⚠️ KB not available from S3: %s', e)
     try:
-        auth_string = f"{CONFLUENCE_EMAIL}:{CONFLUENCE_API_TOKEN}"
-        auth_b64 = base64.b64encode(auth_string.encode('ascii')).decode('ascii')
+        with open(KB_CACHE_PATH, 'rb') as f:
+            return json.loads(gzip.decompress(f.read()).decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+
+def refresh_kb():
+    """Bring the KB up to date with Confluence, fetching only changed pages"""
+    with kb_refresh_lock:
+        started = time.time()
+        kb = kb_cache['kb'] or load_kb_from_storage() or {'kb_version': None, 'pages': {}}
+        # Pages converted by an older StorageConverter are all fetched again
+        pages = dict(kb['pages']) if kb.get('format') == KB_FORMAT_VERSION else {}
+        versions = list_kb_page_versions()
         
-        url = f"{CONFLUENCE_BASE_URL}/rest/api/content/{page_id}/child/attachment"
-        req = urllib.request.Request(url)
-        req.add_header('Authorization', f'Basic {auth_b64}')
-        req.add_header('Accept', 'application/json')
+        changed = [page_id for page_id, version in versions.items()
+                   if pages.get(page_id, {}).get('version') != version]
+        removed = [page_id for page_id in pages if page_id not in versions]
+        for page_id in removed:
+            del pages[page_id]
+        failed = []
+        with ThreadPoolExecutor(max_workers=KB_FETCH_CONCURRENCY) as executor:
+            futures = {executor.submit(fetch_kb_page, page_id, pages.get(page_id)): page_id for page_id in changed}
+            for future, page_id in futures.items():
+                try:
+                    pages[page_id] = future.result()
+                except Exception as e:
+                    # Keep the previous copy (if any) and try again on the next refresh
+                    logger.error('Error fetching Confluence page %s: %s', page_id, e)
+                    failed.append(page_id)
+        changed = [page_id for page_id in changed if page_id not in failed]
         
-        with urllib.request.urlopen(req) as response:
-            data = json.loads(response.read().decode('utf-8'))
-            images = []
-            for attachment in data.get('results', []):
-                if attachment.get('metadata', {}).get('mediaType', '').startswith('image/'):
-                    images.append({
-                        'title': attachment.get('title'),
-                        'download_url': f"{CONFLUENCE_BASE_URL}{attachment['_links']['download']}"
-                    })
-            return images[:2]  # Limit to 2 images
+        if changed or removed or not kb.get('kb_version') or 'index' not in kb:
+            kb = {'kb_version': kb_version_of(pages), 'format': KB_FORMAT_VERSION, 'built_at': int(time.time()), 'pages': pages,
+                  'index': build_kb_index(pages), 'manifest': build_kb_manifest(pages)}
+            save_kb(kb)
+        kb_cache['kb'] = kb
+        kb_cache['checked_at'] = time.time()
+        fetch_times = sorted(pages[page_id]['fetch_ms'] for page_id in changed)
+        logger.info('📚 KB %s: %s pages, %s changed, %s removed, %s failed in %.2fs',
+                    kb['kb_version'], len(pages), len(changed), len(removed), len(failed), time.time() - started,
+                    page_fetch_ms={'max': fetch_times[-1], 'median': fetch_times[len(fetch_times) // 2]} if fetch_times else None)
+        return {'kb_version': kb['kb_version'], 'pages': len(pages), 'changed': len(changed),
+                'removed': len(removed), 'failed': failed, 'checksum': kb.get('manifest', {}).get('checksum')}
+
+def get_knowledge_base():
+    """The cached KB for the answer path - never calls Confluence unless there is no copy anywhere"""
+    if kb_cache['kb'] and time.time() - kb_cache['checked_at'] < KB_MEMORY_TTL_SECONDS:
+        return kb_cache['kb']
+    
+    kb = load_kb_from_storage()
+    if kb:
+        kb_cache['kb'] = kb
+        kb_cache['checked_at'] = time.time()
+        return kb
+    
+    try:
+        refresh_kb()
     except Exception as e:
-        print(f"Error getting Confluence images: {e}")
+        logger.error('Error fetching Confluence content: %s', e)
+    return kb_cache['kb'] or {'kb_version': None, 'pages': {}}
+
+# KB retrieval
+# refresh_kb also builds the search artifact stored with the KB: pages split into
+# heading-aware chunks of ~KB_CHUNK_WORDS words plus a BM25 inverted index. Each
+# question then gets only the best chunks that fit KB_CONTEXT_TOKEN_BUDGET.
+KB_CHUNK_WORDS = 180
+KB_CHUNK_OVERLAP_WORDS = 30
+KB_TOP_K = 8
+KB_CONTEXT_TOKEN_BUDGET = int(os.environ.get('KB_CONTEXT_TOKEN_BUDGET', '2500'))
+BM25_K1 = 1.2
+BM25_B = 0.75
+KB_STOPWORDS = frozenset(
+    'a an and are as at be but by can do for from how i if in is it my of on or so that the this to '
+    'was we what when where which who why will with you your me our us'.split()
+)
+
+def kb_tokenize(text):
+    return [t for t in re.findall(r'[a-z0-9]+', text.lower()) if t not in KB_STOPWORDS]
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def chunk_kb_page(page):
+    """Split a page into chunks that never cross a heading; long sections get overlapping windows"""
+    chunks = []
+    for heading, text in page.get('sections') or [('', page['text'])]:
+        # Each word keeps its trailing whitespace so steps and table rows stay on their own lines
+        words = re.findall(r'\S+\s*', text)
+        step = KB_CHUNK_WORDS - KB_CHUNK_OVERLAP_WORDS
+        for start in range(0, max(len(words), 1), step):
+            window = ''.join(words[start:start + KB_CHUNK_WORDS]).strip()
+            if window:
+                chunks.append({
+                    'id': f"{page['id']}#{len(chunks)}",
+                    'page_id': page['id'],
+                    'title': page['title'],
+                    'heading': heading,
+                    'text': window
+                })
+            if start + KB_CHUNK_WORDS >= len(words):
+                break
+    return chunks
+
+def build_kb_index(pages):
+    """Chunks plus a BM25 inverted index {term: [[chunk_index, term_frequency], ...]}"""
+    chunks = []
+    postings = {}
+    lengths = []
+    for page in pages.values():
+        for chunk in chunk_kb_page(page):
+            # The title and heading are searchable too
+            tokens = kb_tokenize(f"{chunk['title']} {chunk['heading']} {chunk['text']}")
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append([len(chunks), count])
+            lengths.append(len(tokens))
+            chunks.append(chunk)
+    return {
+        'chunks': chunks,
+        'lengths': lengths,
+        'avg_length': sum(lengths) / len(lengths) if lengths else 0,
+        'postings': postings
+    }
+
+def search_kb(query, top_k=KB_TOP_K, token_budget=KB_CONTEXT_TOKEN_BUDGET):
+    """Best-scoring chunks for a query, in score order, within the token budget"""
+    index = get_knowledge_base().get('index')
+    if not index or not index['chunks']:
         return []
+    
+    total = len(index['chunks'])
+    scores = {}
+    for term in set(kb_tokenize(query)):
+        postings = index['postings'].get(term)
+        if not postings:
+            continue
+        idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+        for chunk_index, tf in postings:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * index['lengths'][chunk_index] / index['avg_length'])
+            scores[chunk_index] = scores.get(chunk_index, 0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    
+    selected = []
+    used = 0
+    for chunk_index in sorted(scores, key=scores.get, reverse=True)[:top_k]:
+        chunk = index['chunks'][chunk_index]
+        cost = estimate_tokens(chunk['text'])
+        if used + cost > token_budget:
+            continue
+        selected.append(dict(chunk, score=round(scores[chunk_index], 3)))
+        used += cost
+    return selected
+
+def format_kb_context(chunks):
+    """Prompt text for retrieved chunks, each tagged with its source id"""
+    return "\n\n---\n\n".join(
+        f"[SOURCE {chunk['id']}] {chunk['title']}" + (f" > {chunk['heading']}" if chunk['heading'] else '') +
+        f"\n{chunk['text']}" for chunk in chunks
+    )
 
-def upload_to_slack(channel, image_data, filename):
-    """Upload image to Slack"""
+KB_OVERVIEW_MAX_HEADINGS = 12
+kb_overview_cache = {'kb_version': None, 'text': ''}
+
+def kb_overview(kb):
+    """Page titles and their section headings - the same text for every question until the KB changes"""
+    if kb_overview_cache['kb_version'] != kb.get('kb_version') or not kb_overview_cache['text']:
+        lines = []
+        for page in sorted(kb.get('pages', {}).values(), key=lambda page: (page['title'], page['id'])):
+            headings = list(dict.fromkeys(heading for heading, _ in page.get('sections') or [] if heading))
+            lines.append(f"- {page['title']}" + (f": {'; '.join(headings[:KB_OVERVIEW_MAX_HEADINGS])}" if headings else ''))
+        text = "CONFLUENCE KNOWLEDGE BASE CONTENTS (pages and their sections):\n" + "\n".join(lines) if lines else ''
+        kb_overview_cache.update(kb_version=kb.get('kb_version'), text=text)
+    return kb_overview_cache['text']
+
+def kb_sources(chunks):
+    """Distinct pages behind the retrieved chunks, with the chunk ids used from each"""
+    pages = get_knowledge_base()['pages']
+    sources = {}
+    for chunk in chunks:
+        source = sources.setdefault(chunk['page_id'], {
+            'page_id': chunk['page_id'],
+            'title': chunk['title'],
+            'url': pages.get(chunk['page_id'], {}).get('url', ''),
+            'chunk_ids': []
+        })
+        source['chunk_ids'].append(chunk['id'])
+    return list(sources.values())
+
+KB_IMAGES_PER_ANSWER = 2
+
+def kb_images(chunks, limit=KB_IMAGES_PER_ANSWER):
+    """Image attachments that the retrieved chunks themselves show, best chunk first"""
+    pages = get_knowledge_base()['pages']
+    images = []
+    seen = set()
+    for chunk in chunks:
+        attachments = pages.get(chunk['page_id'], {}).get('attachments', [])
+        for filename in re.findall(r'\[image: ([^\]]+)\]', chunk['text']):
+            for attachment in attachments:
+                if attachment['title'] == filename and attachment['media_type'].startswith('image/') \
+                        and attachment['id'] not in seen:
+                    seen.add(attachment['id'])
+                    images.append({'title': attachment['title'], 'download_url': attachment['download_url'],
+                                   'sha256': attachment.get('sha256'), 'page_id': chunk['page_id']})
+        if len(images) >= limit:
+            break
+    return images[:limit]
+
+# Slack file uploads
+# files.getUploadURLExternal + completeUploadExternal with raw bytes. Every upload is
+# remembered by content hash (and by source URL for Confluence attachments), so an
+# image Slack already has is shared by reference in an image block instead.
+SLACK_FILE_CACHE_TABLE = os.environ.get('SLACK_FILE_CACHE_TABLE', 'brie-slack-file-cache')
+slack_file_ids = {}  # {content_key: file_id}, content_key is 'sha256:<hex>' or 'url:<source url>'
+
+def get_cached_slack_file(content_key):
+    if content_key in slack_file_ids:
+        return slack_file_ids[content_key]
     try:
-        boundary = f"----WebKitFormBoundary{uuid.uuid4().hex[:16]}"
-        body = []
-        body.append(f'--{boundary}'.encode())
-        body.append(f'Content-Disposition: form-data; name="channels"'.encode())
-        body.append(b'')
-        body.append(channel.encode())
-        body.append(f'--{boundary}'.encode())
-        body.append(f'Content-Disposition: form-data; name="file"; filename="{filename}"'.encode())
-        body.append(b'Content-Type: image/png')
-        body.append(b'')
-        body.append(base64.b64decode(image_data))
-        body.append(f'--{boundary}--'.encode())
-        body_bytes = b'\r\n'.join(body)
-        
-        req = urllib.request.Request('https://slack.com/api/files.upload', data=body_bytes)
-        req.add_header('Authorization', f'Bearer {SLACK_BOT_TOKEN}')
-        req.add_header('Content-Type', f'multipart/form-data; boundary={boundary}')
-        
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            return result.get('ok', False)
+        item = dynamodb.Table(SLACK_FILE_CACHE_TABLE).get_item(Key={'content_key': content_key}).get('Item')
+        if item:
+            slack_file_ids[content_key] = item['file_id']
+            return item['file_id']
     except Exception as e:
-        print(f"Error uploading to Slack: {e}")
-        return False
+        logger.warning('⚠️ Slack file cache lookup failed: %s', e)
+    return None
 
-def send_slack_message(channel, text, blocks=None, thread_ts=None):
-    """Send message to Slack using Web API"""
+def remember_slack_file(content_keys, file_id):
+    for content_key in content_keys:
+        slack_file_ids[content_key] = file_id
+        try:
+            dynamodb.Table(SLACK_FILE_CACHE_TABLE).put_item(Item={'content_key': content_key, 'file_id': file_id})
+        except Exception as e:
+            logger.warning('⚠️ Could not cache Slack file %s: %s', file_id, e)
+
+def share_slack_file(channel, file_id, title):
+    """Post an already-uploaded file by reference"""
+    result = slack_outbox.post({
+        'channel': channel,
+        'text': title,
+        'blocks': [{'type': 'image', 'slack_file': {'id': file_id}, 'alt_text': title, 'title': {'type': 'plain_text', 'text': title}}]
+    }).result()
+    return result.get('ok', False)
+
+def upload_to_slack(channel, image_bytes, filename, source_url=None):
+    """Share an image in a channel, uploading it only if Slack doesn't already have it"""
+    # Keep uploads in order with text queued for the same channel
+    slack_outbox.flush(channel)
+    content_keys = [f"sha256:{hashlib.sha256(image_bytes).hexdigest()}"]
+    if source_url:
+        content_keys.append(f"url:{source_url}")
+    
+    file_id = get_cached_slack_file(content_keys[0])
+    if file_id and share_slack_file(channel, file_id, filename):
+        logger.info('♻️ Reused Slack file %s for %s', file_id, filename)
+        if source_url:
+            remember_slack_file(content_keys[1:], file_id)
+        return True
+    
     try:
-        url = 'https://slack.com/api/chat.postMessage'
-        data = {
-            'channel': channel,
-            'text': text,
-            'as_user': True
-        }
+        ticket = slack_api_call('files.getUploadURLExternal', {'filename': filename, 'length': len(image_bytes)}, form=True)
+        if not ticket.get('ok'):
+            logger.error('❌ files.getUploadURLExternal failed: %s', ticket.get('error'))
+            return False
         
-        if blocks:
-            data['blocks'] = blocks
+        req = urllib.request.Request(ticket['upload_url'], data=image_bytes, method='POST')
+        req.add_header('Content-Type', 'application/octet-stream')
+        call_with_retry('slack_tier4', lambda: urllib.request.urlopen(req, timeout=30).close())
         
-        if thread_ts:
-            data['thread_ts'] = thread_ts
+        result = slack_api_call('files.completeUploadExternal', {
+            'files': json.dumps([{'id': ticket['file_id'], 'title': filename}]),
+            'channel_id': channel
+        }, form=True)
+        if not result.get('ok'):
+            logger.error('❌ files.completeUploadExternal failed: %s', result.get('error'))
+            return False
         
-        headers = {
-            'Authorization': f'Bearer {SLACK_BOT_TOKEN}',
-            'Content-Type': 'application/json'
-        }
-        
-        req = urllib.request.Request(
-            url, 
-            data=json.dumps(data).encode('utf-8'), 
-            headers=headers
-        )
-        
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            return result.get('ok', False)
-            
+        remember_slack_file(content_keys, ticket['file_id'])
+        return True
     except Exception as e:
-        print(f"Error sending Slack message: {e}")
+        logger.error('Error uploading to Slack: %s', e)
         return False
 
-def send_error_recovery_message(channel, error_msg, interaction_id, timestamp, user_id):
-    """Send error message with recovery buttons"""
+def share_confluence_image(channel, image):
+    """Share a Confluence attachment, skipping the download when Slack or the image cache has it"""
+    # Attachment download links carry version/modificationDate, so a changed image gets a new key
+    for content_key in ([f"sha256:{image['sha256']}"] if image.get('sha256') else []) + [f"url:{image['download_url']}"]:
+        file_id = get_cached_slack_file(content_key)
+        if file_id and share_slack_file(channel, file_id, image['title']):
+            return True
+    
+    image_bytes = get_cached_image(image['sha256']) if image.get('sha256') else None
+    if image_bytes is None:
+        image_bytes = download_confluence_attachment(image['download_url'])
+        put_cached_image(image_bytes)
+    return upload_to_slack(channel, image_bytes, image['title'], source_url=image['download_url'])
+
+def send_slack_message(channel, text, blocks=None, thread_ts=None):
+    """Send message to Slack using Web API
+    
+    The message is queued on the outbox; the returned Future resolves to the Slack
+    response, so callers that need the outcome use send_slack_message(...).result()['ok'].
+    """
+    data = {
+        'channel': channel,
+        'text': text,
+        'as_user': True
+    }
+    
+    if blocks:
+        data['blocks'] = blocks
+    
+    if thread_ts:
+        data['thread_ts'] = thread_ts
+    
+    return slack_outbox.post(data)
+
+def send_error_recovery_message(channel, error_msg, interaction_id, timestamp, user_id, status=None):
+    """Send error message with recovery buttons, replacing the status message if given"""
     blocks = [
         {
             "type": "section",
@@ -1274,28 +2539,67 @@ def send_error_recovery_message(channel, error_msg, interaction_id, timestamp, u
             ]
         }
     ]
-    send_slack_message(channel, "", blocks=blocks)
+    if status:
+        status.update(error_msg, blocks=blocks, force=True)
+    else:
+        send_slack_message(channel, "", blocks=blocks)
 
 # Email resolution cache
 email_resolution_cache = {}
 
+def lookup_directory_email(name_or_email):
+    """Resolve a display name or address to an email via the directory mirror (None if unknown or ambiguous)"""
+    user = find_mirror_user(name_or_email)
+    return mirror_user_email(user) if user else None
+
+def resolve_directory_users(emails):
+    """{email: {'found', 'id', 'displayName', 'mail'}} for several addresses in one
+    brie-infrastructure-connector call (a single Graph $batch); {} if it can't be reached"""
+    emails = list(dict.fromkeys(emails))
+    if not emails:
+        return {}
+    try:
+        lambda_client = boto3.client('lambda')
+        response = lambda_client.invoke(
+            FunctionName='brie-infrastructure-connector',
+            InvocationType='RequestResponse',
+            Payload=json.dumps({'action': 'resolve_users', 'user_emails': emails})
+        )
+        result = json.loads(response['Payload'].read())
+        if result.get('statusCode') != 200:
+            logger.warning('⚠️ resolve_users failed: %s', result)
+            return {}
+        users = json.loads(result['body']).get('users', {})
+        logger.info('🔍 Resolved %s of %s address(es) in the directory', sum(1 for u in users.values() if u.get('found')), len(emails))
+        return users
+    except Exception as e:
+        logger.warning('⚠️ Could not resolve users %s: %s', emails, e)
+        return {}
+
 def resolve_user_email(slack_email, display_name, user_id):
     """Resolve user's correct email address via AD lookup if needed"""
     
     # Check cache first
     if user_id in email_resolution_cache:
         cached_email = email_resolution_cache[user_id]
-        print(f"📋 Using cached email for {user_id}: {cached_email}")
+        logger.info('📋 Using cached email for %s: %s', user_id, cached_email)
         return cached_email
     
     # If Slack email is @ever.ag, trust it
     if slack_email and slack_email.endswith('@ever.ag'):
-        print(f"✅ Slack email is @ever.ag, using: {slack_email}")
+        logger.info('✅ Slack email is @ever.ag, using: %s', slack_email)
         email_resolution_cache[user_id] = slack_email
         return slack_email
     
+    # Try the directory mirror before paying for a Lambda round trip to AD
+    mirror_email = lookup_directory_email(display_name)
+    if mirror_email:
+        logger.info('🪞 Resolved %s via directory mirror: %s', display_name, mirror_email)
+        email_resolution_cache[user_id] = mirror_email
+        return mirror_email
+    
     # Otherwise, lookup in AD by display name
-    print(f"🔍 Slack email '{slack_email}' not @ever.ag, looking up in AD: {display_name}")
+    logger.info("🔍 Slack email '%s' not @ever.ag, looking up in AD: %s", slack_email, display_name)
     
     try:
         lambda_client = boto3.client('lambda')
@@ -1314,90 +2618,208 @@ def resolve_user_email(slack_email, display_name, user_id):
             if len(users) == 1:
                 # Single match - use it
                 ad_email = users[0]['mail']
-                print(f"✅ Found single AD match: {ad_email}")
+                logger.info('✅ Found single AD match: %s', ad_email)
                 email_resolution_cache[user_id] = ad_email
                 return ad_email
             elif len(users) > 1:
                 # Multiple matches - try to disambiguate by first name
-                print(f"⚠️ Found {len(users)} AD matches for '{display_name}'")
+                logger.warning("⚠️ Found %s AD matches for '%s'", len(users), display_name)
                 first_name = display_name.split()[0].lower() if display_name else ''
                 
                 for user in users:
                     user_email = user['mail']
                     if user_email.lower().startswith(first_name):
-                        print(f"✅ Matched by first name: {user_email}")
+                        logger.info('✅ Matched by first name: %s', user_email)
                         email_resolution_cache[user_id] = user_email
                         return user_email
                 
                 # Fallback to first match
                 ad_email = users[0]['mail']
-                print(f"⚠️ Using first match: {ad_email}")
+                logger.warning('⚠️ Using first match: %s', ad_email)
                 email_resolution_cache[user_id] = ad_email
                 return ad_email
             else:
                 # No match - fallback to Slack email
-                print(f"⚠️ No AD match for '{display_name}', using Slack email: {slack_email}")
+                logger.warning("⚠️ No AD match for '%s', using Slack email: %s", display_name, slack_email)
                 return slack_email
         else:
-            print(f"❌ AD lookup returned error: {result}")
+            logger.error('❌ AD lookup returned error: %s', result)
             return slack_email
             
     except Exception as e:
-        print(f"❌ AD lookup failed: {e}, using Slack email: {slack_email}")
+        logger.error('❌ AD lookup failed: %s, using Slack email: %s', e, slack_email)
         return slack_email
 
+# Slack user profile store
+# In-container LRU in front of a DynamoDB table (TTL attribute 'expires_at'), so
+# profile lookups and DM channel resolution normally cost no Slack calls at all.
+USER_PROFILE_TABLE = os.environ.get('USER_PROFILE_TABLE', 'brie-slack-user-profiles')
+USER_PROFILE_TTL_SECONDS = int(os.environ.get('USER_PROFILE_TTL_SECONDS', str(24 * 3600)))
+USER_PROFILE_CACHE_SIZE = 1000
+user_profile_cache = OrderedDict()  # {user_id: profile}
+user_profile_lock = threading.Lock()
+
+def profile_from_slack_user(user_info):
+    """Reduce a Slack user object to the fields the bot actually uses"""
+    profile = user_info.get('profile', {})
+    return {
+        'user_id': user_info['id'],
+        'real_name': user_info.get('real_name', '') or profile.get('real_name', '') or profile.get('display_name', ''),
+        'email': profile.get('email') or '',
+        'tz': user_info.get('tz') or '',
+        'dm_channel': ''
+    }
+
+def remember_user_profile(profile, persist=True):
+    """Put a profile in the LRU and (optionally) the DynamoDB table"""
+    profile['expires_at'] = int(time.time()) + USER_PROFILE_TTL_SECONDS
+    with user_profile_lock:
+        user_profile_cache[profile['user_id']] = profile
+        user_profile_cache.move_to_end(profile['user_id'])
+        while len(user_profile_cache) > USER_PROFILE_CACHE_SIZE:
+            user_profile_cache.popitem(last=False)
+    if persist:
+        try:
+            dynamodb.Table(USER_PROFILE_TABLE).put_item(Item=profile)
+        except Exception as e:
+            logger.warning('⚠️ Could not persist profile for %s: %s', profile['user_id'], e)
+
+def get_user_profile(user_id):
+    """Profile for a Slack user: LRU, then DynamoDB, then users.info"""
+    if not user_id:
+        return None
+    now = int(time.time())
+    
+    with user_profile_lock:
+        profile = user_profile_cache.get(user_id)
+        if profile and profile['expires_at'] > now:
+            user_profile_cache.move_to_end(user_id)
+            return profile
+    
+    item = None
+    try:
+        item = dynamodb.Table(USER_PROFILE_TABLE).get_item(Key={'user_id': user_id}).get('Item')
+        # DynamoDB TTL deletion is lazy, so expired items can still be returned
+        if item and int(item.get('expires_at', 0)) > now:
+            item = {k: decimal_to_number(v) for k, v in item.items()}
+            with user_profile_lock:
+                user_profile_cache[user_id] = item
+                user_profile_cache.move_to_end(user_id)
+            return item
+    except Exception as e:
+        logger.warning('⚠️ Profile table lookup failed for %s: %s', user_id, e)
+    
+    result = slack_api_call('users.info', {'user': user_id}, form=True)
+    if not (result.get('ok') and 'user' in result):
+        logger.error('Failed to get user info for %s: %s', user_id, result.get('error'))
+        return None
+    profile = profile_from_slack_user(result['user'])
+    if item and item.get('dm_channel'):
+        profile['dm_channel'] = item['dm_channel']
+    remember_user_profile(profile)
+    return profile
+
+def get_dm_channel(user_id):
+    """DM channel ID for a user, opening the conversation only if we've never seen it"""
+    profile = get_user_profile(user_id) or {'user_id': user_id, 'real_name': '', 'email': '', 'tz': '', 'dm_channel': ''}
+    if profile.get('dm_channel'):
+        return profile['dm_channel']
+    
+    result = slack_api_call('conversations.open', {'users': user_id})
+    channel = result.get('channel', {}).get('id') if result.get('ok') else None
+    if not channel:
+        logger.warning('⚠️ Could not open DM with %s: %s', user_id, result.get('error'))
+        return None
+    profile['dm_channel'] = channel
+    remember_user_profile(profile)
+    return channel
+
+def record_dm_channel(user_id, channel):
+    """Note a DM channel seen on an inbound event so later prompts don't need conversations.open"""
+    profile = get_user_profile(user_id)
+    if profile and profile.get('dm_channel') != channel:
+        profile['dm_channel'] = channel
+        remember_user_profile(profile)
+
+def prewarm_user_profiles():
+    """Load every active workspace member via users.list into the profile table"""
+    count = 0
+    cursor = None
+    table = dynamodb.Table(USER_PROFILE_TABLE)
+    
+    # put_item replaces whole items, so carry over DM channels we already know about
+    dm_channels = {}
+    scan_kwargs = {'ProjectionExpression': 'user_id, dm_channel'}
+    while True:
+        page = table.scan(**scan_kwargs)
+        for item in page.get('Items', []):
+            if item.get('dm_channel'):
+                dm_channels[item['user_id']] = item['dm_channel']
+        if 'LastEvaluatedKey' not in page:
+            break
+        scan_kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+    
+    with table.batch_writer(overwrite_by_pkeys=['user_id']) as batch:
+        while True:
+            payload = {'limit': 200}
+            if cursor:
+                payload['cursor'] = cursor
+            result = slack_api_call('users.list', payload, form=True)
+            if not result.get('ok'):
+                logger.error('❌ users.list failed: %s', result.get('error'))
+                break
+            
+            for member in result.get('members', []):
+                if member.get('deleted') or member.get('is_bot') or member.get('id') == 'USLACKBOT':
+                    continue
+                profile = profile_from_slack_user(member)
+                profile['dm_channel'] = dm_channels.get(profile['user_id'], '')
+                remember_user_profile(profile, persist=False)
+                batch.put_item(Item=profile)
+                count += 1
+            
+            cursor = result.get('response_metadata', {}).get('next_cursor')
+            if not cursor:
+                break
+    
+    logger.info('👥 Pre-warmed %s user profiles', count)
+    return count
+
 def get_user_info_from_slack(user_id):
     """Get user name and email from Slack profile"""
     try:
-        url = f'https://slack.com/api/users.info'
-        data = {'user': user_id}
-        headers = {
-            'Authorization': f'Bearer {SLACK_BOT_TOKEN}',
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
+        profile = get_user_profile(user_id)
+        if not profile:
+            return None, None
         
-        encoded_data = urllib.parse.urlencode(data).encode('utf-8')
-        req = urllib.request.Request(url, data=encoded_data, headers=headers)
+        real_name = profile['real_name']
+        email = profile['email']
         
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            
-            print(f"DEBUG - Full Slack API response: {json.dumps(result, indent=2)}")
-            
-            if result.get('ok') and 'user' in result:
-                user_info = result['user']
-                profile = user_info.get('profile', {})
-                
-                real_name = user_info.get('real_name', '') or profile.get('real_name', '') or profile.get('display_name', '')
-                email = profile.get('email')
-                
-                print(f"DEBUG - profile.get('email'): {email}")
-                print(f"DEBUG - real_name: {real_name}")
-                
-                if email and '@' in email:
-                    # Resolve email via AD if needed
-                    resolved_email = resolve_user_email(email, real_name, user_id)
-                    print(f"Using resolved email for user {user_id}: {resolved_email}")
-                    return real_name, resolved_email
-                else:
-                    # Fallback: Generate email from real name
-                    print(f"No email found for user {user_id}, generating from name")
-                    if real_name and ' ' in real_name:
-                        name_parts = real_name.strip().split()
-                        first_name = name_parts[0].lower()
-                        last_name = name_parts[-1].lower()
-                        email = f"{first_name}.{last_name}@ever.ag"
-                        print(f"Generated email: {email}")
-                        return real_name, email
-                    else:
-                        print(f"Cannot generate email from name: {real_name}")
-                        return real_name, None
+        if email and '@' in email:
+            # Resolve email via AD if needed
+            resolved_email = resolve_user_email(email, real_name, user_id)
+            logger.info('Using resolved email for user %s: %s', user_id, resolved_email)
+            return real_name, resolved_email
+        else:
+            # Fallback: directory mirror, then generate email from real name
+            mirror_email = lookup_directory_email(real_name)
+            if mirror_email:
+                logger.info('No Slack email for user %s, resolved via directory mirror: %s', user_id, mirror_email)
+                return real_name, mirror_email
+            logger.info('No email found for user %s, generating from name', user_id)
+            if real_name and ' ' in real_name:
+                name_parts = real_name.strip().split()
+                first_name = name_parts[0].lower()
+                last_name = name_parts[-1].lower()
+                email = f"{first_name}.{last_name}@ever.ag"
+                logger.info('Generated email: %s', email)
+                return real_name, email
             else:
-                print(f"Failed to get user info: {result}")
-                return None, None
-                
+                logger.info('Cannot generate email from name: %s', real_name)
+                return real_name, None
+            
     except Exception as e:
-        print(f"Error getting user info: {e}")
+        logger.error('Error getting user info: %s', e)
         return None, None
 
 def trigger_automation_workflow(user_email, user_name, message, channel, thread_ts, automation_type, user_id=None, interaction_id=None, timestamp=None):
@@ -1445,10 +2867,10 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
         )
         
         extract_result = json.loads(extract_response['Payload'].read())
-        print(f"Extract result: {extract_result}")
+        logger.info('Extract result: %s', extract_result)
         
         if extract_result.get('statusCode') != 200:
-            print(f"❌ Extraction failed: {extract_result}")
+            logger.error('❌ Extraction failed: %s', extract_result)
             return False
         
         # Get request details based on type
@@ -1470,7 +2892,7 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
                 else:
                     target_emails = [user_email]
                 
-                print(f"✅ Parsed {len(target_emails)} user(s) for shared mailbox: {target_emails}")
+                logger.info('✅ Parsed %s user(s) for shared mailbox: %s', len(target_emails), target_emails)
                 
                 # Send approval request
                 msg = "✅ Your shared mailbox request is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
@@ -1502,10 +2924,10 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
                         }
                     })
                 )
-                print(f"✅ Batch shared mailbox approval created for {len(target_emails)} user(s)")
+                logger.info('✅ Batch shared mailbox approval created for %s user(s)', len(target_emails))
                 return True
             else:
-                print("❌ Could not extract mailbox email from message")
+                logger.error('❌ Could not extract mailbox email from message')
                 return False
         
         elif automation_type == 'SSO_GROUP':
@@ -1522,7 +2944,7 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
                 
                 # Parse multiple users
                 target_emails = parse_multiple_users(target_user_string, user_email)
-                print(f"✅ Parsed {len(target_emails)} user(s): {target_emails}")
+                logger.info('✅ Parsed %s user(s): %s', len(target_emails), target_emails)
                 
                 request_details = {
                     'user_emails': target_emails,  # Changed to array
@@ -1530,9 +2952,9 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
                     'action': 'add',
                     'requester': user_email
                 }
-                print(f"✅ Direct SSO extraction: {request_details}")
+                logger.info('✅ Direct SSO extraction: %s', request_details)
             else:
-                print("❌ Could not extract SSO request details")
+                logger.error('❌ Could not extract SSO request details')
                 return False
             
             # Query AD to find actual group name and check membership
@@ -1562,7 +2984,7 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
                 import re
                 cleaned = re.sub(r'\b(sso|group|ad|active directory|distribution list|dl|single sign on|sign on)\b', '', group_search, flags=re.IGNORECASE).strip()
                 if cleaned and cleaned != group_search:
-                    print(f"No matches for '{group_search}', trying '{cleaned}'")
+                    logger.info("No matches for '%s', trying '%s'", group_search, cleaned)
                     matches = query_group_type(cleaned)
             
             if not matches:
@@ -1648,7 +3070,7 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
                     }
                 })
             )
-            print(f"✅ Batch SSO approval created for {len(target_emails)} user(s)")
+            logger.info('✅ Batch SSO approval created for %s user(s)', len(target_emails))
             return True
         
         elif automation_type == 'DISTRIBUTION_LIST':
@@ -1666,8 +3088,8 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
             
             # Parse multiple users
             target_emails = parse_multiple_users(target_user_string, user_email)
-            print(f"✅ Parsed {len(target_emails)} user(s) for DL: {target_emails}")
-            print(f"Searching for distribution list: {group_search}")
+            logger.info('✅ Parsed %s user(s) for DL: %s', len(target_emails), target_emails)
+            logger.info('Searching for distribution list: %s', group_search)
             
             # Search AD/O365 for matching distribution lists
             import threading
@@ -1768,9 +3190,9 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
                     }
                 })
             )
-            print(f"✅ Batch DL approval created for {len(target_emails)} user(s)")
+            logger.info('✅ Batch DL approval created for %s user(s)', len(target_emails))
             return True
-            print(f"✅ DL approval created for {exact_dl}")
+            logger.info('✅ DL approval created for %s', exact_dl)
             return True
         
         else:
@@ -1780,13 +3202,13 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
             
             # Check if approval was created (either directly or nested in result)
             if body.get('approval_id') or (body.get('result') and 'approval_id' in str(body.get('result'))):
-                print(f"✅ Approval already sent by action-processor")
+                logger.info('✅ Approval already sent by action-processor')
                 return True
             
             # Check for sharedMailboxRequest (new format) - create approval
             shared_mailbox_request = extract_result.get('sharedMailboxRequest')
             if shared_mailbox_request:
-                print(f"✅ Shared mailbox request extracted: {shared_mailbox_request}")
+                logger.info('✅ Shared mailbox request extracted: %s', shared_mailbox_request)
                 
                 # Create approval for shared mailbox
                 users = shared_mailbox_request.get('users', [])
@@ -1813,7 +3235,7 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
             # Fallback: extract plan and send approval
             plan = extract_result.get('plan', {})
             if not plan:
-                print("❌ No plan extracted")
+                logger.warning('❌ No plan extracted')
                 return False
             
             # Send approval request
@@ -1834,11 +3256,11 @@ def trigger_automation_workflow(user_email, user_name, message, channel, thread_
                 })
             )
         
-        print(f"✅ Approval request sent")
+        logger.info('✅ Approval request sent')
         return True
         
     except Exception as e:
-        print(f"❌ Error triggering workflow: {e}")
+        logger.error('❌ Error triggering workflow: %s', e)
         import traceback
         traceback.print_exc()
         return False
@@ -1901,13 +3323,13 @@ Email: {user_email}
             
             # Collect images from conversation
             attachments = []
-            print(f"Checking for images in conversation for user {user_id}")
+            logger.info('Checking for images in conversation for user %s', user_id)
             if user_id in user_conversations:
-                print(f"Found {len(user_conversations[user_id])} messages in conversation")
+                logger.info('Found %s messages in conversation', len(user_conversations[user_id]))
                 for i, msg in enumerate(user_conversations[user_id]):
-                    print(f"Message {i}: has_image={msg.get('has_image')}, image_url={msg.get('image_url')}")
+                    logger.info('Message %s: has_image=%s, image_url=%s', i, msg.get('has_image'), msg.get('image_url'))
                     if msg.get('has_image') and msg.get('image_url'):
-                        print(f"Downloading image: {msg['image_url']}")
+                        logger.info('Downloading image: %s', msg['image_url'])
                         image_data = download_slack_image(msg['image_url'])
                         if image_data:
                             # Determine file extension from URL
@@ -1922,13 +3344,13 @@ Email: {user_email}
                                 'data': image_data,
                                 'content_type': f'image/{file_ext}'
                             })
-                            print(f"Added attachment: screenshot_{i+1}.{file_ext}")
+                            logger.info('Added attachment: screenshot_%s.%s', i+1, file_ext)
                         else:
-                            print("Failed to download image data")
+                            logger.error('Failed to download image data')
             else:
-                print("No conversation history found for user")
+                logger.info('No conversation history found for user')
             
-            print(f"Total attachments: {len(attachments)}")
+            logger.info('Total attachments: %s', len(attachments))
             
             if conversation_history and conversation_history != "No previous conversation history":
                 body += f"""FULL CONVERSATION HISTORY:
@@ -1964,10 +3386,8 @@ Reply directly to this email to respond to the user.
                 
                 # Add attachments
                 for attachment in attachments:
-                    # Decode base64 to get raw image bytes
-                    image_bytes = base64.b64decode(attachment['data'])
                     # Create proper image attachment
-                    img = MIMEImage(image_bytes)
+                    img = MIMEImage(attachment['data'])
                     img.add_header(
                         'Content-Disposition',
                         f'attachment; filename="{attachment["filename"]}"'
@@ -1991,57 +3411,43 @@ Reply directly to this email to respond to the user.
                     }
                 )
         except Exception as e:
-            print(f"Email error: {e}")
+            logger.info('Email error: %s', e)
         
         return True
     except Exception as e:
-        print(f"Error saving ticket: {e}")
+        logger.error('Error saving ticket: %s', e)
         return False
 
 def analyze_image_with_claude(image_url, user_message):
     """Analyze uploaded image using Claude Vision"""
     try:
-        print(f"Attempting to analyze image: {image_url}")
-        
-        # Try to download the image from Slack
-        headers = {'Authorization': f'Bearer {SLACK_BOT_TOKEN}'}
-        req = urllib.request.Request(image_url, headers=headers)
+        logger.info('Attempting to analyze image: %s', image_url)
         
+        # Get the image from the screenshot store (downloaded from Slack on first use)
         try:
-            with urllib.request.urlopen(req) as response:
-                if response.status != 200:
-                    print(f"HTTP error downloading image: {response.status}")
-                    return "I can see you uploaded an image, but I'm having trouble downloading it from Slack. Please describe what the image shows."
-                
-                image_data = response.read()
-                print(f"Successfully downloaded image, size: {len(image_data)} bytes")
-                
-                if len(image_data) == 0:
-                    print("Downloaded image is empty")
-                    return "The image appears to be empty. Please try uploading it again or describe what it shows."
-                
-                image_b64 = base64.b64encode(image_data).decode('utf-8')
+            image_data = get_screenshot(image_url)
+            logger.info('Successfully loaded image, size: %s bytes', len(image_data))
+            
+            if len(image_data) == 0:
+                logger.info('Downloaded image is empty')
+                return "The image appears to be empty. Please try uploading it again or describe what it shows."
                 
         except urllib.error.HTTPError as e:
-            print(f"HTTP error downloading image: {e.code} - {e.reason}")
+            logger.info('HTTP error downloading image: %s - %s', e.code, e.reason)
             return "I can see you uploaded an image, but I don't have permission to access it. Please describe what the image shows."
         except Exception as e:
-            print(f"Error downloading image: {e}")
+            logger.error('Error downloading image: %s', e)
             return "I can see you uploaded an image, but I'm having trouble downloading it. Please describe what the image shows."
         
-        # Determine image type from URL or default to PNG
-        if '.jpg' in image_url or '.jpeg' in image_url:
-            media_type = "image/jpeg"
-        elif '.png' in image_url:
-            media_type = "image/png"
-        elif '.gif' in image_url:
-            media_type = "image/gif"
-        elif '.webp' in image_url:
-            media_type = "image/webp"
-        else:
-            media_type = "image/png"  # Default
+        # Real format, bounded size, tiles for very tall/wide captures
+        try:
+            vision_images = prepare_image_for_vision(image_data)
+        except ImageRejected as e:
+            return str(e)
         
-        print(f"Using media type: {media_type}")
+        instructions = "Please analyze this image and extract any relevant technical information. If it's a speed test, provide the download/upload speeds and ping. If it's an error message, describe the error. If it's a network configuration, summarize the key details."
+        if len(vision_images) > 1:
+            instructions += f" The screenshot is split into {len(vision_images)} consecutive parts, in order."
         
         # Prepare Claude Vision request
         request_body = {
@@ -2053,37 +3459,32 @@ def analyze_image_with_claude(image_url, user_message):
                     "content": [
                         {
                             "type": "text",
-                            "text": f"User message: {user_message}\n\nPlease analyze this image and extract any relevant technical information. If it's a speed test, provide the download/upload speeds and ping. If it's an error message, describe the error. If it's a network configuration, summarize the key details."
-                        },
+                            "text": f"User message: {user_message}\n\n{instructions}"
+                        }
+                    ] + [
                         {
                             "type": "image",
                             "source": {
                                 "type": "base64",
-                                "media_type": media_type,
-                                "data": image_b64
+                                "media_type": image['media_type'],
+                                "data": base64.b64encode(image['data']).decode('utf-8')
                             }
-                        }
+                        } for image in vision_images
                     ]
                 }
             ]
         }
         
-        print("Sending image to Claude for analysis...")
+        logger.info('Sending image to Claude for analysis...')
         
-        # Call Claude Vision via Bedrock
-        response = bedrock.invoke_model(
-            modelId="us.anthropic.claude-sonnet-4-20250514-v1:0",
-            body=json.dumps(request_body)
-        )
-        
-        response_body = json.loads(response['body'].read())
-        analysis = response_body['content'][0]['text']
+        # Call Claude Vision via Bedrock - images always get the standard tier
+        analysis = invoke_model_text(MODEL_TIERS['standard'], request_body)
         
-        print(f"Claude analysis successful: {analysis[:100]}...")
+        logger.info('Claude analysis successful: %s...', analysis[:100])
         return analysis
         
     except Exception as e:
-        print(f"Error analyzing image: {e}")
+        logger.error('Error analyzing image: %s', e)
         error_msg = str(e)
         if "ValidationException" in error_msg:
             return "I can see you uploaded an image, but I'm having trouble processing it. This might be due to the image format or size. Please describe what the image shows so I can help you."
@@ -2092,29 +3493,223 @@ def analyze_image_with_claude(image_url, user_message):
         else:
             return "I can see you uploaded an image, but I'm having trouble analyzing it right now. Please describe what the image shows."
         
-        # Call Claude Vision via Bedrock
-        response = bedrock.invoke_model(
-            modelId="us.anthropic.claude-sonnet-4-20250514-v1:0",
-            body=json.dumps(request_body)
-        )
-        
-        response_body = json.loads(response['body'].read())
-        analysis = response_body['content'][0]['text']
+        # Call Claude Vision via Bedrock - images always get the standard tier
+        analysis = invoke_model_text(MODEL_TIERS['standard'], request_body)
         
         return analysis
         
     except Exception as e:
-        print(f"Error analyzing image: {e}")
+        logger.error('Error analyzing image: %s', e)
         return "I can see you uploaded an image, but I'm having trouble analyzing it right now. Please describe what the image shows."
 
-def get_claude_response(user_message, user_name, image_analysis=None):
-    """Get response from Claude Sonnet 4 with Confluence knowledge and optional image analysis"""
+# Answer cache
+# Repeated helpdesk questions (VPN, password reset, printers...) are answered from a
+# DynamoDB table partitioned by kb_version - a KB change starts a fresh partition, so
+# stale answers are never served - with TTL attribute 'expires_at'. Questions are
+# compared as tf-idf vectors (idf from the KB's BM25 index) by cosine similarity, so
+# rewordings hit as well as exact repeats. The current partition is mirrored in memory.
+ANSWER_CACHE_TABLE = os.environ.get('ANSWER_CACHE_TABLE', 'brie-answer-cache')
+ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+ANSWER_CACHE_TTL_SECONDS = int(os.environ.get('ANSWER_CACHE_TTL_SECONDS', str(24 * 3600)))
+ANSWER_CACHE_SIMILARITY = float(os.environ.get('ANSWER_CACHE_SIMILARITY', '0.85'))
+ANSWER_CACHE_RELOAD_SECONDS = 300
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_MIN_TOKENS = 2
+ANSWER_CACHE_MAX_TOKENS = 30  # long questions are usually someone's specific situation
+ANSWER_NAME_PLACEHOLDER = '{{user_first_name}}'
+# Mentions, emails, links, ticket/asset numbers and questions about the user's own
+# account or requests get an answer built for that person - never cached
+PERSONALIZED_QUESTION_PATTERN = re.compile(
+    r'<[@#!]|\S+@\S+\.\w+|https?://|\b\d{4,}\b|'
+    r'\bmy (account|access|request|ticket|approval|group|manager|license|mailbox|permissions?)\b',
+    re.IGNORECASE
+)
+answer_cache = {'kb_version': None, 'entries': OrderedDict(), 'loaded_at': 0}
+answer_cache_lock = threading.Lock()
+answer_cache_metrics = {'lookups': 0, 'hits': 0, 'misses': 0, 'skipped': 0, 'stores': 0}
+answer_cache_metrics_lock = threading.Lock()  # answers are generated on several threads
+
+def record_answer_cache_metric(name):
+    with answer_cache_metrics_lock:
+        answer_cache_metrics[name] += 1
+
+def question_vector(tokens, index):
+    """Unit-length tf-idf vector {term: weight}; unseen terms get the highest idf"""
+    total = len(index['chunks']) if index else 0
+    postings = index['postings'] if index else {}
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    vector = {term: count * math.log(1 + (total - len(postings.get(term, ())) + 0.5) / (len(postings.get(term, ())) + 0.5))
+              for term, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1
+    return {term: weight / norm for term, weight in vector.items()}
+
+def cosine_similarity(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(term, 0) for term, weight in a.items())
+
+def answer_cache_key(tokens):
+    return hashlib.sha256(' '.join(sorted(set(tokens))).encode('utf-8')).hexdigest()[:24]
+
+def answer_mentions_asker(answer, user_name, user_profile=None):
+    """True if the answer contains the asker's full name, email address or Slack ID"""
+    profile = user_profile or {}
+    email = profile.get('email') or ''
+    # A bare first name is the greeting, which store_cached_answer templates instead
+    names = [name for name in (user_name, profile.get('real_name')) if name and ' ' in name.strip()]
+    identifiers = names + [email, email.split('@')[0], profile.get('user_id')]
+    answer = answer.lower()
+    return any(len(identifier.strip()) > 2 and identifier.lower().strip() in answer for identifier in identifiers if identifier)
+
+def is_cacheable_question(user_message, image_analysis, tokens):
+    if image_analysis:
+        return False
+    if not ANSWER_CACHE_MIN_TOKENS <= len(tokens) <= ANSWER_CACHE_MAX_TOKENS:
+        return False
+    return not PERSONALIZED_QUESTION_PATTERN.search(user_message)
+
+def load_answer_cache(kb):
+    """Bring the in-memory mirror in line with the KB version's partition"""
+    with answer_cache_lock:
+        if answer_cache['kb_version'] == kb.get('kb_version') and \
+                time.time() - answer_cache['loaded_at'] < ANSWER_CACHE_RELOAD_SECONDS:
+            return
+        entries = OrderedDict()
+        now = int(time.time())
+        try:
+            params = {
+                'KeyConditionExpression': 'kb_version = :v',
+                'ExpressionAttributeValues': {':v': kb.get('kb_version') or 'none'}
+            }
+            while len(entries) < ANSWER_CACHE_MAX_ENTRIES:
+                response = dynamodb.Table(ANSWER_CACHE_TABLE).query(**params)
+                for item in response.get('Items', []):
+                    if int(item.get('expires_at', 0)) > now:
+                        entry = {k: decimal_to_number(v) for k, v in item.items()}
+                        entry['vector'] = question_vector(entry['tokens'], kb.get('index'))
+                        entries[entry['question_key']] = entry
+                if 'LastEvaluatedKey' not in response:
+                    break
+                params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            logger.warning('⚠️ Answer cache load failed: %s', e)
+        answer_cache.update({'kb_version': kb.get('kb_version'), 'entries': entries, 'loaded_at': time.time()})
+
+def lookup_cached_answer(user_message, user_name, image_analysis=None):
+    """A cached answer dict (answer, sources, images, similarity) or None"""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    started = time.monotonic()
+    tokens = kb_tokenize(user_message)
+    if not is_cacheable_question(user_message, image_analysis, tokens):
+        record_answer_cache_metric('skipped')
+        return None
+    record_answer_cache_metric('lookups')
+    kb = get_knowledge_base()
+    load_answer_cache(kb)
+    
+    with answer_cache_lock:
+        entries = answer_cache['entries']
+        best, similarity = entries.get(answer_cache_key(tokens)), 1.0
+        if best is None:
+            vector = question_vector(tokens, kb.get('index'))
+            similarity = 0
+            for entry in entries.values():
+                score = cosine_similarity(vector, entry['vector'])
+                if score > similarity:
+                    best, similarity = entry, score
+        if best is None or similarity < ANSWER_CACHE_SIMILARITY or best['expires_at'] <= time.time():
+            record_answer_cache_metric('misses')
+            return None
+        entries.move_to_end(best['question_key'])
+    
+    record_answer_cache_metric('hits')
+    first_name = (user_name or '').split(' ')[0] or 'there'
+    logger.info('⚡ Answer cache hit (%.2f) in %.1fms for: %s', similarity, (time.monotonic() - started) * 1000, user_message,
+                cached_question=best['question'])
+    return {
+        'answer': best['answer'].replace(ANSWER_NAME_PLACEHOLDER, first_name),
+        'sources': json.loads(best.get('sources') or '[]'),
+        'images': json.loads(best.get('images') or '[]'),
+        'similarity': round(similarity, 3)
+    }
+
+def store_cached_answer(user_message, user_name, answer, sources=None, images=None, user_profile=None):
+    """Remember a freshly generated answer for the current KB version
+    
+    Answers that name the asker (full name, email or Slack ID, from user_profile)
+    were written for that person and are not stored.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return
+    tokens = kb_tokenize(user_message)
+    if not is_cacheable_question(user_message, None, tokens):
+        return
+    if answer_mentions_asker(answer, user_name, user_profile):
+        logger.info('🙅 Answer mentions the asker, not caching: %s', user_message)
+        return
+    kb = get_knowledge_base()
+    first_name = (user_name or '').split(' ')[0]
+    if len(first_name) > 1:
+        # Answers greet the asker by name; the next asker gets their own
+        answer = re.sub(rf'\b{re.escape(first_name)}\b', ANSWER_NAME_PLACEHOLDER, answer)
+    entry = {
+        'kb_version': kb.get('kb_version') or 'none',
+        'question_key': answer_cache_key(tokens),
+        'question': user_message[:500],
+        'tokens': tokens,
+        'answer': answer,
+        'sources': json.dumps(sources or []),
+        'images': json.dumps(images or []),
+        'created_at': int(time.time()),
+        'expires_at': int(time.time()) + ANSWER_CACHE_TTL_SECONDS
+    }
     try:
-        # Get Confluence content
-        confluence_content = get_confluence_content()
-        
-        # Ever.Ag specific knowledge base
-        company_info = f"""
+        dynamodb.Table(ANSWER_CACHE_TABLE).put_item(Item=entry)
+    except Exception as e:
+        logger.warning('⚠️ Could not store answer in cache: %s', e)
+        return
+    record_answer_cache_metric('stores')
+    with answer_cache_lock:
+        if answer_cache['kb_version'] == kb.get('kb_version'):
+            entries = answer_cache['entries']
+            entries[entry['question_key']] = dict(entry, vector=question_vector(tokens, kb.get('index')))
+            entries.move_to_end(entry['question_key'])
+            while len(entries) > ANSWER_CACHE_MAX_ENTRIES:
+                entries.popitem(last=False)
+
+def emit_answer_cache_metrics():
+    """Print answer cache lookups/hits/misses as CloudWatch embedded metrics, then reset"""
+    with answer_cache_metrics_lock:
+        counts = dict(answer_cache_metrics)
+        for name in answer_cache_metrics:
+            answer_cache_metrics[name] = 0
+    if not any(counts.values()):
+        return
+    values = {f"AnswerCache{name.capitalize()}": count for name, count in counts.items()}
+    units = {name: 'Count' for name in values}
+    if counts['lookups']:
+        values['AnswerCacheHitRate'] = round(100 * counts['hits'] / counts['lookups'], 1)
+        units['AnswerCacheHitRate'] = 'Percent'
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': 'BrieITAgent',
+                'Dimensions': [[]],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, unit in units.items()]
+            }]
+        },
+        **values
+    }))
+
+# Ever.Ag specific knowledge base and instructions. Together with kb_overview this
+# is the stable prompt prefix: byte-identical across requests until the KB changes,
+# and long enough (1024+ tokens) for Bedrock to serve it from the prompt cache.
+HELPDESK_SYSTEM_PROMPT = """You are an IT helpdesk assistant for Ever.Ag. You help employees with technical issues.
+
 Ever.Ag Company IT Information:
 
 PASSWORD RESET:
@@ -2122,7 +3717,7 @@ PASSWORD RESET:
 - Or users can create a ticket by saying "create ticket"
 
 IT SUPPORT CONTACT:
-- Email: itsupport@ever.ag  
+- Email: itsupport@ever.ag
 - Phone: 214-807-0784 (emergencies only)
 
 GENERAL POLICIES:
@@ -2130,25 +3725,12 @@ GENERAL POLICIES:
 - Email domain: @ever.ag
 - Standard business hours support
 
-CONFLUENCE KNOWLEDGE BASE:
-{confluence_content}
-        """
-        
-        # Include image analysis if available
-        message_content = f"User {user_name} asks: {user_message}"
-        if image_analysis:
-            message_content += f"\n\nImage Analysis: {image_analysis}"
-        
-        system_prompt = f"""You are an IT helpdesk assistant for Ever.Ag. You help employees with technical issues.
-
-{company_info}
-
 IMPORTANT INSTRUCTIONS:
-1. Use the Confluence knowledge base above to provide accurate, company-specific troubleshooting steps
+1. Use the Confluence excerpts that follow to provide accurate, company-specific troubleshooting steps
 2. If image analysis is provided, incorporate those details into your response
 3. For speed test results, comment on whether speeds are normal or concerning
 4. If user asks about password reset, tell them to call 214-807-0784 (emergencies only) or say "create ticket"
-5. For ticket creation, tell them to say "create ticket" 
+5. For ticket creation, tell them to say "create ticket"
 6. Provide specific, actionable troubleshooting steps from the knowledge base
 7. Be concise but helpful
 8. Use emojis to make responses friendly
@@ -2156,30 +3738,132 @@ IMPORTANT INSTRUCTIONS:
 
 Always be helpful and professional. Reference the specific procedures from the Confluence documentation when applicable."""
 
-        request_body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 1000,
-            "system": system_prompt,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": message_content
-                }
-            ]
-        }
+def run_answer_stages(stages):
+    """Run {name: fn} concurrently; returns ({name: result, None if it failed}, {name: elapsed ms})"""
+    results, timings = {}, {}
+    
+    def timed(name, fn):
+        started = time.monotonic()
+        try:
+            return fn()
+        finally:
+            timings[name] = round((time.monotonic() - started) * 1000)
+    
+    with ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix='answer-stage') as executor:
+        futures = {name: executor.submit(timed, name, fn) for name, fn in stages.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error('Answer stage %s failed: %s', name, e)
+                results[name] = None
+    return results, timings
+
+def get_claude_response(user_message, user_name, image_analysis=None, on_text=None, answer_meta=None,
+                        on_sources=None, escalate=False, kb_chunks=None, user_profile=None, conversation=None):
+    """Get response from Claude Sonnet 4 with Confluence knowledge and optional image analysis
+    
+    When on_text is given (and streaming is enabled) the answer is streamed and
+    on_text(partial_text) is called as it grows; the complete text is still returned.
+    If answer_meta is a dict it receives 'sources': the Confluence pages and chunk
+    ids that were put in front of the model, and 'images': the attachments those
+    chunks show. on_sources(sources, images) gets the same before the model is invoked.
+    Repeated questions are answered from the answer cache ('cached' is then set in
+    answer_meta) without invoking the model at all. The model tier comes from
+    choose_model_tier; escalate=True (the user clicked "Still need help") skips the
+    cache and the fast tier. answer_meta also receives 'model_tier' and 'route_reason'.
+    kb_chunks, when already retrieved by the caller, replaces the search_kb call.
+    user_profile (get_user_profile) and conversation (earlier turns, as from
+    load_conversation_turns) are added to the question; a follow-up in an ongoing
+    conversation is never answered from or stored in the answer cache.
+    """
+    try:
+        cached = None if escalate or conversation else lookup_cached_answer(user_message, user_name, image_analysis)
+    except Exception as e:
+        logger.warning('⚠️ Answer cache lookup failed: %s', e)
+        cached = None
+    if cached:
+        if answer_meta is not None:
+            answer_meta.update(sources=cached['sources'], images=cached['images'], cached=True)
+        if on_sources:
+            on_sources(cached['sources'], cached['images'])
+        return cached['answer']
+    
+    partial_text = ''
+    try:
+        # Only the Confluence chunks relevant to this question
+        if kb_chunks is None:
+            kb_chunks = search_kb(f"{user_message} {image_analysis or ''}")
+        confluence_content = format_kb_context(kb_chunks)
+        sources, images = kb_sources(kb_chunks), kb_images(kb_chunks)
+        if answer_meta is not None:
+            answer_meta['sources'] = sources
+            answer_meta['images'] = images
+        if on_sources:
+            on_sources(sources, images)
         
-        response = bedrock.invoke_model(
-            modelId="us.anthropic.claude-sonnet-4-20250514-v1:0",
-            body=json.dumps(request_body)
-        )
+        # Include image analysis if available
+        message_content = f"User {user_name} asks: {user_message}"
+        if user_profile and user_profile.get('tz'):
+            message_content = f"User {user_name} (time zone {user_profile['tz']}) asks: {user_message}"
+        if conversation:
+            message_content = "Earlier in this conversation:\n" + "\n".join(conversation) + "\n\n" + message_content
+        if image_analysis:
+            message_content += f"\n\nImage Analysis: {image_analysis}"
+        
+        tier, reason = choose_model_tier(user_message, image_analysis, kb_chunks, escalate)
+        
+        def track_partial(text):
+            nonlocal partial_text
+            # Hold back text that may turn out to be the fast model's ESCALATE reply
+            if text.lstrip().startswith(ESCALATE_TOKEN) or ESCALATE_TOKEN.startswith(text.strip()):
+                return
+            partial_text = text
+            on_text(text)
+        
+        stable_text = "\n\n".join(filter(None, [HELPDESK_SYSTEM_PROMPT, kb_overview(get_knowledge_base())]))
+        
+        def answer_with(tier):
+            # The instructions and KB overview never change; only the excerpts after them do
+            dynamic_text = f"CONFLUENCE KNOWLEDGE BASE (most relevant excerpts):\n{confluence_content}"
+            if tier == 'fast':
+                dynamic_text += f"\n\n{FAST_MODEL_INSTRUCTIONS}"
+            request_body = {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 1000,
+                "system": cached_system_prompt(stable_text, dynamic_text),
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": message_content
+                    }
+                ]
+            }
+            if on_text and BEDROCK_STREAMING:
+                return invoke_bedrock_stream(track_partial, modelId=MODEL_TIERS[tier], body=json.dumps(request_body))
+            return invoke_model_text(MODEL_TIERS[tier], request_body)
         
-        response_body = json.loads(response['body'].read())
-        claude_response = response_body['content'][0]['text']
+        claude_response = answer_with(tier)
+        if tier == 'fast' and claude_response.strip().startswith(ESCALATE_TOKEN):
+            logger.info('⬆️ Fast model escalated: %s', user_message)
+            tier, reason = 'standard', 'fast_model_escalated'
+            claude_response = answer_with(tier)
+        logger.info('🧭 Answered with %s model (%s)', tier, reason)
+        if answer_meta is not None:
+            answer_meta.update(model_tier=tier, route_reason=reason)
         
+        if not conversation:
+            store_cached_answer(user_message, user_name, claude_response, sources, images, user_profile)
         return claude_response
         
     except Exception as e:
-        print(f"Error calling Claude: {e}")
+        logger.error('Error calling Claude: %s', e)
+        if isinstance(e, BedrockDeadlineExceeded) and len(e.partial_text) > len(partial_text) and \
+                not e.partial_text.lstrip().startswith(ESCALATE_TOKEN):
+            partial_text = e.partial_text
+        if partial_text:
+            # The user has already seen this much - keep it rather than replacing it with the fallback
+            return partial_text + "\n\n_(My answer was cut off - say \"create ticket\" if you need more help.)_"
         return """I'm having trouble processing your request right now. 
 
 For immediate help:
@@ -2189,52 +3873,1424 @@ For immediate help:
 
 I'll be back online shortly!"""
 
-def lambda_handler(event, context):
-    """Main Lambda handler"""
-    print(f"Received event: {json.dumps(event)}")
+# Slack event ingestion
+# The HTTP path only verifies, dedups and enqueues, then returns 200 well inside
+# Slack's 3 s retry window. Routing (handle_slack_event) runs in the worker tier:
+# this same function consuming INGEST_QUEUE_URL via an SQS event source mapping
+# (ReportBatchItemFailures enabled). Without a queue URL, each event is handed to
+# an asynchronous invocation of this function (ingest_worker) - the ack never
+# waits for routing either way.
+SLACK_SIGNING_SECRET = os.environ.get('SLACK_SIGNING_SECRET', '')
+# Local development only: accept unsigned requests when no signing secret is set
+ALLOW_UNSIGNED_SLACK_REQUESTS = os.environ.get('ALLOW_UNSIGNED_SLACK_REQUESTS', 'false').lower() == 'true'
+SLACK_SIGNATURE_MAX_AGE_SECONDS = 300
+INGEST_QUEUE_URL = os.environ.get('INGEST_QUEUE_URL', '')
+INGEST_DEDUP_TABLE = os.environ.get('INGEST_DEDUP_TABLE', 'brie-slack-event-dedup')
+INGEST_DEDUP_TTL_SECONDS = 3600
+INGEST_WORKER_CONCURRENCY = int(os.environ.get('INGEST_WORKER_CONCURRENCY', '4'))
+BOT_USER_ID = 'U09CEF9E5QB'
+seen_event_ids = OrderedDict()  # {event_id: True}, recent events claimed by this container
+
+def get_header(event, name):
+    """Case-insensitive header lookup (API Gateway and function URLs differ)"""
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def get_raw_body(event):
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    return body
+
+def verify_slack_signature(event):
+    """Check X-Slack-Signature against the signing secret; without a secret every request is rejected"""
+    if not SLACK_SIGNING_SECRET:
+        if ALLOW_UNSIGNED_SLACK_REQUESTS:
+            logger.warning('⚠️ SLACK_SIGNING_SECRET not set - accepting unsigned request (ALLOW_UNSIGNED_SLACK_REQUESTS)')
+            return True
+        logger.error('❌ SLACK_SIGNING_SECRET not set - rejecting Slack request')
+        return False
+    request_ts = get_header(event, 'X-Slack-Request-Timestamp')
+    signature = get_header(event, 'X-Slack-Signature')
+    if not request_ts or not signature:
+        return False
+    try:
+        if abs(time.time() - int(request_ts)) > SLACK_SIGNATURE_MAX_AGE_SECONDS:
+            return False
+    except ValueError:
+        return False
+    base = f"v0:{request_ts}:{get_raw_body(event)}".encode('utf-8')
+    expected = 'v0=' + hmac.new(SLACK_SIGNING_SECRET.encode('utf-8'), base, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def is_bot_or_system_event(slack_event):
+    """Our own posts, other bots and edits/deletes - never routed, prevents loops"""
+    return (slack_event.get('subtype') in ('bot_message', 'message_changed', 'message_deleted') or
+            'bot_id' in slack_event or
+            slack_event.get('user') == BOT_USER_ID)
+
+def claim_slack_event(event_id):
+    """True the first time an event_id is seen (Slack redelivers on timeouts and errors)"""
+    if event_id in seen_event_ids:
+        return False
+    seen_event_ids[event_id] = True
+    while len(seen_event_ids) > 1000:
+        seen_event_ids.popitem(last=False)
+    try:
+        dynamodb.Table(INGEST_DEDUP_TABLE).put_item(
+            Item={'event_id': event_id, 'expires_at': int(time.time()) + INGEST_DEDUP_TTL_SECONDS},
+            ConditionExpression='attribute_not_exists(event_id)'
+        )
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        # Fail open - a rare duplicate is better than a dropped message
+        logger.warning('⚠️ Dedup table unavailable, accepting %s: %s', event_id, e)
+    return True
+
+def release_slack_event(event_id):
+    """Forget a claim so Slack's retry of this event is accepted"""
+    seen_event_ids.pop(event_id, None)
+    try:
+        dynamodb.Table(INGEST_DEDUP_TABLE).delete_item(Key={'event_id': event_id})
+    except Exception as e:
+        logger.warning('⚠️ Could not release %s: %s', event_id, e)
+
+def enqueue_slack_event(body, context):
+    """Hand an event to the worker tier"""
+    slack_event = body['event']
+    message = {'event_id': body.get('event_id'), 'slack_event': slack_event, 'received_at': time.time()}
+    if not INGEST_QUEUE_URL:
+        boto3.client('lambda').invoke(
+            FunctionName=context.function_name,
+            InvocationType='Event',
+            Payload=json.dumps({'ingest_worker': True, 'message': message})
+        )
+        return
+    
+    params = {'QueueUrl': INGEST_QUEUE_URL, 'MessageBody': json.dumps(message)}
+    if INGEST_QUEUE_URL.endswith('.fifo'):
+        # One group per conversation keeps a user's messages in order
+        params['MessageGroupId'] = slack_event.get('user') or slack_event.get('channel') or 'default'
+        params['MessageDeduplicationId'] = body.get('event_id') or str(uuid.uuid4())
+    boto3.client('sqs').send_message(**params)
+
+def acknowledge_slack_event(event, body, context):
+    """Thin Events API acknowledger: dedup, enqueue, return"""
+    slack_event = body.get('event', {})
+    if is_bot_or_system_event(slack_event):
+        return {'statusCode': 200, 'body': 'OK'}
+    
+    event_id = body.get('event_id')
+    if event_id and not claim_slack_event(event_id):
+        logger.info('⏭️ Duplicate Slack event %s (retry %s)', event_id, get_header(event, 'X-Slack-Retry-Num'))
+        return {'statusCode': 200, 'body': 'OK'}
     
     try:
-        # Handle callback result from brie-ad-group-manager
-        if event.get('callback_result'):
-            print("📥 Received callback_result from brie-ad-group-manager")
-            result_data = event.get('result_data', {})
-            slack_context = result_data.get('slackContext', {})
-            message = result_data.get('message', '')
-            status = result_data.get('status', '')
-            user_id = slack_context.get('user_id')
-            channel = slack_context.get('channel')
+        enqueue_slack_event(body, context)
+    except Exception as e:
+        logger.error('❌ Could not enqueue %s: %s', event_id, e)
+        if event_id:
+            release_slack_event(event_id)
+        # Non-2xx makes Slack retry the delivery
+        return {'statusCode': 500, 'body': 'Enqueue failed'}
+    
+    return {'statusCode': 200, 'body': 'OK'}
+
+def process_ingest_message(message, context):
+    lag_ms = int((time.time() - message.get('received_at', time.time())) * 1000)
+    logger.info('📥 Processing Slack event %s (%sms after ack)', message.get('event_id'), lag_ms)
+    handle_slack_event(message['slack_event'], context)
+
+def process_ingest_records(records, context):
+    """SQS batch consumer: conversations in parallel, each conversation in order"""
+    groups = OrderedDict()
+    failures = []
+    for record in records:
+        try:
+            message = json.loads(record['body'])
+            slack_event = message.get('slack_event', {})
+        except (TypeError, ValueError, AttributeError) as e:
+            # Only the unreadable record is reported; the rest of the batch goes ahead
+            logger.error('❌ Unreadable ingest record %s: %s', record['messageId'], e)
+            failures.append(record['messageId'])
+            continue
+        key = slack_event.get('user') or slack_event.get('channel') or record['messageId']
+        groups.setdefault(key, []).append((record['messageId'], message))
+    
+    def process_group(items):
+        failed = []
+        for index, (message_id, message) in enumerate(items):
+            try:
+                process_ingest_message(message, context)
+            except Exception as e:
+                logger.error('❌ Worker failed on %s: %s', message_id, e)
+                # Retry this one and everything after it so the conversation stays in order
+                failed = [mid for mid, _ in items[index:]]
+                break
+        return failed
+    
+    with ThreadPoolExecutor(max_workers=INGEST_WORKER_CONCURRENCY) as executor:
+        for failed in executor.map(process_group, groups.values()):
+            failures.extend(failed)
+    
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
+
+def handle_message_event(slack_event, context):
+    """Route a message event (DMs and mentions of the bot)"""
+    user_id = slack_event.get('user')
+    real_name, user_email = get_user_info_from_slack(user_id)
+    user_name = real_name if real_name else f"user_{user_id}"
+    message = slack_event.get('text', '')
+    channel = slack_event.get('channel')
+    if channel and channel.startswith('D'):
+        record_dm_channel(user_id, channel)
+    
+    # Log user's message to conversation history
+    conv_data = user_interaction_ids.get(user_id, {})
+    if conv_data.get('interaction_id'):
+        update_conversation(conv_data['interaction_id'], conv_data['timestamp'], message, from_bot=False)
+    
+    # Send immediate acknowledgment - edited in place if this turns into a Claude answer
+    msg = "🔍 Checking your request..."
+    status = StatusMessage(channel)
+    status.update(msg)
+    if conv_data.get('interaction_id'):
+        update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+    
+    # Check if user has pending group selection
+    actions_table = dynamodb.Table('it-actions')
+    pending_items = actions_table.scan(
+        FilterExpression='requester = :email AND #status = :status',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={':email': user_email, ':status': 'PENDING_SELECTION'}
+    ).get('Items', [])
+    
+    if pending_items:
+        pending = pending_items[0]
+        similar_groups = pending['details']['similar_groups']
+        
+        # Check if user's message matches one of the groups
+        # Strip Slack link formatting: <http://ever.ag|ever.ag> -> ever.ag
+        import re
+        user_selection = message.strip()
+        logger.debug('Original message: %s', user_selection)
+        user_selection = re.sub(r'<http[s]?://([^|>]+)\|([^>]+)>', r'\2', user_selection)
+        user_selection = re.sub(r'<http[s]?://([^>]+)>', r'\1', user_selection)
+        logger.debug('After stripping links: %s', user_selection)
+        
+        # Try exact match first
+        matched_group = None
+        if user_selection in similar_groups:
+            matched_group = user_selection
+        else:
+            # Try case-insensitive match
+            user_lower = user_selection.lower()
+            for group in similar_groups:
+                if group.lower() == user_lower:
+                    matched_group = group
+                    break
+        
+        logger.debug('Matched group: %s', matched_group)
+        
+        if matched_group:
+            # User selected a valid group
+            msg = f"✅ Got it! Processing your request for **{matched_group}**..."
+            send_slack_message(channel, msg)
             
-            print(f"DEBUG callback: user_id={user_id}, channel={channel}, status={status}")
-            print(f"DEBUG callback: message={message[:100]}")
+            # Log to conversation history
+            conv_data = user_interaction_ids.get(user_id, {})
+            if conv_data.get('interaction_id'):
+                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
             
-            if (user_id or channel) and message:
-                # Find active conversation
-                timeout_timestamp = int((datetime.utcnow() - timedelta(minutes=CONVERSATION_TIMEOUT_MINUTES)).timestamp())
-                
-                # Build filter expression based on available data
-                if user_id:
-                    filter_expr = 'user_id = :uid AND #ts > :timeout AND awaiting_approval = :awaiting'
-                    expr_values = {':uid': user_id, ':timeout': timeout_timestamp, ':awaiting': True}
-                    print(f"DEBUG: Searching by user_id={user_id}")
-                else:
-                    # Fallback: search by recent conversations and match channel in metadata
-                    filter_expr = '#ts > :timeout AND awaiting_approval = :awaiting'
-                    expr_values = {':timeout': timeout_timestamp, ':awaiting': True}
-                    print(f"DEBUG: Searching by channel (no user_id)")
+            # Delete pending selection
+            actions_table.delete_item(Key={'action_id': pending['action_id']})
+            
+            # Check the type of request
+            request_type = pending['details'].get('type', 'SSO_GROUP')
+            
+            # Bypass action processor - we already have the exact group name
+            # Directly create approval request
+            lambda_client = boto3.client('lambda')
+            
+            request_details = {
+                'user_email': user_email,
+                'group_name': matched_group,
+                'action': 'add',
+                'requester': user_email
+            }
+            
+            if request_type == 'DISTRIBUTION_LIST':
+                email_data = {
+                    'sender': user_email,
+                    'subject': f'Distribution List Access Request: {matched_group}',
+                    'body': f'User {user_name} ({user_email}) requests access to {matched_group}',
+                    'messageId': f'slack_{channel}_{int(datetime.utcnow().timestamp())}',
+                    'source': 'it-helpdesk-bot',
+                    'slackContext': {
+                        'channel': channel,
+                        'thread_ts': slack_event.get('ts', ''),
+                        'user_name': user_name,
+                        'user_id': user_id
+                    }
+                }
                 
-                response = interactions_table.scan(
-                    FilterExpression=filter_expr,
-                    ExpressionAttributeNames={'#ts': 'timestamp'},
-                    ExpressionAttributeValues=expr_values
+                approval_response = lambda_client.invoke(
+                    FunctionName='it-approval-system',
+                    InvocationType='Event',
+                    Payload=json.dumps({
+                        "action": "create_approval",
+                        "approvalType": "DISTRIBUTION_LIST",
+                        "requester": user_email,
+                        "request_type": "Distribution List Access",
+                        "details": f"User: {user_email}\nDistribution List: {matched_group}\nAction: Add",
+                        "callback_function": "brie-infrastructure-connector",
+                        "callback_params": {
+                            "action": "add_user_to_group",
+                            "user_email": user_email,
+                            "group_name": matched_group,
+                            "emailData": email_data,
+                            "interaction_id": str(conv_data.get('interaction_id')) if conv_data.get('interaction_id') else None,
+                            "timestamp": int(conv_data.get('timestamp')) if conv_data.get('timestamp') else None
+                        }
+                    })
                 )
+                msg = f"✅ Your distribution list request is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
+            else:
+                # SSO Group
+                email_data = {
+                    'sender': user_email,
+                    'subject': f'SSO Group Access Request: {matched_group}',
+                    'body': f'User {user_name} ({user_email}) requests access to {matched_group}',
+                    'messageId': f'slack_{channel}_{int(datetime.utcnow().timestamp())}',
+                    'source': 'it-helpdesk-bot'
+                }
                 
-                items = response.get('Items', [])
-                print(f"DEBUG: Found {len(items)} conversations awaiting approval")
-                
-                if items:
-                    items.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
+                approval_response = lambda_client.invoke(
+                    FunctionName='it-approval-system',
+                    InvocationType='Event',
+                    Payload=json.dumps({
+                        "action": "create_approval",
+                        "approvalType": "SSO_GROUP",
+                        "requester": user_email,
+                        "ssoGroupRequest": request_details,
+                        "emailData": email_data,
+                        "details": f"User: {user_email}\nGroup: {matched_group}\nAction: add",
+                        "callback_function": "brie-ad-group-manager",
+                        "callback_params": {
+                            "ssoGroupRequest": request_details,
+                            "emailData": email_data,
+                            "interaction_id": str(conv_data.get('interaction_id')) if conv_data.get('interaction_id') else None,
+                            "timestamp": int(conv_data.get('timestamp')) if conv_data.get('timestamp') else None
+                        }
+                    })
+                )
+                
+                # Create SSO interaction tracking for callback
+                if conv_data.get('interaction_id'):
+                    logger.info('📝 Creating SSO interaction tracking for %s', conv_data['interaction_id'])
+                    tracking_id = f"sso_tracking_{user_id}_{int(datetime.utcnow().timestamp())}"
+                    actions_table.put_item(Item={
+                        'action_id': tracking_id,
+                        'action_type': 'sso_interaction_tracking',
+                        'interaction_id': conv_data['interaction_id'],
+                        'interaction_timestamp': conv_data['timestamp'],
+                        'user_email': user_email,
+                        'group_name': matched_group,
+                        'timestamp': int(datetime.utcnow().timestamp())
+                    })
+                    logger.info('✅ Created tracking record: %s', tracking_id)
+                
+                msg = f"✅ Your SSO group request is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
+            
+            # Mark conversation as awaiting approval
+            conv_data = user_interaction_ids.get(user_id, {})
+            if conv_data.get('interaction_id'):
+                mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
+            
+            send_slack_message(channel, msg)
+            
+            if conv_data.get('interaction_id'):
+                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+            
+            return {'statusCode': 200, 'body': 'OK'}
+        else:
+            # Invalid selection
+            send_slack_message(channel, f"❌ '{user_selection}' doesn't match any of the groups I showed you. Please reply with the exact group name from the list.")
+            return {'statusCode': 200, 'body': 'OK'}
+    
+    # Check automation requests BEFORE resumption (Issue #72, #89)
+    automation_type = detect_automation_request(message)
+    if automation_type:
+        real_name, user_email = get_user_info_from_slack(user_id)
+        if not user_email:
+            send_slack_message(channel, "❌ Unable to retrieve your email address. Please contact IT directly.")
+            return {'statusCode': 200, 'body': 'OK'}
+        
+        # For automation, create NEW conversation directly (bypass resumption)
+        interaction_id = str(uuid.uuid4())
+        timestamp = int(datetime.utcnow().timestamp())
+        interaction_type = categorize_interaction(message)
+        redacted_message = redact_sensitive_data(message)
+        
+        item = {
+            'interaction_id': interaction_id,
+            'timestamp': timestamp,
+            'user_id': user_id,
+            'user_name': real_name,
+            'interaction_type': interaction_type,
+            'description': redacted_message[:200],
+            'outcome': 'In Progress',
+            'date': datetime.utcnow().isoformat(),
+            'conversation_history': json.dumps([{'timestamp': datetime.utcnow().isoformat(), 'message': redacted_message, 'from': 'user'}]),
+            'metadata': '{}'
+        }
+        interactions_table.put_item(Item=item)
+        user_interaction_ids[user_id] = {'interaction_id': interaction_id, 'timestamp': timestamp}
+        
+        execution_arn = trigger_automation_workflow(user_email, real_name, message, channel, slack_event.get('ts', ''), automation_type, user_id, interaction_id, timestamp)
+        if execution_arn == 'PENDING_SELECTION':
+            return {'statusCode': 200, 'body': 'OK'}
+        conv_data = user_interaction_ids.get(user_id, {})
+        if execution_arn:
+            if conv_data.get('interaction_id'):
+                mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
+                if automation_type == 'SSO_GROUP':
+                    actions_table = dynamodb.Table('it-actions')
+                    actions_table.put_item(Item={'action_id': f"sso_tracking_{user_id}_{int(datetime.now().timestamp())}", 'action_type': 'sso_interaction_tracking', 'interaction_id': conv_data['interaction_id'], 'interaction_timestamp': conv_data['timestamp'], 'user_email': user_email, 'group_name': '', 'timestamp': int(datetime.now().timestamp())})
+            msg = f"✅ Your {automation_type.replace('_', ' ').lower()} request is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
+            send_slack_message(channel, msg)
+            if conv_data.get('interaction_id'):
+                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+        else:
+            msg = "❌ Error processing your request. Please try again or contact IT directly."
+            if conv_data.get('interaction_id'):
+                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+                send_error_recovery_message(channel, msg, conv_data['interaction_id'], conv_data['timestamp'], user_id, status=status)
+            else:
+                send_slack_message(channel, msg)
+        return {'statusCode': 200, 'body': 'OK'}
+    
+    # Track conversation
+    interaction_id, timestamp, is_new, resumption_conv = get_or_create_conversation(user_id, user_name, message)
+    
+    # Check if resumption prompt is needed
+    if resumption_conv:
+        # Show resumption prompt
+        old_description = resumption_conv.get('description', 'your previous issue')
+        prompt_ts = int(datetime.utcnow().timestamp())
+        
+        blocks = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f":wave: Welcome back! I see you had a previous conversation about:\n\n> {old_description}\n\nIs your new message related to this issue?"
+                }
+            },
+            {
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": ":white_check_mark: Yes, same issue", "emoji": True},
+                        "action_id": f"resumeyes_pending_{user_id}_{prompt_ts}",
+                        "style": "primary"
+                    },
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": ":x: No, different issue", "emoji": True},
+                        "action_id": f"resumeno_pending_{user_id}_{prompt_ts}"
+                    }
+                ]
+            }
+        ]
+        
+        send_slack_message(channel, "", blocks=blocks)
+        
+        # Store pending resumption
+        actions_table = dynamodb.Table('it-actions')
+        actions_table.put_item(Item={
+            'action_id': f"pending_resumption_{user_id}_{prompt_ts}",
+            'user_id': user_id,
+            'action_type': 'pending_resumption',
+            'timestamp': prompt_ts,
+            'old_interaction_id': resumption_conv['interaction_id'],
+            'old_timestamp': resumption_conv['timestamp'],
+            'new_message': message,
+            'channel': channel
+        })
+        
+        return {'statusCode': 200, 'body': 'OK'}
+    
+    if not is_new:
+        # Update existing conversation
+        update_conversation(interaction_id, timestamp, message, from_bot=False)
+        
+        # Cancel existing schedules and create new ones (keep original timestamp)
+        cancel_schedules(timestamp, interaction_id)
+        schedule_auto_resolve(interaction_id, timestamp, user_id)
+        
+        # Check if user indicates resolution
+        if detect_resolution(message):
+            cancel_schedules(timestamp, interaction_id)
+            update_conversation(interaction_id, timestamp, message, from_bot=False, outcome='Self-Service Solution')
+    
+    # Store for later use
+    user_interaction_ids[user_id] = {'interaction_id': interaction_id, 'timestamp': timestamp}
+    
+    # Log the full event for debugging
+    logger.debug('Full Slack event', slack_event=slack_event)
+    
+    # Check for image uploads in multiple possible locations
+    files = slack_event.get('files', [])
+    image_url = None
+    image_detected = False
+    
+    # Method 1: Direct files array
+    if files:
+        logger.info('Found files array: %s', files)
+        for file in files:
+            logger.info('File details: %s', file)
+            if file.get('mimetype', '').startswith('image/'):
+                image_detected = True
+                # Try thumbnail URLs first (more likely to be accessible), then private URLs
+                for url_field in ['thumb_720', 'thumb_480', 'thumb_360', 'permalink_public', 'url_private_download', 'url_private']:
+                    if file.get(url_field):
+                        image_url = file[url_field]
+                        logger.info('Found image URL via %s: %s', url_field, image_url)
+                        break
+                if image_url:
+                    break
+    
+    # Method 2: Check if this is a file_share subtype
+    if not image_url and slack_event.get('subtype') == 'file_share':
+        image_detected = True  # We know an image was shared
+        file_info = slack_event.get('file', {})
+        logger.info('File share detected: %s', file_info)
+        if file_info.get('mimetype', '').startswith('image/'):
+            # Try thumbnail URLs first (more likely to be accessible), then private URLs
+            for url_field in ['thumb_720', 'thumb_480', 'thumb_360', 'permalink_public', 'url_private_download', 'url_private']:
+                if file_info.get(url_field):
+                    image_url = file_info[url_field]
+                    logger.info('Found image URL via %s: %s', url_field, image_url)
+                    break
+    
+    # Method 3: Check attachments
+    if not image_url:
+        attachments = slack_event.get('attachments', [])
+        if attachments:
+            logger.info('Found attachments: %s', attachments)
+            for attachment in attachments:
+                if attachment.get('image_url'):
+                    image_detected = True
+                    image_url = attachment.get('image_url')
+                    logger.info('Found image in attachments: %s', image_url)
+                    break
+    
+    logger.info('Processing message from %s: %s', user_name, message)
+    if image_url:
+        logger.info('Image detected with URL: %s', image_url)
+    elif image_detected:
+        logger.info('Image detected but URL not accessible')
+    else:
+        logger.info('No image detected in this message')
+    
+    # Track message for conversation context (include image URL if present)
+    if image_detected and image_url:
+        track_user_message(user_id, message, image_url=image_url)
+    else:
+        track_user_message(user_id, message)
+    message_lower = message.lower()
+    
+    # Check for ticket creation FIRST - don't process with Claude if creating ticket
+    if any(word in message_lower for word in ['create ticket', 'ticket', 'escalate', 'human support']):
+        real_name, user_email = get_user_info_from_slack(user_id)
+        
+        # Get full conversation history
+        conv_data = user_interaction_ids.get(user_id, {})
+        conversation_summary = None
+        if conv_data:
+            conversation_summary = get_conversation_summary(conv_data['interaction_id'], conv_data['timestamp'])
+        
+        # Use conversation summary instead of just previous question
+        ticket_context = conversation_summary if conversation_summary else get_conversation_context(user_id)
+        
+        if save_ticket_to_dynamodb(user_id, real_name, user_email, message, ticket_context):
+            response = f"""✅ **Support Request Submitted**
+
+**Submitted by:** {real_name}
+**From Email:** {user_email}
+**Status:** Sent to itsupport@ever.ag"""
+            
+            if conversation_summary:
+                response += f"\n**Context:** Included full conversation history"
+            
+            response += "\n\nYour request has been submitted to IT Support.\nThey can reply directly to your email: " + user_email
+            
+            send_slack_message(channel, f"🔧 {response}")
+            
+            # Update conversation outcome
+            if conv_data:
+                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], message, from_bot=False, outcome='Ticket Created')
+        else:
+            send_slack_message(channel, "🔧 ❌ Error submitting request. Please try again or call IT Support at 214-807-0784 (emergencies only).")
+        
+        # Return immediately - don't continue to Claude processing
+        return {'statusCode': 200, 'body': 'OK'}
+    
+    # Check for software/subscription requests (NEW software purchases, not access to existing)
+    software_keywords = ['new software', 'request new software', 'purchase software', 'buy software',
+                       'software purchase', 'new subscription', 'request subscription', 
+                       'purchase subscription', 'buy subscription', 'new license',
+                       'purchase license', 'software license purchase']
+    if any(keyword in message_lower for keyword in software_keywords):
+        response = """📋 **Software & Subscription Requests**
+
+For requesting new software or subscriptions, please fill out this form:
+https://everag.gogenuity.com/help_center/workspaces/5806/forms/41983
+
+**Important:**
+• Add as much detail as possible in the form
+• It's highly encouraged to have Finance approval before submitting
+• We will send the request to the Cyber Security team for review
+
+Need help with the form? Just ask!"""
+        send_slack_message(channel, response)
+        return {'statusCode': 200, 'body': 'OK'}
+    
+    # Check if user has a pending group selection
+    real_name, user_email = get_user_info_from_slack(user_id)
+    if user_email:
+        pending_selection = check_pending_group_selection(user_email)
+        logger.debug('Pending selection for %s: %s', user_email, pending_selection)
+        
+        if pending_selection:
+            # User is responding to group selection prompt
+            details = pending_selection.get('details', {})
+            similar_groups = details.get('similar_groups', [])
+            
+            # Check if message matches one of the similar groups
+            selected_group = None
+            for group in similar_groups:
+                if group.lower() == message.strip().lower():
+                    selected_group = group
+                    break
+            
+            if selected_group:
+                # Log user's selection first
+                conv_data = user_interaction_ids.get(user_id, {})
+                if conv_data.get('interaction_id'):
+                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], message, from_bot=False)
+                
+                # User selected a valid group
+                msg = f"✅ Got it! Requesting access to **{selected_group}**..."
+                send_slack_message(channel, msg)
+                
+                # Log bot response
+                if conv_data.get('interaction_id'):
+                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+                
+                # Delete pending selection
+                table = dynamodb.Table('it-actions')
+                table.delete_item(Key={'action_id': pending_selection['action_id']})
+                
+                action = details.get('action', 'add')
+                request_type = details.get('type', 'SSO_GROUP')
+                
+                # Handle based on type
+                if request_type == 'DISTRIBUTION_LIST':
+                    # Get conversation data
+                    conv_data = user_interaction_ids.get(user_id, {})
+                    
+                    # Send DL approval
+                    send_approval_request(user_id, real_name, user_email, selected_group, f"add me to {selected_group}", conv_data)
+                    
+                    # Mark conversation as awaiting approval
+                    if conv_data.get('interaction_id'):
+                        mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
+                    
+                    msg = f"✅ Your request for **{selected_group}** is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
+                    send_slack_message(channel, msg)
+                    
+                    # Log to conversation history
+                    if conv_data.get('interaction_id'):
+                        update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+                    
+                    return {'statusCode': 200, 'body': 'OK'}
+                
+                # SSO Group handling
+                lambda_client = boto3.client('lambda')
+                
+                sso_request = {
+                    'user_email': user_email,
+                    'group_name': selected_group,
+                    'action': action,
+                    'requester': user_email
+                }
+                
+                email_data = {
+                    "sender": user_email,
+                    "subject": f"SSO Group Request from Slack: {real_name}",
+                    "body": f"{action} me to {selected_group}",
+                    "messageId": f"slack_{channel}_{slack_event.get('ts', '')}",
+                    "source": "it-helpdesk-bot",
+                    "slackContext": {
+                        "channel": channel,
+                        "thread_ts": slack_event.get('ts', ''),
+                        "user_name": real_name,
+                        "user_id": user_id
+                    }
+                }
+                
+                # Check if user is already a member before sending approval
+                membership_status = check_membership(user_email, selected_group)
+                
+                if membership_status == "ALREADY_MEMBER":
+                    send_slack_message(channel, f"ℹ️ You're already a member of **{selected_group}**. No action needed!")
+                    return {'statusCode': 200, 'body': 'OK'}
+                elif membership_status == "USER_NOT_FOUND":
+                    send_slack_message(channel, f"❌ Could not find your account in Active Directory. Please contact IT.")
+                    return {'statusCode': 200, 'body': 'OK'}
+                elif membership_status == "GROUP_NOT_FOUND":
+                    send_slack_message(channel, f"❌ Group **{selected_group}** not found in Active Directory.")
+                    return {'statusCode': 200, 'body': 'OK'}
+                elif membership_status == "ERROR":
+                    # If check fails, proceed with approval anyway (fail open)
+                    logger.warning('⚠️ Membership check failed, proceeding with approval')
+                
+                # Send approval request directly
+                conv_data = user_interaction_ids.get(user_id, {})
+                
+                # Store interaction tracking for this approval
+                if conv_data.get('interaction_id'):
+                    actions_table = dynamodb.Table('it-actions')
+                    tracking_id = f"sso_tracking_{user_id}_{int(datetime.now().timestamp())}"
+                    actions_table.put_item(Item={
+                        'action_id': tracking_id,
+                        'action_type': 'sso_interaction_tracking',
+                        'interaction_id': conv_data['interaction_id'],
+                        'interaction_timestamp': conv_data['timestamp'],
+                        'user_email': user_email,
+                        'group_name': selected_group,
+                        'timestamp': int(datetime.now().timestamp())
+                    })
+                
+                approval_response = lambda_client.invoke(
+                    FunctionName='it-approval-system',
+                    InvocationType='Event',
+                    Payload=json.dumps({
+                        "action": "create_approval",
+                        "approvalType": "SSO_GROUP",
+                        "requester": user_email,
+                        "ssoGroupRequest": sso_request,
+                        "emailData": email_data,
+                        "details": f"User: {user_email}\nGroup: {selected_group}\nAction: {action}",
+                        "callback_function": "brie-ad-group-manager",
+                        "callback_params": {
+                            "ssoGroupRequest": sso_request,
+                            "emailData": email_data,
+                            "interaction_id": str(conv_data.get('interaction_id')) if conv_data.get('interaction_id') else None,
+                            "interaction_timestamp": int(conv_data.get('timestamp')) if conv_data.get('timestamp') else None
+                        }
+                    })
+                )
+                
+                # Mark conversation as awaiting approval
+                if conv_data.get('interaction_id'):
+                    logger.info('🔵 SSO PATH: Marking conversation as awaiting approval')
+                    mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
+                
+                msg = f"✅ Your request for **{selected_group}** is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
+                logger.info('🔵 SSO PATH: Sending approval message to Slack')
+                send_slack_message(channel, msg)
+                
+                # Log to conversation history
+                if conv_data.get('interaction_id'):
+                    logger.info('📝 Adding approval message to conversation history: %s', conv_data['interaction_id'])
+                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+                    logger.info('✅ Approval message added to conversation history')
+                else:
+                    logger.warning('⚠️ No interaction_id found in conv_data for SSO approval message')
+                
+                return {'statusCode': 200, 'body': 'OK'}
+            else:
+                # Message doesn't match any of the options
+                send_slack_message(channel, f"❌ '{message}' doesn't match any of the suggested groups. Please reply with the exact group name from the list.")
+                return {'statusCode': 200, 'body': 'OK'}
+    
+    # FAST SELF-SERVICE PATH for "add me" SSO/Group requests (not DL)
+    if 'add me to' in message_lower and any(kw in message_lower for kw in ['sso', ' group', 'ad group', 'active directory']):
+        logger.info('🚀 FAST SELF-SERVICE: SSO/Group request detected')
+        import re
+        
+        # Extract group name from "add me to [group]" - keep full text including sso/group
+        # Strip Slack markdown formatting (*, _, ~) before extraction
+        clean_msg = re.sub(r'[*_~`]', '', message)
+        group_match = re.search(r'add me to (?:the )?(.+)$', clean_msg, re.IGNORECASE)
+        if group_match:
+            group_search = group_match.group(1).strip()
+            logger.info('Searching for group: %s', group_search)
+            
+            # Search with progress indicator
+            import threading
+            search_complete = threading.Event()
+            
+            def send_progress_message():
+                if not search_complete.wait(5):
+                    msg = "🔍 Still working on it, might take up to 30sec."
+                    send_slack_message(channel, msg)
+                    conv_data = user_interaction_ids.get(user_id, {})
+                    if conv_data.get('interaction_id'):
+                        update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+            
+            progress_thread = threading.Thread(target=send_progress_message)
+            progress_thread.start()
+            
+            matches = query_group_type(group_search)
+            search_complete.set()
+            
+            # Try without keywords if no matches
+            if not matches:
+                cleaned = re.sub(r'\b(sso|group|ad|active directory)\b', '', group_search, flags=re.IGNORECASE).strip()
+                if cleaned and cleaned != group_search:
+                    logger.info("No matches for '%s', trying '%s'", group_search, cleaned)
+                    matches = query_group_type(cleaned)
+            
+            if not matches:
+                msg = f"❌ No groups found matching '{group_search}'"
+                send_slack_message(channel, msg)
+                conv_data = user_interaction_ids.get(user_id, {})
+                if conv_data.get('interaction_id'):
+                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+                return {'statusCode': 200, 'body': 'OK'}
+            
+            # Filter to SSO groups only
+            sso_matches = [m for m in matches if m['type'] == 'SSO_GROUP']
+            if not sso_matches:
+                msg = f"❌ No SSO groups found matching '{group_search}'. Found distribution lists instead - try 'add me to {group_search} dl'"
+                send_slack_message(channel, msg)
+                return {'statusCode': 200, 'body': 'OK'}
+            
+            if len(sso_matches) > 1:
+                # Multiple matches - ask user to select
+                group_list = "\n".join([f"• {g['name']}" for g in sso_matches])
+                msg = f"🔍 Found multiple groups matching '{group_search}':\n\n{group_list}\n\nPlease reply with the exact group name you want."
+                send_slack_message(channel, msg)
+                
+                conv_data = user_interaction_ids.get(user_id, {})
+                if conv_data.get('interaction_id'):
+                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+                
+                # Store pending selection
+                table = dynamodb.Table('it-actions')
+                table.put_item(Item={
+                    'action_id': f"pending_selection_{user_email}_{int(datetime.now().timestamp())}",
+                    'requester': user_email,
+                    'status': 'PENDING_SELECTION',
+                    'timestamp': int(datetime.now().timestamp()),
+                    'pending_selection': True,
+                    'details': {
+                        'similar_groups': [g['name'] for g in sso_matches],
+                        'action': 'add',
+                        'channel': channel,
+                        'thread_ts': slack_event.get('ts', ''),
+                        'user_id': user_id,
+                        'type': 'SSO_GROUP'
+                    }
+                })
+                return {'statusCode': 200, 'body': 'OK'}
+            
+            # Single match - check membership and create approval
+            exact_group = sso_matches[0]['name']
+            membership_status = check_membership(user_email, exact_group)
+            
+            if membership_status == "ALREADY_MEMBER":
+                msg = f"ℹ️ You're already a member of **{exact_group}**.\n\nNo changes needed!"
+                send_slack_message(channel, msg)
+                conv_data = user_interaction_ids.get(user_id, {})
+                if conv_data.get('interaction_id'):
+                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+                return {'statusCode': 200, 'body': 'OK'}
+            elif membership_status == "USER_NOT_FOUND":
+                send_slack_message(channel, f"❌ Could not find your account in Active Directory. Please contact IT.")
+                return {'statusCode': 200, 'body': 'OK'}
+            elif membership_status == "GROUP_NOT_FOUND":
+                send_slack_message(channel, f"❌ Group **{exact_group}** not found in Active Directory.")
+                return {'statusCode': 200, 'body': 'OK'}
+            
+            # Create approval request
+            request_details = {
+                'user_email': user_email,
+                'group_name': exact_group,
+                'action': 'add',
+                'requester': user_email
+            }
+            
+            email_data = {
+                'sender': user_email,
+                'subject': f'SSO Group Request: {exact_group}',
+                'body': f'User {real_name} ({user_email}) requests access to {exact_group}',
+                'messageId': f'slack_{channel}_{int(datetime.utcnow().timestamp())}',
+                'source': 'it-helpdesk-bot',
+                'slackContext': {
+                    'channel': channel,
+                    'user_id': user_id,
+                    'user_name': real_name
+                }
+            }
+            
+            lambda_client = boto3.client('lambda')
+            approval_response = lambda_client.invoke(
+                FunctionName='it-approval-system',
+                InvocationType='Event',
+                Payload=json.dumps({
+                    "action": "create_approval",
+                    "approvalType": "SSO_GROUP",
+                    "requester": user_email,
+                    "ssoGroupRequest": request_details,
+                    "emailData": email_data,
+                    "details": f"User: {user_email}\nGroup: {exact_group}\nAction: add",
+                    "callback_function": "brie-ad-group-manager",
+                    "callback_params": {
+                        "ssoGroupRequest": request_details,
+                        "emailData": email_data
+                    }
+                })
+            )
+            
+            # Mark conversation as awaiting approval
+            conv_data = user_interaction_ids.get(user_id, {})
+            if conv_data.get('interaction_id'):
+                mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
+            
+            msg = f"✅ Your SSO group request is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
+            send_slack_message(channel, msg)
+            
+            if conv_data.get('interaction_id'):
+                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+            
+            return {'statusCode': 200, 'body': 'OK'}
+    
+    # OLD DL HANDLER - DISABLED (Issue #75) - Use automation detection instead
+    elif False and any(word in message_lower for word in ['add me to', 'distribution list', 'distro list', 'email group']):
+        logger.info('Distribution list request detected: %s', message)
+        real_name, user_email = get_user_info_from_slack(user_id)
+        distribution_list = extract_distribution_list_name(message)
+        
+        # Search Exchange for matching DLs with progress indicator
+        import threading
+        search_complete = threading.Event()
+        
+        def send_progress_message():
+            if not search_complete.wait(5):
+                msg = "🔍 Still working on it, might take up to 30sec."
+                send_slack_message(channel, msg)
+                conv_data = user_interaction_ids.get(user_id, {})
+                if conv_data.get('interaction_id'):
+                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+        
+        progress_thread = threading.Thread(target=send_progress_message)
+        progress_thread.start()
+        
+        matches = query_group_type(distribution_list)
+        search_complete.set()
+        
+        if not matches:
+            send_slack_message(channel, f"❌ No distribution lists found matching '{distribution_list}'")
+            return {'statusCode': 200, 'body': 'OK'}
+        
+        # Filter to only show DLs
+        dl_matches = [m for m in matches if m['type'] == 'DISTRIBUTION_LIST']
+        
+        if not dl_matches:
+            send_slack_message(channel, f"❌ No distribution lists found matching '{distribution_list}'. Found SSO groups instead - try 'add me to {distribution_list} sso group'")
+            return {'statusCode': 200, 'body': 'OK'}
+        
+        if len(dl_matches) > 1:
+            # Multiple matches - ask user to select
+            group_list = "\n".join([f"• {g['name']}" for g in dl_matches])
+            msg = f"🔍 Found multiple distribution lists matching '{distribution_list}':\n\n{group_list}\n\nPlease reply with the exact list name you want."
+            send_slack_message(channel, msg)
+            
+            # Log to conversation history
+            conv_data = user_interaction_ids.get(user_id, {})
+            if conv_data.get('interaction_id'):
+                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+            
+            # Schedule engagement prompts for this conversation
+            conv_data = user_interaction_ids.get(user_id, {})
+            if conv_data.get('interaction_id'):
+                schedule_auto_resolve(conv_data['interaction_id'], conv_data['timestamp'], user_id)
+            
+            # Store pending selection
+            table = dynamodb.Table('it-actions')
+            table.put_item(Item={
+                'action_id': f"pending_selection_{user_email}_{int(datetime.now().timestamp())}",
+                'requester': user_email,
+                'status': 'PENDING_SELECTION',
+                'timestamp': int(datetime.now().timestamp()),
+                'pending_selection': True,
+                'details': {
+                    'similar_groups': [g['name'] for g in dl_matches],
+                    'action': 'add',
+                    'channel': channel,
+                    'thread_ts': slack_event.get('ts', ''),
+                    'type': 'DISTRIBUTION_LIST'
+                }
+            })
+            return {'statusCode': 200, 'body': 'OK'}
+        
+        # Single match - use exact name
+        exact_dl = dl_matches[0]['name']
+        
+        # Check membership BEFORE creating approval (Issue #50 fix)
+        membership_status = check_membership(user_email, exact_dl)
+        
+        if membership_status == "ALREADY_MEMBER":
+            msg = f"ℹ️ You're already a member of **{exact_dl}**.\n\nNo changes needed!"
+            send_slack_message(channel, msg)
+            # Log to conversation history
+            conv_data = user_interaction_ids.get(user_id, {})
+            if conv_data.get('interaction_id'):
+                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
+            return {'statusCode': 200, 'body': 'OK'}
+        elif membership_status == "USER_NOT_FOUND":
+            send_slack_message(channel, f"❌ Could not find your account in Active Directory. Please contact IT.")
+            return {'statusCode': 200, 'body': 'OK'}
+        elif membership_status == "GROUP_NOT_FOUND":
+            send_slack_message(channel, f"❌ Distribution list **{exact_dl}** not found in Active Directory.")
+            return {'statusCode': 200, 'body': 'OK'}
+        
+        # Get conversation data
+        conv_data = user_interaction_ids.get(user_id, {})
+        
+        # Send approval request (only if not already a member)
+        send_approval_request(user_id, real_name, user_email, exact_dl, message, conv_data)
+        
+        # Mark conversation as awaiting approval
+        if conv_data.get('interaction_id'):
+            mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
+        
+        response = f"""📧 **Distribution List Request Received**
+
+**Requested List:** `{exact_dl}`
+**Status:** Pending IT approval
+
+I've sent your request to the IT team for approval. You'll be notified once they review it!"""
+        
+        send_slack_message(channel, response)
+        return {'statusCode': 200, 'body': 'OK'}
+    
+    else:
+        # For Claude questions, send immediate response and return quickly to prevent retries
+        if image_detected:
+            if image_url:
+                status.update("🔧 🤔 I can see you uploaded an image! Let me analyze it and get back to you...")
+            else:
+                status.update("🔧 🤔 I can see you uploaded an image, but I'm having trouble accessing it. Let me help you anyway...")
+        else:
+            status.update("🔧 🤔 Let me think about that... I'll have an answer for you in just a moment!")
+        status.flush()
+        
+        # Return immediately to Slack to prevent retries
+        # Then invoke async processing
+        lambda_client = boto3.client('lambda')
+        conv_data = user_interaction_ids.get(user_id, {})
+        async_payload = {
+            'async_processing': True,
+            'user_message': message,
+            'user_name': user_name,
+            'user_id': user_id,
+            'channel': channel,
+            'image_url': image_url,
+            'image_detected': image_detected,
+            'interaction_id': str(conv_data.get('interaction_id')) if conv_data.get('interaction_id') else None,
+            'timestamp': int(conv_data.get('timestamp')) if conv_data.get('timestamp') else None,
+            'status_ts': status.ts
+        }
+        
+        # Start async processing but don't wait for it
+        try:
+            lambda_client.invoke(
+                FunctionName=context.function_name,
+                InvocationType='Event',  # Async invocation
+                Payload=json.dumps(async_payload)
+            )
+        except Exception as e:
+            logger.error('Error invoking async processing: %s', e)
+        
+        # Return immediately to prevent Slack retries
+        return {'statusCode': 200, 'body': 'OK'}
+    
+    return {'statusCode': 200, 'body': 'OK'}
+
+# Slack request routing
+# One parse step turns an HTTP request into (kind, payload); handlers are then found
+# by dict lookup - request kind, Events API event type, or the first '_'-separated
+# token of a button's action_id - so adding a route never lengthens another's path.
+# {route: [latency_ms, ...]}, emitted per invocation by emit_route_metrics
+route_metrics = {}
+route_metrics_lock = threading.Lock()
+
+def record_route(route, started):
+    latency_ms = (time.monotonic() - started) * 1000
+    with route_metrics_lock:
+        route_metrics.setdefault(route, []).append(latency_ms)
+
+def emit_route_metrics():
+    """Print per-route handler latency in CloudWatch embedded metric format, then reset"""
+    with route_metrics_lock:
+        latencies_by_route = dict(route_metrics)
+        route_metrics.clear()
+    for route, latencies in latencies_by_route.items():
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': 'BrieITAgent',
+                    'Dimensions': [['Route']],
+                    'Metrics': [{'Name': 'RouteLatency', 'Unit': 'Milliseconds'}]
+                }]
+            },
+            'Route': route,
+            'RouteLatency': latencies
+        }))
+
+def parse_slack_request(event):
+    """Parse an HTTP request body once: returns (kind, payload)
+    
+    kind is 'interactive' for button clicks (form-encoded payload= or a JSON
+    body of type interactive), otherwise the JSON body's type.
+    """
+    raw = get_raw_body(event)
+    if raw.startswith('payload='):
+        parsed_body = urllib.parse.parse_qs(raw)
+        if 'payload' not in parsed_body:
+            return None, {}
+        return 'interactive', json.loads(parsed_body['payload'][0])
+    
+    try:
+        body = json.loads(raw)
+    except json.JSONDecodeError:
+        return None, {}
+    if body.get('type') == 'interactive':
+        payload = body.get('payload', {})
+        return 'interactive', json.loads(payload) if isinstance(payload, str) else payload
+    return body.get('type'), body
+
+def handle_url_verification(body, event, context):
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'text/plain'},
+        'body': body['challenge']
+    }
+
+def handle_event_callback(body, event, context):
+    return acknowledge_slack_event(event, body, context)
+
+def handle_interactive(payload, event, context):
+    """Dispatch a block action on the first token of its action_id"""
+    action_id = payload.get('actions', [{}])[0].get('action_id', '')
+    user_id = payload.get('user', {}).get('id', '')
+    channel = (payload.get('channel') or {}).get('id', '') or (payload.get('container') or {}).get('channel_id', '')
+    logger.info('Button clicked: %s by user %s', action_id, user_id)
+    
+    prefix = action_id.split('_', 1)[0]
+    logger.set_route(f"action:{prefix}")
+    handler = BLOCK_ACTION_HANDLERS.get(prefix)
+    if not handler:
+        logger.warning('⚠️ No handler for action %s', action_id)
+        return {'statusCode': 200, 'body': 'OK'}
+    
+    started = time.monotonic()
+    try:
+        return handler(action_id, user_id, channel, event, context)
+    finally:
+        record_route(f"action:{prefix}", started)
+
+def forward_approval_action(action_id, user_id, channel, event, context):
+    """Approve/deny buttons belong to it-approval-system"""
+    logger.info('🔀 Forwarding approval button to it-approval-system: %s', action_id)
+    lambda_client = boto3.client('lambda')
+    response = lambda_client.invoke(
+        FunctionName='it-approval-system',
+        InvocationType='RequestResponse',
+        Payload=json.dumps(event)
+    )
+    return json.loads(response['Payload'].read())
+
+def handle_resolution_action(action_id, user_id, channel, event, context):
+    handle_resolution_button(action_id, user_id, channel)
+    return {'statusCode': 200, 'body': 'OK'}
+
+def handle_engagement_action(action_id, user_id, channel, event, context):
+    """Engagement prompt buttons"""
+    parts = action_id.split('_')
+    action_type = parts[1]  # yes, ticket, or resolved
+    interaction_id = parts[2]
+    timestamp = int(parts[3])
+    
+    if action_type == 'yes':
+        # User still working on it
+        send_slack_message(channel, "👍 No problem, take your time. Let me know if you need anything!")
+        update_conversation(interaction_id, timestamp, "User confirmed still working on issue", from_bot=False)
+        # Cancel old schedules and restart 5-minute cycle
+        cancel_schedules(timestamp, interaction_id)
+        schedule_engagement_restart(interaction_id, user_id, timestamp)
+    elif action_type == 'ticket':
+        # Create ticket (reuse existing logic)
+        handle_resolution_button(f"ticket_{interaction_id}_{timestamp}", user_id, channel)
+    elif action_type == 'resolved':
+        # User is all set
+        send_slack_message(channel, "✅ Great! Glad I could help. Feel free to reach out anytime!")
+        cancel_schedules(timestamp, interaction_id)
+        update_conversation(interaction_id, timestamp, "User confirmed issue resolved", from_bot=False, outcome='Self-Service Solution')
+    
+    return {'statusCode': 200, 'body': 'OK'}
+
+def handle_error_recovery_action(action_id, user_id, channel, event, context):
+    """Error recovery buttons"""
+    parts = action_id.split('_')
+    action_type = parts[1]  # ticket or retry
+    interaction_id = parts[2]
+    timestamp = int(parts[3])
+    
+    if action_type == 'ticket':
+        # Create ticket and close conversation
+        send_slack_message(channel, "🎫 Creating a ticket for IT support...")
+        cancel_schedules(timestamp, interaction_id)
+        update_conversation(interaction_id, timestamp, "User requested ticket after error", from_bot=False, outcome='Ticket Created')
+        handle_resolution_button(f"ticket_{interaction_id}_{timestamp}", user_id, channel)
+    elif action_type == 'retry':
+        # Close conversation and allow fresh start
+        send_slack_message(channel, "🔄 Okay, let's start fresh. What can I help you with?")
+        cancel_schedules(timestamp, interaction_id)
+        update_conversation(interaction_id, timestamp, "User chose to start over after error", from_bot=False, outcome='Cancelled - User Retry')
+        # Clear user's active conversation so next message creates new one
+        if user_id in user_interaction_ids:
+            del user_interaction_ids[user_id]
+    
+    return {'statusCode': 200, 'body': 'OK'}
+
+def handle_resumption_action(action_id, user_id, channel, event, context):
+    """Resume-previous-conversation buttons"""
+    parts = action_id.split('_')
+    action_type = parts[0]  # resumeyes or resumeno
+    
+    # Get pending resumption data
+    actions_table = dynamodb.Table('it-actions')
+    pending_items = actions_table.scan(
+        FilterExpression='user_id = :uid AND action_type = :at',
+        ExpressionAttributeValues={':uid': user_id, ':at': 'pending_resumption'}
+    ).get('Items', [])
+    
+    if pending_items:
+        pending = pending_items[0]
+        old_interaction_id = pending['old_interaction_id']
+        old_timestamp = pending['old_timestamp']
+        new_message = pending['new_message']
+        channel = pending['channel']
+        
+        # Delete pending resumption
+        actions_table.delete_item(Key={'action_id': pending['action_id']})
+        
+        if action_type == 'resumeyes':
+            # Resume old conversation
+            send_slack_message(channel, "✅ Continuing your previous conversation...")
+            update_conversation(old_interaction_id, old_timestamp, new_message, from_bot=False, outcome='In Progress')
+            user_interaction_ids[user_id] = {'interaction_id': old_interaction_id, 'timestamp': old_timestamp}
+            
+            # Schedule engagement prompts
+            cancel_schedules(old_timestamp, old_interaction_id)
+            schedule_engagement_restart(old_interaction_id, user_id, old_timestamp)
+            
+            # Process the message with Claude
+            real_name, _ = get_user_info_from_slack(user_id)
+            user_name = real_name if real_name else f"user_{user_id}"
+            
+            status = StatusMessage(channel)
+            status.update("🔧 🤔 Let me think about that... I'll have an answer for you in just a moment!")
+            
+            lambda_client = boto3.client('lambda')
+            async_payload = {
+                'async_processing': True,
+                'user_message': new_message,
+                'user_name': user_name,
+                'user_id': user_id,
+                'channel': channel,
+                'image_url': None,
+                'image_detected': False,
+                'interaction_id': old_interaction_id,
+                'timestamp': int(old_timestamp),
+                'status_ts': status.ts
+            }
+            lambda_client.invoke(
+                FunctionName=context.function_name,
+                InvocationType='Event',
+                Payload=json.dumps(async_payload)
+            )
+        else:
+            # Start new conversation
+            send_slack_message(channel, "✅ Starting a new conversation...")
+            real_name, _ = get_user_info_from_slack(user_id)
+            user_name = real_name if real_name else f"user_{user_id}"
+            
+            # Create new conversation
+            interaction_id = str(uuid.uuid4())
+            timestamp = int(datetime.utcnow().timestamp())
+            interaction_type = categorize_interaction(new_message)
+            redacted_message = redact_sensitive_data(new_message)
+            
+            item = {
+                'interaction_id': interaction_id,
+                'timestamp': timestamp,
+                'user_id': user_id,
+                'user_name': user_name,
+                'interaction_type': interaction_type,
+                'description': redacted_message[:200],
+                'outcome': 'In Progress',
+                'date': datetime.utcnow().isoformat(),
+                'conversation_history': json.dumps([{'timestamp': datetime.utcnow().isoformat(), 'message': redacted_message, 'from': 'user'}]),
+                'metadata': '{}'
+            }
+            interactions_table.put_item(Item=item)
+            user_interaction_ids[user_id] = {'interaction_id': interaction_id, 'timestamp': timestamp}
+            
+            status = StatusMessage(channel)
+            status.update("🔧 🤔 Let me think about that... I'll have an answer for you in just a moment!")
+            
+            lambda_client = boto3.client('lambda')
+            async_payload = {
+                'async_processing': True,
+                'user_message': new_message,
+                'user_name': user_name,
+                'user_id': user_id,
+                'channel': channel,
+                'image_url': None,
+                'image_detected': False,
+                'interaction_id': interaction_id,
+                'timestamp': timestamp,
+                'status_ts': status.ts
+            }
+            lambda_client.invoke(
+                FunctionName=context.function_name,
+                InvocationType='Event',
+                Payload=json.dumps(async_payload)
+            )
+    
+    return {'statusCode': 200, 'body': 'OK'}
+
+SLACK_REQUEST_HANDLERS = {
+    'url_verification': handle_url_verification,
+    'event_callback': handle_event_callback,
+    'interactive': handle_interactive
+}
+
+BLOCK_ACTION_HANDLERS = {
+    'approve': forward_approval_action,
+    'deny': forward_approval_action,
+    'resolved': handle_resolution_action,
+    'needhelp': handle_resolution_action,
+    'ticket': handle_resolution_action,
+    'engagement': handle_engagement_action,
+    'error': handle_error_recovery_action,
+    'resumeyes': handle_resumption_action,
+    'resumeno': handle_resumption_action
+}
+
+SLACK_EVENT_HANDLERS = {
+    'message': handle_message_event
+}
+
+def handle_slack_event(slack_event, context):
+    """Route one Slack Events API event - runs in the worker tier, after the ack"""
+    logger.set_route(f"event:{slack_event.get('type')}")
+    handler = SLACK_EVENT_HANDLERS.get(slack_event.get('type'))
+    if not handler:
+        return {'statusCode': 200, 'body': 'OK'}
+    started = time.monotonic()
+    try:
+        return handler(slack_event, context)
+    finally:
+        record_route(f"event:{slack_event['type']}", started)
+
+def route_slack_request(event, context):
+    """Verify, parse once and dispatch an HTTP request from Slack"""
+    # HTTP requests from Slack carry headers; direct invocations never do
+    if event.get('headers') is not None and not verify_slack_signature(event):
+        logger.info('🚫 Rejected request with invalid Slack signature')
+        return {'statusCode': 401, 'body': 'Invalid signature'}
+    
+    kind, payload = parse_slack_request(event)
+    logger.set_route(f"request:{kind}")
+    handler = SLACK_REQUEST_HANDLERS.get(kind)
+    if not handler:
+        return {'statusCode': 200, 'body': 'OK'}
+    started = time.monotonic()
+    try:
+        return handler(payload, event, context)
+    finally:
+        record_route(f"request:{kind}", started)
+
+def lambda_handler(event, context):
+    """Main Lambda handler"""
+    logger.begin(context)
+    set_invocation_deadline(context)
+    logger.debug('Received event', event=event)
+    
+    try:
+        # Worker tier: Slack events queued by acknowledge_slack_event
+        if event.get('Records') and event['Records'][0].get('eventSource') == 'aws:sqs':
+            return process_ingest_records(event['Records'], context)
+        if event.get('ingest_worker'):
+            process_ingest_message(event['message'], context)
+            return {'statusCode': 200, 'body': 'OK'}
+        
+        # Handle callback result from brie-ad-group-manager
+        if event.get('callback_result'):
+            logger.info('📥 Received callback_result from brie-ad-group-manager')
+            result_data = event.get('result_data', {})
+            slack_context = result_data.get('slackContext', {})
+            message = result_data.get('message', '')
+            status = result_data.get('status', '')
+            user_id = slack_context.get('user_id')
+            channel = slack_context.get('channel')
+            
+            logger.debug('callback: user_id=%s, channel=%s, status=%s', user_id, channel, status)
+            logger.debug('callback: message=%s', message[:100])
+            
+            if (user_id or channel) and message:
+                # Find active conversation
+                timeout_timestamp = int((datetime.utcnow() - timedelta(minutes=CONVERSATION_TIMEOUT_MINUTES)).timestamp())
+                
+                # Build filter expression based on available data
+                if user_id:
+                    filter_expr = 'user_id = :uid AND #ts > :timeout AND awaiting_approval = :awaiting'
+                    expr_values = {':uid': user_id, ':timeout': timeout_timestamp, ':awaiting': True}
+                    logger.debug('Searching by user_id=%s', user_id)
+                else:
+                    # Fallback: search by recent conversations and match channel in metadata
+                    filter_expr = '#ts > :timeout AND awaiting_approval = :awaiting'
+                    expr_values = {':timeout': timeout_timestamp, ':awaiting': True}
+                    logger.debug('Searching by channel (no user_id)')
+                
+                response = interactions_table.scan(
+                    FilterExpression=filter_expr,
+                    ExpressionAttributeNames={'#ts': 'timestamp'},
+                    ExpressionAttributeValues=expr_values
+                )
+                
+                items = response.get('Items', [])
+                logger.debug('Found %s conversations awaiting approval', len(items))
+                
+                if items:
+                    items.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
                     conv = items[0]
-                    print(f"DEBUG: Updating conversation {conv['interaction_id']}")
+                    logger.debug('Updating conversation %s', conv['interaction_id'])
                     
                     # Update conversation based on status
                     if status == 'already_member':
@@ -2243,15 +5299,15 @@ def lambda_handler(event, context):
                         update_conversation(conv['interaction_id'], conv['timestamp'], message, from_bot=True, outcome='Resolved - Failed')
                     elif status == 'completed':
                         update_conversation(conv['interaction_id'], conv['timestamp'], message, from_bot=True, outcome='Resolved by Brie')
-                    print(f"✅ Conversation updated successfully")
+                    logger.info('✅ Conversation updated successfully')
                 else:
-                    print(f"⚠️ No conversations found awaiting approval for user_id={user_id}, channel={channel}")
+                    logger.warning('⚠️ No conversations found awaiting approval for user_id=%s, channel=%s', user_id, channel)
             
             return {'statusCode': 200, 'body': 'OK'}
         
         # Handle approval_processed from it-approval-system
         if event.get('action') == 'approval_processed':
-            print("📥 Handling approval_processed from it-approval-system")
+            logger.info('📥 Handling approval_processed from it-approval-system')
             approval_id = event.get('approval_id')
             status = event.get('status')
             approver = event.get('approver', 'IT Team')
@@ -2280,7 +5336,7 @@ def lambda_handler(event, context):
                             ':awaiting': False
                         }
                     )
-                    print(f"✅ Updated interaction {interaction_id} with approval status: {status}")
+                    logger.info('✅ Updated interaction %s with approval status: %s', interaction_id, status)
                     
                     # Extract resource details
                     resource_name = event.get('resource_name') or event.get('group_name') or event.get('mailbox_email', '')
@@ -2312,34 +5368,34 @@ def lambda_handler(event, context):
                     if channel:
                         send_slack_message(channel, result_msg)
                     
-                    print(f"📝 Added approval and result messages to conversation history")
+                    logger.info('📝 Added approval and result messages to conversation history')
                 else:
-                    print(f"⚠️ No active conversation found for interaction_id: {interaction_id}")
+                    logger.warning('⚠️ No active conversation found for interaction_id: %s', interaction_id)
             else:
-                print(f"⚠️ No interaction_id in slack_context")
+                logger.warning('⚠️ No interaction_id in slack_context')
             
             return {'statusCode': 200, 'body': 'OK'}
         
         # Handle approval notification from it-approval-system
         if event.get('approval_notification'):
-            print("📥 Handling approval notification")
+            logger.info('📥 Handling approval notification')
             approval_data = event.get('approval_data', {})
             slack_context = approval_data.get('slackContext', {})
             approver = approval_data.get('approver', 'IT Team')
             request_type = approval_data.get('request_type', 'Request')
             resource_name = approval_data.get('resource_name')
             
-            print(f"Approver: {approver}, Request Type: {request_type}, Resource: {resource_name}")
+            logger.info('Approver: %s, Request Type: %s, Resource: %s', approver, request_type, resource_name)
             
             # Get user_id from slack context and look up active conversation
             user_id = slack_context.get('user_id')
-            print(f"User ID: {user_id}")
+            logger.info('User ID: %s', user_id)
             
             if user_id:
                 try:
                     # Find active conversation for this user
                     timeout_timestamp = int((datetime.utcnow() - timedelta(minutes=CONVERSATION_TIMEOUT_MINUTES)).timestamp())
-                    print(f"Scanning for conversations after timestamp: {timeout_timestamp}")
+                    logger.info('Scanning for conversations after timestamp: %s', timeout_timestamp)
                     
                     response = interactions_table.scan(
                         FilterExpression='user_id = :uid AND #ts > :timeout AND awaiting_approval = :awaiting',
@@ -2352,7 +5408,7 @@ def lambda_handler(event, context):
                     )
                     
                     items = response.get('Items', [])
-                    print(f"Found {len(items)} active conversations")
+                    logger.info('Found %s active conversations', len(items))
                     
                     if items:
                         # Get most recent conversation
@@ -2371,7 +5427,7 @@ def lambda_handler(event, context):
                             # If we found any emails, use the first one as the resource
                             if emails:
                                 resource_name = emails[0]
-                                print(f"Extracted resource from conversation: {resource_name}")
+                                logger.info('Extracted resource from conversation: %s', resource_name)
                         
                         # Build approval message
                         if resource_name:
@@ -2379,7 +5435,7 @@ def lambda_handler(event, context):
                         else:
                             approval_message = f"{request_type} approved by {approver}"
                         
-                        print(f"Updating conversation: {conv['interaction_id']}")
+                        logger.info('Updating conversation: %s', conv['interaction_id'])
                         
                         # Don't set outcome yet - wait for callback_result to determine success/failure
                         update_conversation(
@@ -2388,1282 +5444,20 @@ def lambda_handler(event, context):
                             approval_message,
                             from_bot=True
                         )
-                        print(f"✅ Updated conversation with approver: {approver}")
+                        logger.info('✅ Updated conversation with approver: %s', approver)
                     else:
-                        print("⚠️ No active conversations found for user")
+                        logger.warning('⚠️ No active conversations found for user')
                 except Exception as e:
-                    print(f"⚠️ Error updating conversation: {e}")
+                    logger.error('⚠️ Error updating conversation: %s', e)
                     import traceback
-                    print(traceback.format_exc())
+                    logger.info('%s', traceback.format_exc())
             else:
-                print("⚠️ No user_id in slack context")
+                logger.warning('⚠️ No user_id in slack context')
             
             return {'statusCode': 200, 'body': 'OK'}
         
         if 'body' in event:
-            # Try to parse as JSON first
-            try:
-                body = json.loads(event['body'])
-            except json.JSONDecodeError:
-                # Handle URL-encoded payloads (button clicks)
-                if 'payload=' in event.get('body', ''):
-                    parsed_body = urllib.parse.parse_qs(event['body'])
-                    if 'payload' in parsed_body:
-                        payload = json.loads(parsed_body['payload'][0])
-                        
-                        if payload.get('type') == 'block_actions':
-                            action_id = payload.get('actions', [{}])[0].get('action_id', '')
-                            user_id = payload.get('user', {}).get('id', '')
-                            channel = payload.get('channel', {}).get('id', '')
-                            
-                            print(f"Button clicked: {action_id} by user {user_id}")
-                            
-                            if action_id.startswith(('approve_', 'deny_')):
-                                # Forward approval buttons to it-approval-system
-                                print(f"🔀 Forwarding approval button to it-approval-system: {action_id}")
-                                lambda_client = boto3.client('lambda')
-                                response = lambda_client.invoke(
-                                    FunctionName='it-approval-system',
-                                    InvocationType='RequestResponse',
-                                    Payload=json.dumps(event)
-                                )
-                                result = json.loads(response['Payload'].read())
-                                return result
-                            elif action_id.startswith(('resolved_', 'needhelp_', 'ticket_')):
-                                handle_resolution_button(action_id, user_id, channel)
-                                return {'statusCode': 200, 'body': 'OK'}
-                            elif action_id.startswith('engagement_'):
-                                # Handle engagement prompt buttons
-                                parts = action_id.split('_')
-                                action_type = parts[1]  # yes, ticket, or resolved
-                                interaction_id = parts[2]
-                                timestamp = int(parts[3])
-                                
-                                if action_type == 'yes':
-                                    # User still working on it
-                                    send_slack_message(channel, "👍 No problem, take your time. Let me know if you need anything!")
-                                    update_conversation(interaction_id, timestamp, "User confirmed still working on issue", from_bot=False)
-                                    # Cancel old schedules and restart 5-minute cycle
-                                    cancel_schedules(timestamp, interaction_id)
-                                    schedule_engagement_restart(interaction_id, user_id, timestamp)
-                                elif action_type == 'ticket':
-                                    # Create ticket (reuse existing logic)
-                                    handle_resolution_button(f"ticket_{interaction_id}_{timestamp}", user_id, channel)
-                                elif action_type == 'resolved':
-                                    # User is all set
-                                    send_slack_message(channel, "✅ Great! Glad I could help. Feel free to reach out anytime!")
-                                    cancel_schedules(timestamp, interaction_id)
-                                    update_conversation(interaction_id, timestamp, "User confirmed issue resolved", from_bot=False, outcome='Self-Service Solution')
-                                
-                                return {'statusCode': 200, 'body': 'OK'}
-                            elif action_id.startswith(('error_ticket_', 'error_retry_')):
-                                # Handle error recovery buttons
-                                parts = action_id.split('_')
-                                action_type = parts[1]  # ticket or retry
-                                interaction_id = parts[2]
-                                timestamp = int(parts[3])
-                                
-                                if action_type == 'ticket':
-                                    # Create ticket and close conversation
-                                    send_slack_message(channel, "🎫 Creating a ticket for IT support...")
-                                    cancel_schedules(timestamp, interaction_id)
-                                    update_conversation(interaction_id, timestamp, "User requested ticket after error", from_bot=False, outcome='Ticket Created')
-                                    handle_resolution_button(f"ticket_{interaction_id}_{timestamp}", user_id, channel)
-                                elif action_type == 'retry':
-                                    # Close conversation and allow fresh start
-                                    send_slack_message(channel, "🔄 Okay, let's start fresh. What can I help you with?")
-                                    cancel_schedules(timestamp, interaction_id)
-                                    update_conversation(interaction_id, timestamp, "User chose to start over after error", from_bot=False, outcome='Cancelled - User Retry')
-                                    # Clear user's active conversation so next message creates new one
-                                    if user_id in user_interaction_ids:
-                                        del user_interaction_ids[user_id]
-                                
-                                return {'statusCode': 200, 'body': 'OK'}
-                            elif action_id.startswith(('resumeyes_', 'resumeno_')):
-                                # Handle resumption response
-                                parts = action_id.split('_')
-                                action_type = parts[0]  # resumeyes or resumeno
-                                
-                                # Get pending resumption data
-                                actions_table = dynamodb.Table('it-actions')
-                                pending_items = actions_table.scan(
-                                    FilterExpression='user_id = :uid AND action_type = :at',
-                                    ExpressionAttributeValues={':uid': user_id, ':at': 'pending_resumption'}
-                                ).get('Items', [])
-                                
-                                if pending_items:
-                                    pending = pending_items[0]
-                                    old_interaction_id = pending['old_interaction_id']
-                                    old_timestamp = pending['old_timestamp']
-                                    new_message = pending['new_message']
-                                    channel = pending['channel']
-                                    
-                                    # Delete pending resumption
-                                    actions_table.delete_item(Key={'action_id': pending['action_id']})
-                                    
-                                    if action_type == 'resumeyes':
-                                        # Resume old conversation
-                                        send_slack_message(channel, "✅ Continuing your previous conversation...")
-                                        update_conversation(old_interaction_id, old_timestamp, new_message, from_bot=False, outcome='In Progress')
-                                        user_interaction_ids[user_id] = {'interaction_id': old_interaction_id, 'timestamp': old_timestamp}
-                                        
-                                        # Schedule engagement prompts
-                                        cancel_schedules(old_timestamp, old_interaction_id)
-                                        schedule_engagement_restart(old_interaction_id, user_id, old_timestamp)
-                                        
-                                        # Process the message with Claude
-                                        real_name, _ = get_user_info_from_slack(user_id)
-                                        user_name = real_name if real_name else f"user_{user_id}"
-                                        
-                                        send_slack_message(channel, "🔧 🤔 Let me think about that... I'll have an answer for you in just a moment!")
-                                        
-                                        lambda_client = boto3.client('lambda')
-                                        async_payload = {
-                                            'async_processing': True,
-                                            'user_message': new_message,
-                                            'user_name': user_name,
-                                            'user_id': user_id,
-                                            'channel': channel,
-                                            'image_url': None,
-                                            'image_detected': False,
-                                            'interaction_id': old_interaction_id,
-                                            'timestamp': int(old_timestamp)
-                                        }
-                                        lambda_client.invoke(
-                                            FunctionName=context.function_name,
-                                            InvocationType='Event',
-                                            Payload=json.dumps(async_payload)
-                                        )
-                                    else:
-                                        # Start new conversation
-                                        send_slack_message(channel, "✅ Starting a new conversation...")
-                                        real_name, _ = get_user_info_from_slack(user_id)
-                                        user_name = real_name if real_name else f"user_{user_id}"
-                                        
-                                        # Create new conversation
-                                        interaction_id = str(uuid.uuid4())
-                                        timestamp = int(datetime.utcnow().timestamp())
-                                        interaction_type = categorize_interaction(new_message)
-                                        redacted_message = redact_sensitive_data(new_message)
-                                        
-                                        item = {
-                                            'interaction_id': interaction_id,
-                                            'timestamp': timestamp,
-                                            'user_id': user_id,
-                                            'user_name': user_name,
-                                            'interaction_type': interaction_type,
-                                            'description': redacted_message[:200],
-                                            'outcome': 'In Progress',
-                                            'date': datetime.utcnow().isoformat(),
-                                            'conversation_history': json.dumps([{'timestamp': datetime.utcnow().isoformat(), 'message': redacted_message, 'from': 'user'}]),
-                                            'metadata': '{}'
-                                        }
-                                        interactions_table.put_item(Item=item)
-                                        user_interaction_ids[user_id] = {'interaction_id': interaction_id, 'timestamp': timestamp}
-                                        
-                                        send_slack_message(channel, "🔧 🤔 Let me think about that... I'll have an answer for you in just a moment!")
-                                        
-                                        lambda_client = boto3.client('lambda')
-                                        async_payload = {
-                                            'async_processing': True,
-                                            'user_message': new_message,
-                                            'user_name': user_name,
-                                            'user_id': user_id,
-                                            'channel': channel,
-                                            'image_url': None,
-                                            'image_detected': False,
-                                            'interaction_id': interaction_id,
-                                            'timestamp': timestamp
-                                        }
-                                        lambda_client.invoke(
-                                            FunctionName=context.function_name,
-                                            InvocationType='Event',
-                                            Payload=json.dumps(async_payload)
-                                        )
-                                
-                                return {'statusCode': 200, 'body': 'OK'}
-                
-                return {'statusCode': 200, 'body': 'OK'}
-            
-            if body.get('type') == 'url_verification':
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'text/plain'},
-                    'body': body['challenge']
-                }
-            
-            # Handle interactive components (button clicks)
-            if body.get('type') == 'interactive':
-                payload = body.get('payload', {})
-                if isinstance(payload, str):
-                    payload = json.loads(payload)
-                
-                action_id = payload.get('actions', [{}])[0].get('action_id', '')
-                user_id = payload.get('user', {}).get('id', '')
-                
-                if action_id.startswith(('approve_', 'deny_')):
-                    # Forward approval buttons to it-approval-system
-                    print(f"🔀 Forwarding approval button to it-approval-system: {action_id}")
-                    lambda_client = boto3.client('lambda')
-                    response = lambda_client.invoke(
-                        FunctionName='it-approval-system',
-                        InvocationType='RequestResponse',
-                        Payload=json.dumps(event)
-                    )
-                    result = json.loads(response['Payload'].read())
-                    return result
-            
-            # Handle interactive components (button clicks)
-            if body.get('type') == 'interactive':
-                payload = body.get('payload', {})
-                if isinstance(payload, str):
-                    payload = json.loads(payload)
-                
-                action_id = payload.get('actions', [{}])[0].get('action_id', '')
-                user_id = payload.get('user', {}).get('id', '')
-                channel = payload.get('container', {}).get('channel_id', '')
-                
-                if action_id.startswith(('approve_', 'deny_')):
-                    # Forward approval buttons to it-approval-system
-                    print(f"🔀 Forwarding approval button to it-approval-system: {action_id}")
-                    lambda_client = boto3.client('lambda')
-                    response = lambda_client.invoke(
-                        FunctionName='it-approval-system',
-                        InvocationType='RequestResponse',
-                        Payload=json.dumps(event)
-                    )
-                    result = json.loads(response['Payload'].read())
-                    return result
-                
-                if action_id.startswith(('error_ticket_', 'error_retry_')):
-                    # Handle error recovery buttons
-                    parts = action_id.split('_')
-                    action_type = parts[1]  # ticket or retry
-                    interaction_id = parts[2]
-                    timestamp = int(parts[3])
-                    
-                    if action_type == 'ticket':
-                        # Create ticket and close conversation
-                        send_slack_message(channel, "🎫 Creating a ticket for IT support...")
-                        cancel_schedules(timestamp, interaction_id)
-                        update_conversation(interaction_id, timestamp, "User requested ticket after error", from_bot=False, outcome='Ticket Created')
-                        handle_resolution_button(f"ticket_{interaction_id}_{timestamp}", user_id, channel)
-                    elif action_type == 'retry':
-                        # Close conversation and allow fresh start
-                        send_slack_message(channel, "🔄 Okay, let's start fresh. What can I help you with?")
-                        cancel_schedules(timestamp, interaction_id)
-                        update_conversation(interaction_id, timestamp, "User chose to start over after error", from_bot=False, outcome='Cancelled - User Retry')
-                        # Clear user's active conversation so next message creates new one
-                        if user_id in user_interaction_ids:
-                            del user_interaction_ids[user_id]
-                    
-                    return {'statusCode': 200, 'body': 'OK'}
-                
-                if action_id.startswith(('resumeyes_', 'resumeno_')):
-                    # Handle resumption response
-                    parts = action_id.split('_')
-                    action_type = parts[0]  # resumeyes or resumeno
-                    user_id_from_action = parts[2]
-                    prompt_ts = parts[3]
-                    
-                    # Get pending resumption data
-                    actions_table = dynamodb.Table('it-actions')
-                    pending_items = actions_table.scan(
-                        FilterExpression='user_id = :uid AND action_type = :at',
-                        ExpressionAttributeValues={':uid': user_id, ':at': 'pending_resumption'}
-                    ).get('Items', [])
-                    
-                    if pending_items:
-                        pending = pending_items[0]
-                        old_interaction_id = pending['old_interaction_id']
-                        old_timestamp = pending['old_timestamp']
-                        new_message = pending['new_message']
-                        channel = pending['channel']
-                        
-                        # Delete pending resumption
-                        actions_table.delete_item(Key={'action_id': pending['action_id']})
-                        
-                        if action_type == 'resumeyes':
-                            # Resume old conversation
-                            send_slack_message(channel, "✅ Continuing your previous conversation...")
-                            update_conversation(old_interaction_id, old_timestamp, new_message, from_bot=False, outcome='In Progress')
-                            user_interaction_ids[user_id] = {'interaction_id': old_interaction_id, 'timestamp': old_timestamp}
-                            
-                            # Schedule engagement prompts
-                            cancel_schedules(old_timestamp, old_interaction_id)
-                            schedule_engagement_restart(old_interaction_id, user_id, old_timestamp)
-                            
-                            # Process the message with Claude
-                            real_name, _ = get_user_info_from_slack(user_id)
-                            user_name = real_name if real_name else f"user_{user_id}"
-                            
-                            send_slack_message(channel, "🔧 🤔 Let me think about that... I'll have an answer for you in just a moment!")
-                            
-                            lambda_client = boto3.client('lambda')
-                            async_payload = {
-                                'async_processing': True,
-                                'user_message': new_message,
-                                'user_name': user_name,
-                                'user_id': user_id,
-                                'channel': channel,
-                                'image_url': None,
-                                'image_detected': False,
-                                'interaction_id': old_interaction_id,
-                                'timestamp': int(old_timestamp)
-                            }
-                            lambda_client.invoke(
-                                FunctionName=context.function_name,
-                                InvocationType='Event',
-                                Payload=json.dumps(async_payload)
-                            )
-                        else:
-                            # Start new conversation
-                            send_slack_message(channel, "✅ Starting a new conversation...")
-                            real_name, _ = get_user_info_from_slack(user_id)
-                            user_name = real_name if real_name else f"user_{user_id}"
-                            
-                            # Create new conversation
-                            interaction_id = str(uuid.uuid4())
-                            timestamp = int(datetime.utcnow().timestamp())
-                            interaction_type = categorize_interaction(new_message)
-                            redacted_message = redact_sensitive_data(new_message)
-                            
-                            item = {
-                                'interaction_id': interaction_id,
-                                'timestamp': timestamp,
-                                'user_id': user_id,
-                                'user_name': user_name,
-                                'interaction_type': interaction_type,
-                                'description': redacted_message[:200],
-                                'outcome': 'In Progress',
-                                'date': datetime.utcnow().isoformat(),
-                                'conversation_history': json.dumps([{'timestamp': datetime.utcnow().isoformat(), 'message': redacted_message, 'from': 'user'}]),
-                                'metadata': '{}'
-                            }
-                            interactions_table.put_item(Item=item)
-                            user_interaction_ids[user_id] = {'interaction_id': interaction_id, 'timestamp': timestamp}
-                            
-                            send_slack_message(channel, "🔧 🤔 Let me think about that... I'll have an answer for you in just a moment!")
-                            
-                            lambda_client = boto3.client('lambda')
-                            async_payload = {
-                                'async_processing': True,
-                                'user_message': new_message,
-                                'user_name': user_name,
-                                'user_id': user_id,
-                                'channel': channel,
-                                'image_url': None,
-                                'image_detected': False,
-                                'interaction_id': interaction_id,
-                                'timestamp': timestamp
-                            }
-                            lambda_client.invoke(
-                                FunctionName=context.function_name,
-                                InvocationType='Event',
-                                Payload=json.dumps(async_payload)
-                            )
-                    
-                    return {'statusCode': 200, 'body': 'OK'}
-            
-            if body.get('type') == 'event_callback':
-                # Check for Slack retries - ignore them to prevent duplicate processing
-                headers = event.get('headers', {})
-                if headers.get('X-Slack-Retry-Num') or headers.get('x-slack-retry-num'):
-                    print(f"⚠️ Ignoring Slack retry: {headers.get('X-Slack-Retry-Num') or headers.get('x-slack-retry-num')}")
-                    return {'statusCode': 200, 'body': 'OK'}
-                
-                slack_event = body['event']
-                
-                # Comprehensive bot message filtering to prevent loops
-                if (slack_event.get('subtype') == 'bot_message' or 
-                    'bot_id' in slack_event or 
-                    slack_event.get('user') == 'U09CEF9E5QB' or
-                    slack_event.get('subtype') == 'message_changed' or
-                    slack_event.get('subtype') == 'message_deleted'):
-                    print(f"Ignoring bot/system message: {slack_event.get('subtype', 'bot_message')}")
-                    return {'statusCode': 200, 'body': 'OK'}
-                
-                # Continue with normal processing
-                if slack_event['type'] == 'message':
-                    user_id = slack_event.get('user')
-                    real_name, user_email = get_user_info_from_slack(user_id)
-                    user_name = real_name if real_name else f"user_{user_id}"
-                    message = slack_event.get('text', '')
-                    channel = slack_event.get('channel')
-                    
-                    # Log user's message to conversation history
-                    conv_data = user_interaction_ids.get(user_id, {})
-                    if conv_data.get('interaction_id'):
-                        update_conversation(conv_data['interaction_id'], conv_data['timestamp'], message, from_bot=False)
-                    
-                    # Send immediate acknowledgment
-                    msg = "🔍 Checking your request..."
-                    send_slack_message(channel, msg)
-                    if conv_data.get('interaction_id'):
-                        update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                    
-                    # Check if user has pending group selection
-                    actions_table = dynamodb.Table('it-actions')
-                    pending_items = actions_table.scan(
-                        FilterExpression='requester = :email AND #status = :status',
-                        ExpressionAttributeNames={'#status': 'status'},
-                        ExpressionAttributeValues={':email': user_email, ':status': 'PENDING_SELECTION'}
-                    ).get('Items', [])
-                    
-                    if pending_items:
-                        pending = pending_items[0]
-                        similar_groups = pending['details']['similar_groups']
-                        
-                        # Check if user's message matches one of the groups
-                        # Strip Slack link formatting: <http://ever.ag|ever.ag> -> ever.ag
-                        import re
-                        user_selection = message.strip()
-                        print(f"DEBUG: Original message: {user_selection}")
-                        user_selection = re.sub(r'<http[s]?://([^|>]+)\|([^>]+)>', r'\2', user_selection)
-                        user_selection = re.sub(r'<http[s]?://([^>]+)>', r'\1', user_selection)
-                        print(f"DEBUG: After stripping links: {user_selection}")
-                        
-                        # Try exact match first
-                        matched_group = None
-                        if user_selection in similar_groups:
-                            matched_group = user_selection
-                        else:
-                            # Try case-insensitive match
-                            user_lower = user_selection.lower()
-                            for group in similar_groups:
-                                if group.lower() == user_lower:
-                                    matched_group = group
-                                    break
-                        
-                        print(f"DEBUG: Matched group: {matched_group}")
-                        
-                        if matched_group:
-                            # User selected a valid group
-                            msg = f"✅ Got it! Processing your request for **{matched_group}**..."
-                            send_slack_message(channel, msg)
-                            
-                            # Log to conversation history
-                            conv_data = user_interaction_ids.get(user_id, {})
-                            if conv_data.get('interaction_id'):
-                                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                            
-                            # Delete pending selection
-                            actions_table.delete_item(Key={'action_id': pending['action_id']})
-                            
-                            # Check the type of request
-                            request_type = pending['details'].get('type', 'SSO_GROUP')
-                            
-                            # Bypass action processor - we already have the exact group name
-                            # Directly create approval request
-                            lambda_client = boto3.client('lambda')
-                            
-                            request_details = {
-                                'user_email': user_email,
-                                'group_name': matched_group,
-                                'action': 'add',
-                                'requester': user_email
-                            }
-                            
-                            if request_type == 'DISTRIBUTION_LIST':
-                                email_data = {
-                                    'sender': user_email,
-                                    'subject': f'Distribution List Access Request: {matched_group}',
-                                    'body': f'User {user_name} ({user_email}) requests access to {matched_group}',
-                                    'messageId': f'slack_{channel}_{int(datetime.utcnow().timestamp())}',
-                                    'source': 'it-helpdesk-bot',
-                                    'slackContext': {
-                                        'channel': channel,
-                                        'thread_ts': slack_event.get('ts', ''),
-                                        'user_name': user_name,
-                                        'user_id': user_id
-                                    }
-                                }
-                                
-                                approval_response = lambda_client.invoke(
-                                    FunctionName='it-approval-system',
-                                    InvocationType='Event',
-                                    Payload=json.dumps({
-                                        "action": "create_approval",
-                                        "approvalType": "DISTRIBUTION_LIST",
-                                        "requester": user_email,
-                                        "request_type": "Distribution List Access",
-                                        "details": f"User: {user_email}\nDistribution List: {matched_group}\nAction: Add",
-                                        "callback_function": "brie-infrastructure-connector",
-                                        "callback_params": {
-                                            "action": "add_user_to_group",
-                                            "user_email": user_email,
-                                            "group_name": matched_group,
-                                            "emailData": email_data,
-                                            "interaction_id": str(conv_data.get('interaction_id')) if conv_data.get('interaction_id') else None,
-                                            "timestamp": int(conv_data.get('timestamp')) if conv_data.get('timestamp') else None
-                                        }
-                                    })
-                                )
-                                msg = f"✅ Your distribution list request is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
-                            else:
-                                # SSO Group
-                                email_data = {
-                                    'sender': user_email,
-                                    'subject': f'SSO Group Access Request: {matched_group}',
-                                    'body': f'User {user_name} ({user_email}) requests access to {matched_group}',
-                                    'messageId': f'slack_{channel}_{int(datetime.utcnow().timestamp())}',
-                                    'source': 'it-helpdesk-bot'
-                                }
-                                
-                                approval_response = lambda_client.invoke(
-                                    FunctionName='it-approval-system',
-                                    InvocationType='Event',
-                                    Payload=json.dumps({
-                                        "action": "create_approval",
-                                        "approvalType": "SSO_GROUP",
-                                        "requester": user_email,
-                                        "ssoGroupRequest": request_details,
-                                        "emailData": email_data,
-                                        "details": f"User: {user_email}\nGroup: {matched_group}\nAction: add",
-                                        "callback_function": "brie-ad-group-manager",
-                                        "callback_params": {
-                                            "ssoGroupRequest": request_details,
-                                            "emailData": email_data,
-                                            "interaction_id": str(conv_data.get('interaction_id')) if conv_data.get('interaction_id') else None,
-                                            "timestamp": int(conv_data.get('timestamp')) if conv_data.get('timestamp') else None
-                                        }
-                                    })
-                                )
-                                
-                                # Create SSO interaction tracking for callback
-                                if conv_data.get('interaction_id'):
-                                    print(f"📝 Creating SSO interaction tracking for {conv_data['interaction_id']}")
-                                    tracking_id = f"sso_tracking_{user_id}_{int(datetime.utcnow().timestamp())}"
-                                    actions_table.put_item(Item={
-                                        'action_id': tracking_id,
-                                        'action_type': 'sso_interaction_tracking',
-                                        'interaction_id': conv_data['interaction_id'],
-                                        'interaction_timestamp': conv_data['timestamp'],
-                                        'user_email': user_email,
-                                        'group_name': matched_group,
-                                        'timestamp': int(datetime.utcnow().timestamp())
-                                    })
-                                    print(f"✅ Created tracking record: {tracking_id}")
-                                
-                                msg = f"✅ Your SSO group request is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
-                            
-                            # Mark conversation as awaiting approval
-                            conv_data = user_interaction_ids.get(user_id, {})
-                            if conv_data.get('interaction_id'):
-                                mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
-                            
-                            send_slack_message(channel, msg)
-                            
-                            if conv_data.get('interaction_id'):
-                                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                            
-                            return {'statusCode': 200, 'body': 'OK'}
-                        else:
-                            # Invalid selection
-                            send_slack_message(channel, f"❌ '{user_selection}' doesn't match any of the groups I showed you. Please reply with the exact group name from the list.")
-                            return {'statusCode': 200, 'body': 'OK'}
-                    
-                    # Check automation requests BEFORE resumption (Issue #72, #89)
-                    automation_type = detect_automation_request(message)
-                    if automation_type:
-                        real_name, user_email = get_user_info_from_slack(user_id)
-                        if not user_email:
-                            send_slack_message(channel, "❌ Unable to retrieve your email address. Please contact IT directly.")
-                            return {'statusCode': 200, 'body': 'OK'}
-                        
-                        # For automation, create NEW conversation directly (bypass resumption)
-                        interaction_id = str(uuid.uuid4())
-                        timestamp = int(datetime.utcnow().timestamp())
-                        interaction_type = categorize_interaction(message)
-                        redacted_message = redact_sensitive_data(message)
-                        
-                        item = {
-                            'interaction_id': interaction_id,
-                            'timestamp': timestamp,
-                            'user_id': user_id,
-                            'user_name': real_name,
-                            'interaction_type': interaction_type,
-                            'description': redacted_message[:200],
-                            'outcome': 'In Progress',
-                            'date': datetime.utcnow().isoformat(),
-                            'conversation_history': json.dumps([{'timestamp': datetime.utcnow().isoformat(), 'message': redacted_message, 'from': 'user'}]),
-                            'metadata': '{}'
-                        }
-                        interactions_table.put_item(Item=item)
-                        user_interaction_ids[user_id] = {'interaction_id': interaction_id, 'timestamp': timestamp}
-                        
-                        execution_arn = trigger_automation_workflow(user_email, real_name, message, channel, slack_event.get('ts', ''), automation_type, user_id, interaction_id, timestamp)
-                        if execution_arn == 'PENDING_SELECTION':
-                            return {'statusCode': 200, 'body': 'OK'}
-                        conv_data = user_interaction_ids.get(user_id, {})
-                        if execution_arn:
-                            if conv_data.get('interaction_id'):
-                                mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
-                                if automation_type == 'SSO_GROUP':
-                                    actions_table = dynamodb.Table('it-actions')
-                                    actions_table.put_item(Item={'action_id': f"sso_tracking_{user_id}_{int(datetime.now().timestamp())}", 'action_type': 'sso_interaction_tracking', 'interaction_id': conv_data['interaction_id'], 'interaction_timestamp': conv_data['timestamp'], 'user_email': user_email, 'group_name': '', 'timestamp': int(datetime.now().timestamp())})
-                            msg = f"✅ Your {automation_type.replace('_', ' ').lower()} request is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
-                            send_slack_message(channel, msg)
-                            if conv_data.get('interaction_id'):
-                                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                        else:
-                            msg = "❌ Error processing your request. Please try again or contact IT directly."
-                            if conv_data.get('interaction_id'):
-                                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                                send_error_recovery_message(channel, msg, conv_data['interaction_id'], conv_data['timestamp'], user_id)
-                            else:
-                                send_slack_message(channel, msg)
-                        return {'statusCode': 200, 'body': 'OK'}
-                    
-                    # Track conversation
-                    interaction_id, timestamp, is_new, resumption_conv = get_or_create_conversation(user_id, user_name, message)
-                    
-                    # Check if resumption prompt is needed
-                    if resumption_conv:
-                        # Show resumption prompt
-                        old_description = resumption_conv.get('description', 'your previous issue')
-                        prompt_ts = int(datetime.utcnow().timestamp())
-                        
-                        blocks = [
-                            {
-                                "type": "section",
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": f":wave: Welcome back! I see you had a previous conversation about:\n\n> {old_description}\n\nIs your new message related to this issue?"
-                                }
-                            },
-                            {
-                                "type": "actions",
-                                "elements": [
-                                    {
-                                        "type": "button",
-                                        "text": {"type": "plain_text", "text": ":white_check_mark: Yes, same issue", "emoji": True},
-                                        "action_id": f"resumeyes_pending_{user_id}_{prompt_ts}",
-                                        "style": "primary"
-                                    },
-                                    {
-                                        "type": "button",
-                                        "text": {"type": "plain_text", "text": ":x: No, different issue", "emoji": True},
-                                        "action_id": f"resumeno_pending_{user_id}_{prompt_ts}"
-                                    }
-                                ]
-                            }
-                        ]
-                        
-                        send_slack_message(channel, "", blocks=blocks)
-                        
-                        # Store pending resumption
-                        actions_table = dynamodb.Table('it-actions')
-                        actions_table.put_item(Item={
-                            'action_id': f"pending_resumption_{user_id}_{prompt_ts}",
-                            'user_id': user_id,
-                            'action_type': 'pending_resumption',
-                            'timestamp': prompt_ts,
-                            'old_interaction_id': resumption_conv['interaction_id'],
-                            'old_timestamp': resumption_conv['timestamp'],
-                            'new_message': message,
-                            'channel': channel
-                        })
-                        
-                        return {'statusCode': 200, 'body': 'OK'}
-                    
-                    if not is_new:
-                        # Update existing conversation
-                        update_conversation(interaction_id, timestamp, message, from_bot=False)
-                        
-                        # Cancel existing schedules and create new ones (keep original timestamp)
-                        cancel_schedules(timestamp, interaction_id)
-                        schedule_auto_resolve(interaction_id, timestamp, user_id)
-                        
-                        # Check if user indicates resolution
-                        if detect_resolution(message):
-                            cancel_schedules(timestamp, interaction_id)
-                            update_conversation(interaction_id, timestamp, message, from_bot=False, outcome='Self-Service Solution')
-                    
-                    # Store for later use
-                    user_interaction_ids[user_id] = {'interaction_id': interaction_id, 'timestamp': timestamp}
-                    
-                    # Log the full event for debugging
-                    print(f"Full Slack event: {json.dumps(slack_event)}")
-                    
-                    # Check for image uploads in multiple possible locations
-                    files = slack_event.get('files', [])
-                    image_url = None
-                    image_detected = False
-                    
-                    # Method 1: Direct files array
-                    if files:
-                        print(f"Found files array: {files}")
-                        for file in files:
-                            print(f"File details: {file}")
-                            if file.get('mimetype', '').startswith('image/'):
-                                image_detected = True
-                                # Try thumbnail URLs first (more likely to be accessible), then private URLs
-                                for url_field in ['thumb_720', 'thumb_480', 'thumb_360', 'permalink_public', 'url_private_download', 'url_private']:
-                                    if file.get(url_field):
-                                        image_url = file[url_field]
-                                        print(f"Found image URL via {url_field}: {image_url}")
-                                        break
-                                if image_url:
-                                    break
-                    
-                    # Method 2: Check if this is a file_share subtype
-                    if not image_url and slack_event.get('subtype') == 'file_share':
-                        image_detected = True  # We know an image was shared
-                        file_info = slack_event.get('file', {})
-                        print(f"File share detected: {file_info}")
-                        if file_info.get('mimetype', '').startswith('image/'):
-                            # Try thumbnail URLs first (more likely to be accessible), then private URLs
-                            for url_field in ['thumb_720', 'thumb_480', 'thumb_360', 'permalink_public', 'url_private_download', 'url_private']:
-                                if file_info.get(url_field):
-                                    image_url = file_info[url_field]
-                                    print(f"Found image URL via {url_field}: {image_url}")
-                                    break
-                    
-                    # Method 3: Check attachments
-                    if not image_url:
-                        attachments = slack_event.get('attachments', [])
-                        if attachments:
-                            print(f"Found attachments: {attachments}")
-                            for attachment in attachments:
-                                if attachment.get('image_url'):
-                                    image_detected = True
-                                    image_url = attachment.get('image_url')
-                                    print(f"Found image in attachments: {image_url}")
-                                    break
-                    
-                    print(f"Processing message from {user_name}: {message}")
-                    if image_url:
-                        print(f"Image detected with URL: {image_url}")
-                    elif image_detected:
-                        print("Image detected but URL not accessible")
-                    else:
-                        print("No image detected in this message")
-                    
-                    # Track message for conversation context (include image URL if present)
-                    if image_detected and image_url:
-                        track_user_message(user_id, message, image_url=image_url)
-                    else:
-                        track_user_message(user_id, message)
-                    message_lower = message.lower()
-                    
-                    # Check for ticket creation FIRST - don't process with Claude if creating ticket
-                    if any(word in message_lower for word in ['create ticket', 'ticket', 'escalate', 'human support']):
-                        real_name, user_email = get_user_info_from_slack(user_id)
-                        
-                        # Get full conversation history
-                        conv_data = user_interaction_ids.get(user_id, {})
-                        conversation_summary = None
-                        if conv_data:
-                            conversation_summary = get_conversation_summary(conv_data['interaction_id'], conv_data['timestamp'])
-                        
-                        # Use conversation summary instead of just previous question
-                        ticket_context = conversation_summary if conversation_summary else get_conversation_context(user_id)
-                        
-                        if save_ticket_to_dynamodb(user_id, real_name, user_email, message, ticket_context):
-                            response = f"""✅ **Support Request Submitted**
-
-**Submitted by:** {real_name}
-**From Email:** {user_email}
-**Status:** Sent to itsupport@ever.ag"""
-                            
-                            if conversation_summary:
-                                response += f"\n**Context:** Included full conversation history"
-                            
-                            response += "\n\nYour request has been submitted to IT Support.\nThey can reply directly to your email: " + user_email
-                            
-                            send_slack_message(channel, f"🔧 {response}")
-                            
-                            # Update conversation outcome
-                            if conv_data:
-                                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], message, from_bot=False, outcome='Ticket Created')
-                        else:
-                            send_slack_message(channel, "🔧 ❌ Error submitting request. Please try again or call IT Support at 214-807-0784 (emergencies only).")
-                        
-                        # Return immediately - don't continue to Claude processing
-                        return {'statusCode': 200, 'body': 'OK'}
-                    
-                    # Check for software/subscription requests (NEW software purchases, not access to existing)
-                    software_keywords = ['new software', 'request new software', 'purchase software', 'buy software',
-                                       'software purchase', 'new subscription', 'request subscription', 
-                                       'purchase subscription', 'buy subscription', 'new license',
-                                       'purchase license', 'software license purchase']
-                    if any(keyword in message_lower for keyword in software_keywords):
-                        response = """📋 **Software & Subscription Requests**
-
-For requesting new software or subscriptions, please fill out this form:
-https://everag.gogenuity.com/help_center/workspaces/5806/forms/41983
-
-**Important:**
-• Add as much detail as possible in the form
-• It's highly encouraged to have Finance approval before submitting
-• We will send the request to the Cyber Security team for review
-
-Need help with the form? Just ask!"""
-                        send_slack_message(channel, response)
-                        return {'statusCode': 200, 'body': 'OK'}
-                    
-                    # Check if user has a pending group selection
-                    real_name, user_email = get_user_info_from_slack(user_id)
-                    if user_email:
-                        pending_selection = check_pending_group_selection(user_email)
-                        print(f"DEBUG - Pending selection for {user_email}: {pending_selection}")
-                        
-                        if pending_selection:
-                            # User is responding to group selection prompt
-                            details = pending_selection.get('details', {})
-                            similar_groups = details.get('similar_groups', [])
-                            
-                            # Check if message matches one of the similar groups
-                            selected_group = None
-                            for group in similar_groups:
-                                if group.lower() == message.strip().lower():
-                                    selected_group = group
-                                    break
-                            
-                            if selected_group:
-                                # Log user's selection first
-                                conv_data = user_interaction_ids.get(user_id, {})
-                                if conv_data.get('interaction_id'):
-                                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], message, from_bot=False)
-                                
-                                # User selected a valid group
-                                msg = f"✅ Got it! Requesting access to **{selected_group}**..."
-                                send_slack_message(channel, msg)
-                                
-                                # Log bot response
-                                if conv_data.get('interaction_id'):
-                                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                                
-                                # Delete pending selection
-                                table = dynamodb.Table('it-actions')
-                                table.delete_item(Key={'action_id': pending_selection['action_id']})
-                                
-                                action = details.get('action', 'add')
-                                request_type = details.get('type', 'SSO_GROUP')
-                                
-                                # Handle based on type
-                                if request_type == 'DISTRIBUTION_LIST':
-                                    # Get conversation data
-                                    conv_data = user_interaction_ids.get(user_id, {})
-                                    
-                                    # Send DL approval
-                                    approval_id = send_approval_request(user_id, real_name, user_email, selected_group, f"add me to {selected_group}", conv_data)
-                                    
-                                    # Mark conversation as awaiting approval
-                                    if conv_data.get('interaction_id'):
-                                        mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
-                                    
-                                    msg = f"✅ Your request for **{selected_group}** is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
-                                    send_slack_message(channel, msg)
-                                    
-                                    # Log to conversation history
-                                    if conv_data.get('interaction_id'):
-                                        update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                                    
-                                    return {'statusCode': 200, 'body': 'OK'}
-                                
-                                # SSO Group handling
-                                lambda_client = boto3.client('lambda')
-                                
-                                sso_request = {
-                                    'user_email': user_email,
-                                    'group_name': selected_group,
-                                    'action': action,
-                                    'requester': user_email
-                                }
-                                
-                                email_data = {
-                                    "sender": user_email,
-                                    "subject": f"SSO Group Request from Slack: {real_name}",
-                                    "body": f"{action} me to {selected_group}",
-                                    "messageId": f"slack_{channel}_{slack_event.get('ts', '')}",
-                                    "source": "it-helpdesk-bot",
-                                    "slackContext": {
-                                        "channel": channel,
-                                        "thread_ts": slack_event.get('ts', ''),
-                                        "user_name": real_name,
-                                        "user_id": user_id
-                                    }
-                                }
-                                
-                                # Check if user is already a member before sending approval
-                                membership_status = check_membership(user_email, selected_group)
-                                
-                                if membership_status == "ALREADY_MEMBER":
-                                    send_slack_message(channel, f"ℹ️ You're already a member of **{selected_group}**. No action needed!")
-                                    return {'statusCode': 200, 'body': 'OK'}
-                                elif membership_status == "USER_NOT_FOUND":
-                                    send_slack_message(channel, f"❌ Could not find your account in Active Directory. Please contact IT.")
-                                    return {'statusCode': 200, 'body': 'OK'}
-                                elif membership_status == "GROUP_NOT_FOUND":
-                                    send_slack_message(channel, f"❌ Group **{selected_group}** not found in Active Directory.")
-                                    return {'statusCode': 200, 'body': 'OK'}
-                                elif membership_status == "ERROR":
-                                    # If check fails, proceed with approval anyway (fail open)
-                                    print(f"⚠️ Membership check failed, proceeding with approval")
-                                
-                                # Send approval request directly
-                                conv_data = user_interaction_ids.get(user_id, {})
-                                
-                                # Store interaction tracking for this approval
-                                if conv_data.get('interaction_id'):
-                                    actions_table = dynamodb.Table('it-actions')
-                                    tracking_id = f"sso_tracking_{user_id}_{int(datetime.now().timestamp())}"
-                                    actions_table.put_item(Item={
-                                        'action_id': tracking_id,
-                                        'action_type': 'sso_interaction_tracking',
-                                        'interaction_id': conv_data['interaction_id'],
-                                        'interaction_timestamp': conv_data['timestamp'],
-                                        'user_email': user_email,
-                                        'group_name': selected_group,
-                                        'timestamp': int(datetime.now().timestamp())
-                                    })
-                                
-                                approval_response = lambda_client.invoke(
-                                    FunctionName='it-approval-system',
-                                    InvocationType='Event',
-                                    Payload=json.dumps({
-                                        "action": "create_approval",
-                                        "approvalType": "SSO_GROUP",
-                                        "requester": user_email,
-                                        "ssoGroupRequest": sso_request,
-                                        "emailData": email_data,
-                                        "details": f"User: {user_email}\nGroup: {selected_group}\nAction: {action}",
-                                        "callback_function": "brie-ad-group-manager",
-                                        "callback_params": {
-                                            "ssoGroupRequest": sso_request,
-                                            "emailData": email_data,
-                                            "interaction_id": str(conv_data.get('interaction_id')) if conv_data.get('interaction_id') else None,
-                                            "interaction_timestamp": int(conv_data.get('timestamp')) if conv_data.get('timestamp') else None
-                                        }
-                                    })
-                                )
-                                
-                                # Mark conversation as awaiting approval
-                                if conv_data.get('interaction_id'):
-                                    print(f"🔵 SSO PATH: Marking conversation as awaiting approval")
-                                    mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
-                                
-                                msg = f"✅ Your request for **{selected_group}** is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
-                                print(f"🔵 SSO PATH: Sending approval message to Slack")
-                                send_slack_message(channel, msg)
-                                
-                                # Log to conversation history
-                                if conv_data.get('interaction_id'):
-                                    print(f"📝 Adding approval message to conversation history: {conv_data['interaction_id']}")
-                                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                                    print(f"✅ Approval message added to conversation history")
-                                else:
-                                    print(f"⚠️ No interaction_id found in conv_data for SSO approval message")
-                                
-                                return {'statusCode': 200, 'body': 'OK'}
-                            else:
-                                # Message doesn't match any of the options
-                                send_slack_message(channel, f"❌ '{message}' doesn't match any of the suggested groups. Please reply with the exact group name from the list.")
-                                return {'statusCode': 200, 'body': 'OK'}
-                    
-                    # FAST SELF-SERVICE PATH for "add me" SSO/Group requests (not DL)
-                    if 'add me to' in message_lower and any(kw in message_lower for kw in ['sso', ' group', 'ad group', 'active directory']):
-                        print(f"🚀 FAST SELF-SERVICE: SSO/Group request detected")
-                        import re
-                        
-                        # Extract group name from "add me to [group]" - keep full text including sso/group
-                        # Strip Slack markdown formatting (*, _, ~) before extraction
-                        clean_msg = re.sub(r'[*_~`]', '', message)
-                        group_match = re.search(r'add me to (?:the )?(.+)$', clean_msg, re.IGNORECASE)
-                        if group_match:
-                            group_search = group_match.group(1).strip()
-                            print(f"Searching for group: {group_search}")
-                            
-                            # Search with progress indicator
-                            import threading
-                            search_complete = threading.Event()
-                            
-                            def send_progress_message():
-                                if not search_complete.wait(5):
-                                    msg = "🔍 Still working on it, might take up to 30sec."
-                                    send_slack_message(channel, msg)
-                                    conv_data = user_interaction_ids.get(user_id, {})
-                                    if conv_data.get('interaction_id'):
-                                        update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                            
-                            progress_thread = threading.Thread(target=send_progress_message)
-                            progress_thread.start()
-                            
-                            matches = query_group_type(group_search)
-                            search_complete.set()
-                            
-                            # Try without keywords if no matches
-                            if not matches:
-                                cleaned = re.sub(r'\b(sso|group|ad|active directory)\b', '', group_search, flags=re.IGNORECASE).strip()
-                                if cleaned and cleaned != group_search:
-                                    print(f"No matches for '{group_search}', trying '{cleaned}'")
-                                    matches = query_group_type(cleaned)
-                            
-                            if not matches:
-                                msg = f"❌ No groups found matching '{group_search}'"
-                                send_slack_message(channel, msg)
-                                conv_data = user_interaction_ids.get(user_id, {})
-                                if conv_data.get('interaction_id'):
-                                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                                return {'statusCode': 200, 'body': 'OK'}
-                            
-                            # Filter to SSO groups only
-                            sso_matches = [m for m in matches if m['type'] == 'SSO_GROUP']
-                            if not sso_matches:
-                                msg = f"❌ No SSO groups found matching '{group_search}'. Found distribution lists instead - try 'add me to {group_search} dl'"
-                                send_slack_message(channel, msg)
-                                return {'statusCode': 200, 'body': 'OK'}
-                            
-                            if len(sso_matches) > 1:
-                                # Multiple matches - ask user to select
-                                group_list = "\n".join([f"• {g['name']}" for g in sso_matches])
-                                msg = f"🔍 Found multiple groups matching '{group_search}':\n\n{group_list}\n\nPlease reply with the exact group name you want."
-                                send_slack_message(channel, msg)
-                                
-                                conv_data = user_interaction_ids.get(user_id, {})
-                                if conv_data.get('interaction_id'):
-                                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                                
-                                # Store pending selection
-                                table = dynamodb.Table('it-actions')
-                                table.put_item(Item={
-                                    'action_id': f"pending_selection_{user_email}_{int(datetime.now().timestamp())}",
-                                    'requester': user_email,
-                                    'status': 'PENDING_SELECTION',
-                                    'timestamp': int(datetime.now().timestamp()),
-                                    'pending_selection': True,
-                                    'details': {
-                                        'similar_groups': [g['name'] for g in sso_matches],
-                                        'action': 'add',
-                                        'channel': channel,
-                                        'thread_ts': slack_event.get('ts', ''),
-                                        'user_id': user_id,
-                                        'type': 'SSO_GROUP'
-                                    }
-                                })
-                                return {'statusCode': 200, 'body': 'OK'}
-                            
-                            # Single match - check membership and create approval
-                            exact_group = sso_matches[0]['name']
-                            membership_status = check_membership(user_email, exact_group)
-                            
-                            if membership_status == "ALREADY_MEMBER":
-                                msg = f"ℹ️ You're already a member of **{exact_group}**.\n\nNo changes needed!"
-                                send_slack_message(channel, msg)
-                                conv_data = user_interaction_ids.get(user_id, {})
-                                if conv_data.get('interaction_id'):
-                                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                                return {'statusCode': 200, 'body': 'OK'}
-                            elif membership_status == "USER_NOT_FOUND":
-                                send_slack_message(channel, f"❌ Could not find your account in Active Directory. Please contact IT.")
-                                return {'statusCode': 200, 'body': 'OK'}
-                            elif membership_status == "GROUP_NOT_FOUND":
-                                send_slack_message(channel, f"❌ Group **{exact_group}** not found in Active Directory.")
-                                return {'statusCode': 200, 'body': 'OK'}
-                            
-                            # Create approval request
-                            request_details = {
-                                'user_email': user_email,
-                                'group_name': exact_group,
-                                'action': 'add',
-                                'requester': user_email
-                            }
-                            
-                            email_data = {
-                                'sender': user_email,
-                                'subject': f'SSO Group Request: {exact_group}',
-                                'body': f'User {real_name} ({user_email}) requests access to {exact_group}',
-                                'messageId': f'slack_{channel}_{int(datetime.utcnow().timestamp())}',
-                                'source': 'it-helpdesk-bot',
-                                'slackContext': {
-                                    'channel': channel,
-                                    'user_id': user_id,
-                                    'user_name': real_name
-                                }
-                            }
-                            
-                            lambda_client = boto3.client('lambda')
-                            approval_response = lambda_client.invoke(
-                                FunctionName='it-approval-system',
-                                InvocationType='Event',
-                                Payload=json.dumps({
-                                    "action": "create_approval",
-                                    "approvalType": "SSO_GROUP",
-                                    "requester": user_email,
-                                    "ssoGroupRequest": request_details,
-                                    "emailData": email_data,
-                                    "details": f"User: {user_email}\nGroup: {exact_group}\nAction: add",
-                                    "callback_function": "brie-ad-group-manager",
-                                    "callback_params": {
-                                        "ssoGroupRequest": request_details,
-                                        "emailData": email_data
-                                    }
-                                })
-                            )
-                            
-                            # Mark conversation as awaiting approval
-                            conv_data = user_interaction_ids.get(user_id, {})
-                            if conv_data.get('interaction_id'):
-                                mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
-                            
-                            msg = f"✅ Your SSO group request is being processed. IT will review and approve shortly.\n\nWhile IT reviews this, I can still help you with other needs. Just ask!"
-                            send_slack_message(channel, msg)
-                            
-                            if conv_data.get('interaction_id'):
-                                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                            
-                            return {'statusCode': 200, 'body': 'OK'}
-                    
-                    # OLD DL HANDLER - DISABLED (Issue #75) - Use automation detection instead
-                    elif False and any(word in message_lower for word in ['add me to', 'distribution list', 'distro list', 'email group']):
-                        print(f"Distribution list request detected: {message}")
-                        real_name, user_email = get_user_info_from_slack(user_id)
-                        distribution_list = extract_distribution_list_name(message)
-                        
-                        # Search Exchange for matching DLs with progress indicator
-                        import threading
-                        search_complete = threading.Event()
-                        
-                        def send_progress_message():
-                            if not search_complete.wait(5):
-                                msg = "🔍 Still working on it, might take up to 30sec."
-                                send_slack_message(channel, msg)
-                                conv_data = user_interaction_ids.get(user_id, {})
-                                if conv_data.get('interaction_id'):
-                                    update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                        
-                        progress_thread = threading.Thread(target=send_progress_message)
-                        progress_thread.start()
-                        
-                        matches = query_group_type(distribution_list)
-                        search_complete.set()
-                        
-                        if not matches:
-                            send_slack_message(channel, f"❌ No distribution lists found matching '{distribution_list}'")
-                            return {'statusCode': 200, 'body': 'OK'}
-                        
-                        # Filter to only show DLs
-                        dl_matches = [m for m in matches if m['type'] == 'DISTRIBUTION_LIST']
-                        
-                        if not dl_matches:
-                            send_slack_message(channel, f"❌ No distribution lists found matching '{distribution_list}'. Found SSO groups instead - try 'add me to {distribution_list} sso group'")
-                            return {'statusCode': 200, 'body': 'OK'}
-                        
-                        if len(dl_matches) > 1:
-                            # Multiple matches - ask user to select
-                            group_list = "\n".join([f"• {g['name']}" for g in dl_matches])
-                            msg = f"🔍 Found multiple distribution lists matching '{distribution_list}':\n\n{group_list}\n\nPlease reply with the exact list name you want."
-                            send_slack_message(channel, msg)
-                            
-                            # Log to conversation history
-                            conv_data = user_interaction_ids.get(user_id, {})
-                            if conv_data.get('interaction_id'):
-                                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                            
-                            # Schedule engagement prompts for this conversation
-                            conv_data = user_interaction_ids.get(user_id, {})
-                            if conv_data.get('interaction_id'):
-                                schedule_auto_resolve(conv_data['interaction_id'], conv_data['timestamp'], user_id)
-                            
-                            # Store pending selection
-                            table = dynamodb.Table('it-actions')
-                            table.put_item(Item={
-                                'action_id': f"pending_selection_{user_email}_{int(datetime.now().timestamp())}",
-                                'requester': user_email,
-                                'status': 'PENDING_SELECTION',
-                                'timestamp': int(datetime.now().timestamp()),
-                                'pending_selection': True,
-                                'details': {
-                                    'similar_groups': [g['name'] for g in dl_matches],
-                                    'action': 'add',
-                                    'channel': channel,
-                                    'thread_ts': slack_event.get('ts', ''),
-                                    'type': 'DISTRIBUTION_LIST'
-                                }
-                            })
-                            return {'statusCode': 200, 'body': 'OK'}
-                        
-                        # Single match - use exact name
-                        exact_dl = dl_matches[0]['name']
-                        
-                        # Check membership BEFORE creating approval (Issue #50 fix)
-                        membership_status = check_membership(user_email, exact_dl)
-                        
-                        if membership_status == "ALREADY_MEMBER":
-                            msg = f"ℹ️ You're already a member of **{exact_dl}**.\n\nNo changes needed!"
-                            send_slack_message(channel, msg)
-                            # Log to conversation history
-                            conv_data = user_interaction_ids.get(user_id, {})
-                            if conv_data.get('interaction_id'):
-                                update_conversation(conv_data['interaction_id'], conv_data['timestamp'], msg, from_bot=True)
-                            return {'statusCode': 200, 'body': 'OK'}
-                        elif membership_status == "USER_NOT_FOUND":
-                            send_slack_message(channel, f"❌ Could not find your account in Active Directory. Please contact IT.")
-                            return {'statusCode': 200, 'body': 'OK'}
-                        elif membership_status == "GROUP_NOT_FOUND":
-                            send_slack_message(channel, f"❌ Distribution list **{exact_dl}** not found in Active Directory.")
-                            return {'statusCode': 200, 'body': 'OK'}
-                        
-                        # Get conversation data
-                        conv_data = user_interaction_ids.get(user_id, {})
-                        
-                        # Send approval request (only if not already a member)
-                        approval_id = send_approval_request(user_id, real_name, user_email, exact_dl, message, conv_data)
-                        
-                        # Mark conversation as awaiting approval
-                        if conv_data.get('interaction_id'):
-                            mark_conversation_awaiting_approval(conv_data['interaction_id'], conv_data['timestamp'])
-                        
-                        response = f"""📧 **Distribution List Request Received**
-
-**Requested List:** `{exact_dl}`
-**Status:** Pending IT approval
-
-I've sent your request to the IT team for approval. You'll be notified once they review it!"""
-                        
-                        send_slack_message(channel, response)
-                        return {'statusCode': 200, 'body': 'OK'}
-                    
-                    else:
-                        # For Claude questions, send immediate response and return quickly to prevent retries
-                        if image_detected:
-                            if image_url:
-                                send_slack_message(channel, "🔧 🤔 I can see you uploaded an image! Let me analyze it and get back to you...")
-                            else:
-                                send_slack_message(channel, "🔧 🤔 I can see you uploaded an image, but I'm having trouble accessing it. Let me help you anyway...")
-                        else:
-                            send_slack_message(channel, "🔧 🤔 Let me think about that... I'll have an answer for you in just a moment!")
-                        
-                        # Return immediately to Slack to prevent retries
-                        # Then invoke async processing
-                        lambda_client = boto3.client('lambda')
-                        conv_data = user_interaction_ids.get(user_id, {})
-                        async_payload = {
-                            'async_processing': True,
-                            'user_message': message,
-                            'user_name': user_name,
-                            'user_id': user_id,
-                            'channel': channel,
-                            'image_url': image_url,
-                            'image_detected': image_detected,
-                            'interaction_id': str(conv_data.get('interaction_id')) if conv_data.get('interaction_id') else None,
-                            'timestamp': int(conv_data.get('timestamp')) if conv_data.get('timestamp') else None
-                        }
-                        
-                        # Start async processing but don't wait for it
-                        try:
-                            lambda_client.invoke(
-                                FunctionName=context.function_name,
-                                InvocationType='Event',  # Async invocation
-                                Payload=json.dumps(async_payload)
-                            )
-                        except Exception as e:
-                            print(f"Error invoking async processing: {e}")
-                        
-                        # Return immediately to prevent Slack retries
-                        return {'statusCode': 200, 'body': 'OK'}
+            return route_slack_request(event, context)
         
         # Handle engagement prompts
         elif event.get('engagement_prompt'):
@@ -3678,24 +5472,16 @@ I've sent your request to the IT team for approval. You'll be notified once they
                 item = response['Item']
                 # Skip if awaiting approval or already closed
                 if item.get('awaiting_approval') or item.get('outcome') != 'In Progress':
-                    print(f"⏭️ Skipping engagement prompt for {interaction_id} - not in progress")
+                    logger.info('⏭️ Skipping engagement prompt for %s - not in progress', interaction_id)
                     return {'statusCode': 200, 'body': 'OK'}
                 
-                # Get user's channel
-                user_info = interactions_table.scan(
-                    FilterExpression='user_id = :uid',
-                    ExpressionAttributeValues={':uid': user_id},
-                    Limit=1
-                )
-                
                 # Send engagement prompt with buttons
                 if prompt_number == 1:
                     message = f"👋 Are you still there? Do you still need help with {item.get('description', 'your request')}?"
                 else:
                     message = f"👋 Just checking in - are you still working on {item.get('description', 'your request')}?"
                 
-                # Get channel from DynamoDB or use direct message
-                channel = f"@{user_id}"
+                channel = get_dm_channel(user_id) or user_id
                 
                 blocks = [
                     {
@@ -3734,7 +5520,7 @@ I've sent your request to the IT team for approval. You'll be notified once they
                 # Log to conversation history
                 update_conversation(interaction_id, timestamp, message, from_bot=True)
                 
-                print(f"✅ Sent engagement prompt #{prompt_number} for {interaction_id}")
+                logger.info('✅ Sent engagement prompt #%s for %s', prompt_number, interaction_id)
             
             return {'statusCode': 200, 'body': 'OK'}
         
@@ -3750,24 +5536,34 @@ I've sent your request to the IT team for approval. You'll be notified once they
                 item = response['Item']
                 # Skip if awaiting approval - those have their own 5-day timeout
                 if item.get('awaiting_approval'):
-                    print(f"⏭️ Skipping auto-resolve for {interaction_id} - awaiting approval")
+                    logger.info('⏭️ Skipping auto-resolve for %s - awaiting approval', interaction_id)
                     return {'statusCode': 200, 'body': 'OK'}
                 
                 if item.get('outcome') == 'In Progress':
                     # Send Slack notification
-                    channel = f"@{user_id}"
+                    channel = get_dm_channel(user_id) or user_id
                     message = f"⏱️ I haven't heard back from you, so I'm closing this conversation about *{item.get('description', 'your request')}*. Feel free to message me again if you still need help!"
                     send_slack_message(channel, message)
                     
                     # Auto-resolve as timed out
                     update_conversation(interaction_id, timestamp, "Auto-resolved (no response after 15 minutes)", from_bot=True, outcome='Timed Out - No Response')
-                    print(f"✅ Auto-resolved {interaction_id}")
+                    logger.info('✅ Auto-resolved %s', interaction_id)
             
             return {'statusCode': 200, 'body': 'OK'}
         
+        # Bulk-load Slack profiles (scheduled by EventBridge)
+        elif event.get('prewarm_user_profiles'):
+            count = prewarm_user_profiles()
+            return {'statusCode': 200, 'body': f'Pre-warmed {count} user profiles'}
+        
+        # Refresh the Confluence KB cache (scheduled by EventBridge)
+        elif event.get('warm_kb'):
+            logger.set_route('warm_kb')
+            return {'statusCode': 200, 'body': json.dumps(refresh_kb())}
+        
         # Handle approval timeout check (triggered daily by EventBridge)
         elif event.get('check_approval_timeouts'):
-            print("🔍 Checking for timed-out approval requests...")
+            logger.info('🔍 Checking for timed-out approval requests...')
             
             # Scan for conversations awaiting approval older than 5 days
             five_days_ago = int((datetime.utcnow() - timedelta(days=5)).timestamp())
@@ -3779,7 +5575,7 @@ I've sent your request to the IT team for approval. You'll be notified once they
             )
             
             timed_out_approvals = response.get('Items', [])
-            print(f"Found {len(timed_out_approvals)} timed-out approval requests")
+            logger.info('Found %s timed-out approval requests', len(timed_out_approvals))
             
             for item in timed_out_approvals:
                 interaction_id = item['interaction_id']
@@ -3793,7 +5589,7 @@ I've sent your request to the IT team for approval. You'll be notified once they
                 
                 # Create ticket for timed-out approval
                 if save_ticket_to_dynamodb(user_id, user_name, user_email, interaction_id, timestamp):
-                    print(f"✅ Created ticket for timed-out approval: {interaction_id}")
+                    logger.info('✅ Created ticket for timed-out approval: %s', interaction_id)
                     
                     # Update conversation outcome
                     update_conversation(interaction_id, timestamp, 
@@ -3801,16 +5597,17 @@ I've sent your request to the IT team for approval. You'll be notified once they
                                       from_bot=True, outcome='Escalated to Ticket')
                     
                     # Notify user
-                    channel = f"@{user_id}"
+                    channel = get_dm_channel(user_id) or user_id
                     message = f"⏱️ Your approval request for *{description}* has been pending for 5 days. I've created a ticket and escalated it to IT Support. They'll follow up with you directly."
                     send_slack_message(channel, message)
                 else:
-                    print(f"❌ Failed to create ticket for: {interaction_id}")
+                    logger.error('❌ Failed to create ticket for: %s', interaction_id)
             
             return {'statusCode': 200, 'body': f'Processed {len(timed_out_approvals)} timed-out approvals'}
         
         # Handle async processing
         elif event.get('async_processing'):
+            logger.set_route('async_processing')
             user_message = event['user_message']
             user_name = event['user_name']
             channel = event['channel']
@@ -3819,25 +5616,44 @@ I've sent your request to the IT team for approval. You'll be notified once they
             image_detected = event.get('image_detected', False)
             interaction_id = event.get('interaction_id')
             timestamp = event.get('timestamp')
+            status = StatusMessage(channel, event.get('status_ts'))
+            
+            logger.info('Async processing for: %s', user_message)
             
-            print(f"Async processing for: {user_message}")
+            # Progress text only appears if the real work is slow; the first streamed
+            # answer text (or the finished answer) cancels it
+            progress_msg = None
+            answer_started = threading.Event()
             
-            # Send follow-up message
-            time.sleep(8)
+            def send_progress_message():
+                if progress_msg and not answer_started.wait(PROGRESS_MESSAGE_DELAY_SECONDS):
+                    status.update(progress_msg)
             
             image_analysis = None
             
+            # Independent stages run side by side and join before the prompt is built:
+            # KB retrieval (loads the KB on a cold container), the conversation so far
+            # (escalation flag and earlier turns), the user's profile, and the screenshot
+            # analysis followed by a KB search that includes what the screenshot shows
+            stages = {
+                'kb': lambda: search_kb(user_message),
+                'context': lambda: load_conversation_turns(interaction_id, timestamp, user_message),
+                'profile': lambda: get_user_profile(user_id) if user_id != 'unknown' else None
+            }
+            
             if image_url:
-                followup_msg = "🤔 Still analyzing your image... Brie is examining the details!"
-                send_slack_message(channel, followup_msg)
+                progress_msg = "🤔 Still analyzing your image... Brie is examining the details!"
+                threading.Thread(target=send_progress_message, daemon=True).start()
+                
+                def analyze_and_search():
+                    analysis = analyze_image_with_claude(image_url, user_message)
+                    return analysis, search_kb(f"{user_message} {analysis}") if analysis else None
                 
-                # Analyze the image
-                image_analysis = analyze_image_with_claude(image_url, user_message)
-                print(f"Image analysis: {image_analysis}")
+                stages['image'] = analyze_and_search
             elif image_detected:
                 # Image was detected but URL not accessible
                 followup_msg = "🤔 I can see you uploaded an image, but I'm having trouble accessing it. Let me help you anyway!"
-                send_slack_message(channel, followup_msg)
+                status.update(followup_msg)
                 
                 # Add a note about the image issue
                 image_analysis = "User uploaded an image/screenshot but the bot couldn't access the file URL. Please ask the user to describe what the image shows so you can provide appropriate help."
@@ -3845,42 +5661,58 @@ I've sent your request to the IT team for approval. You'll be notified once they
                 # Check if user mentioned uploading an image but we couldn't detect it
                 if any(word in user_message.lower() for word in ['screenshot', 'image', 'picture', 'attached', 'upload']):
                     followup_msg = "🤔 I can see you mentioned an image, but I'm having trouble accessing it. Let me help you anyway!"
-                    send_slack_message(channel, followup_msg)
+                    status.update(followup_msg)
                     
                     # Add a note about the image issue
                     image_analysis = "User mentioned uploading an image/screenshot but the bot couldn't detect or access the file. Ask user to describe what the image shows."
                 else:
-                    followup_msg = "🤔 Still working on your question... Brie is analyzing the best solution for you!"
-                    send_slack_message(channel, followup_msg)
+                    progress_msg = "🤔 Still working on your question... Brie is analyzing the best solution for you!"
+                    threading.Thread(target=send_progress_message, daemon=True).start()
+            
+            stages_started = time.monotonic()
+            stage_results, stage_timings = run_answer_stages(stages)
+            kb_chunks = stage_results['kb']
+            if image_url:
+                image_analysis, image_kb_chunks = stage_results['image'] or (None, None)
+                image_analysis = image_analysis or "I can see you uploaded an image, but I'm having trouble analyzing it right now. Please describe what the image shows."
+                kb_chunks = image_kb_chunks if image_kb_chunks is not None else kb_chunks
+                logger.info('Image analysis: %s', image_analysis)
+            conversation_context = stage_results['context'] or {'escalated': False, 'history': []}
+            logger.info('⏱️ Answer stages done in %.0fms', (time.monotonic() - stages_started) * 1000, stage_ms=stage_timings)
+            
+            def show_partial_answer(text):
+                answer_started.set()
+                status.update(f"🔧 {text}")
+            
+            # Screenshots from the retrieved Confluence chunks upload while the answer is generated
+            image_executor = ThreadPoolExecutor(max_workers=KB_IMAGES_PER_ANSWER, thread_name_prefix='kb-images')
+            image_futures = []
+            
+            def share_answer_images(sources, images):
+                for image in images:
+                    image_futures.append((image, image_executor.submit(share_confluence_image, channel, image)))
             
             # Get Claude response with Confluence knowledge and optional image analysis
-            claude_response = get_claude_response(user_message, user_name, image_analysis)
-            send_slack_message(channel, f"🔧 {claude_response}")
+            answer_meta = {}
+            claude_response = get_claude_response(user_message, user_name, image_analysis,
+                                                  on_text=show_partial_answer, answer_meta=answer_meta,
+                                                  on_sources=share_answer_images,
+                                                  escalate=conversation_context['escalated'], kb_chunks=kb_chunks,
+                                                  user_profile=stage_results['profile'],
+                                                  conversation=conversation_context['history'])
+            answer_started.set()
+            sources = answer_meta.get('sources', [])
+            if sources:
+                logger.info('📚 Answer sources: %s', [chunk_id for source in sources for chunk_id in source['chunk_ids']])
+                source_links = ', '.join(f"<{source['url']}|{source['title']}>" for source in sources[:3])
+                status.update(f"🔧 {claude_response}\n\n📚 _Sources: {source_links}_", force=True)
+            else:
+                status.update(f"🔧 {claude_response}", force=True)
             
-            # Upload Confluence images if relevant
-            try:
-                auth_string = f"{CONFLUENCE_EMAIL}:{CONFLUENCE_API_TOKEN}"
-                auth_b64 = base64.b64encode(auth_string.encode('ascii')).decode('ascii')
-                search_url = f"{CONFLUENCE_BASE_URL}/rest/api/content/search?cql=label=foritchatbot&limit=5"
-                req = urllib.request.Request(search_url)
-                req.add_header('Authorization', f'Basic {auth_b64}')
-                req.add_header('Accept', 'application/json')
-                with urllib.request.urlopen(req) as response:
-                    data = json.loads(response.read().decode('utf-8'))
-                    for page in data.get('results', [])[:2]:
-                        images = get_confluence_images(page['id'])
-                        for img in images:
-                            try:
-                                req = urllib.request.Request(img['download_url'])
-                                req.add_header('Authorization', f'Basic {auth_b64}')
-                                with urllib.request.urlopen(req, timeout=5) as img_response:
-                                    if img_response.status == 200:
-                                        img_data = base64.b64encode(img_response.read()).decode('utf-8')
-                                        upload_to_slack(channel, img_data, img['title'])
-                            except:
-                                pass
-            except:
-                pass
+            image_executor.shutdown(wait=True)
+            for image, future in image_futures:
+                if future.exception():
+                    logger.warning('⚠️ Could not share Confluence image %s: %s', image['title'], future.exception())
             
             # Update conversation with bot response
             if interaction_id and timestamp:
@@ -3893,16 +5725,22 @@ I've sent your request to the IT team for approval. You'll be notified once they
             else:
                 track_user_message(user_id, claude_response, is_bot_response=True)
             
-            print(f"Sent Claude response to Slack")
-            
-            # Send follow-up prompt with buttons after 3 seconds
-            time.sleep(3)
+            logger.info('Sent Claude response to Slack')
             
+            # Buttons go onto the answer message itself, after the answer and any uploads
             if interaction_id and timestamp:
-                send_resolution_prompt(channel, user_id, interaction_id, timestamp)
+                send_resolution_prompt(channel, user_id, interaction_id, timestamp, status=status)
         
         return {'statusCode': 200, 'body': 'OK'}
         
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error('Error: %s', e)
         return {'statusCode': 200, 'body': 'OK'}
+    finally:
+        # Lambda freezes the container on return, so deliver everything queued first
+        slack_outbox.flush()
+        slack_outbox.emit_metrics()
+        emit_route_metrics()
+        emit_retry_metrics()
+        emit_bedrock_usage_metrics()
+        emit_answer_cache_metrics()
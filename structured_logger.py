@@ -0,0 +1,108 @@
+import json
+import os
+import random
+import re
+import threading
+
+# Structured logging, shared by every Brie Lambda (bundle this file next to the
+# handler: zip <function>.zip <handler>.py structured_logger.py).
+# One JSON object per line. LOG_LEVEL sets the threshold; LOG_SAMPLE_RATES
+# ('{"<route>": 0.1}') keeps that fraction of a noisy route's DEBUG/INFO lines
+# (warnings and errors are always kept). Secrets and email local-parts are
+# masked on the serialized line, so structured fields are covered too.
+# Shared modules log through get_logger(), so their lines carry the handler's
+# service name, request id and route.
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+LOG_REDACTIONS = [
+    (re.compile(r'xox[abposr]-[A-Za-z0-9-]+'), 'xox-[REDACTED]'),
+    (re.compile(r'(?i)\b(bearer|basic)\s+[A-Za-z0-9._~+/=-]{8,}'), r'\1 [REDACTED]'),
+    (re.compile(r'(?i)((?:password|passwd|secret|token|api_key|authorization)\\?"?\s*[:=]\s*\\?"?)[^"\\,\s}]+'), r'\1[REDACTED]'),
+    (re.compile(r'\bAKIA[0-9A-Z]{16}\b'), '[REDACTED-AWS-KEY]'),
+    (re.compile(r'\b([A-Za-z0-9])[A-Za-z0-9._%+-]*@([A-Za-z0-9-]+\.[A-Za-z0-9.-]+)'), r'\1***@\2')
+]
+
+class StructuredLogger:
+    """Leveled, sampled JSON logger with lazy %-formatting and redaction
+    
+    The route (and whether it is sampled) is per thread: SQS workers each log under
+    the event they are handling. A thread that has not set a route in the current
+    invocation logs under the route set by the thread that called begin().
+    """
+    
+    def __init__(self, service):
+        self.service = service
+        self.level = LOG_LEVELS.get(os.environ.get('LOG_LEVEL', 'INFO').upper(), LOG_LEVELS['INFO'])
+        try:
+            self.sample_rates = json.loads(os.environ.get('LOG_SAMPLE_RATES') or '{}')
+        except ValueError:
+            self.sample_rates = {}
+        self.request_id = None
+        self.invocation = {'number': 0, 'thread': None, 'route': None, 'sampled': True}
+        self.local = threading.local()
+    
+    def begin(self, context=None, route=None):
+        """Start an invocation"""
+        self.request_id = getattr(context, 'aws_request_id', None)
+        self.invocation.update(number=self.invocation['number'] + 1, thread=threading.get_ident())
+        self.set_route(route)
+    
+    def set_route(self, route):
+        """Tag later lines from this thread with a route and decide once whether its chatter is kept"""
+        sampled = random.random() < float(self.sample_rates.get(route, 1.0)) if route else True
+        self.local.state = (self.invocation['number'], route, sampled)
+        if threading.get_ident() == self.invocation['thread']:
+            self.invocation.update(route=route, sampled=sampled)
+    
+    def current(self):
+        """(route, sampled) for the calling thread"""
+        state = getattr(self.local, 'state', None)
+        if state and state[0] == self.invocation['number']:
+            return state[1], state[2]
+        return self.invocation['route'], self.invocation['sampled']
+    
+    def enabled(self, level, sampled=None):
+        value = LOG_LEVELS[level]
+        if sampled is None:
+            sampled = self.current()[1]
+        return value >= self.level and (value >= LOG_LEVELS['WARNING'] or sampled)
+    
+    def log(self, level, msg, *args, **fields):
+        route, sampled = self.current()
+        # Nothing is formatted or serialized for suppressed lines
+        if not self.enabled(level, sampled):
+            return
+        if args:
+            try:
+                msg = msg % args
+            except (TypeError, ValueError):
+                msg = f"{msg} {args}"
+        record = {'level': level, 'service': self.service, 'msg': msg}
+        if self.request_id:
+            record['request_id'] = self.request_id
+        if route:
+            record['route'] = route
+        record.update(fields)
+        line = json.dumps(record, default=str, ensure_ascii=False)
+        for pattern, replacement in LOG_REDACTIONS:
+            line = pattern.sub(replacement, line)
+        print(line)
+    
+    def debug(self, msg, *args, **fields):
+        self.log('DEBUG', msg, *args, **fields)
+    
+    def info(self, msg, *args, **fields):
+        self.log('INFO', msg, *args, **fields)
+    
+    def warning(self, msg, *args, **fields):
+        self.log('WARNING', msg, *args, **fields)
+    
+    def error(self, msg, *args, **fields):
+        self.log('ERROR', msg, *args, **fields)
+
+process_loggers = {}  # {'default': the handler's logger}
+
+def get_logger(service=None):
+    """The process's logger; the handler names it first, shared modules call get_logger()"""
+    if 'default' not in process_loggers:
+        process_loggers['default'] = StructuredLogger(service or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'brie'))
+    return process_loggers['default']
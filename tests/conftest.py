@@ -0,0 +1,29 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# The handlers are single-file Lambdas that import boto3 and create clients at
+# import time, as in AWS. Tests only exercise offline logic; no call reaches AWS.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+def load_handler(filename):
+    """Import a handler by file name (the deployed names contain hyphens)"""
+    name = filename[:-len('.py')].replace('-', '_')
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_ROOT, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+@pytest.fixture(scope='session')
+def bot():
+    return load_handler('lambda_function.py')
+
+@pytest.fixture(scope='session')
+def connector():
+    return load_handler('brie-infrastructure-connector.py')
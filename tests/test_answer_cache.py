@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+import pytest
+
+ASKER = {'user_id': 'U123ABC', 'real_name': 'Alex Smith', 'email': 'alex.smith@ever.ag'}
+
+class FakeTable:
+    """Just enough of a DynamoDB table for the answer cache: put_item and a single-page query"""
+    
+    def __init__(self):
+        self.items = []
+    
+    def put_item(self, Item):
+        self.items.append(Item)
+    
+    def query(self, **kwargs):
+        version = kwargs['ExpressionAttributeValues'][':v']
+        return {'Items': [item for item in self.items if item['kb_version'] == version]}
+
+@pytest.fixture
+def cache(bot, monkeypatch):
+    table = FakeTable()
+    
+    class FakeDynamoDB:
+        def Table(self, name):
+            return table
+    
+    monkeypatch.setattr(bot, 'dynamodb', FakeDynamoDB())
+    monkeypatch.setattr(bot, 'ANSWER_CACHE_ENABLED', True)
+    monkeypatch.setattr(bot, 'get_knowledge_base', lambda: {'kb_version': 'v1', 'index': None})
+    monkeypatch.setattr(bot, 'answer_cache', {'kb_version': None, 'entries': OrderedDict(), 'loaded_at': 0})
+    return table
+
+@pytest.mark.parametrize('answer', [
+    'Hi Alex Smith, restart the VPN client.',
+    'I have emailed alex.smith@ever.ag the steps.',
+    'The account alex.smith is locked.',
+    'Thanks <@U123ABC>!'
+])
+def test_answers_naming_the_asker_are_detected(bot, answer):
+    assert bot.answer_mentions_asker(answer, 'Alex Smith', ASKER)
+
+def test_first_name_greeting_is_not_personal(bot):
+    assert not bot.answer_mentions_asker('Hi Alex, restart the VPN client.', 'Alex Smith', ASKER)
+    assert not bot.answer_mentions_asker('Hi Alex, restart the VPN client.', 'Alex', None)
+
+def test_generic_answer_is_stored_with_the_greeting_templated(bot, cache):
+    bot.store_cached_answer('how do I reset the vpn', 'Alex Smith', 'Hi Alex, restart the VPN client.', user_profile=ASKER)
+    
+    assert cache.items[0]['answer'] == f"Hi {bot.ANSWER_NAME_PLACEHOLDER}, restart the VPN client."
+    hit = bot.lookup_cached_answer('how do I reset the vpn', 'Chris Lee')
+    assert hit['answer'] == 'Hi Chris, restart the VPN client.'
+
+def test_answer_naming_the_asker_is_not_stored(bot, cache):
+    bot.store_cached_answer('how do I reset the vpn', 'Alex Smith', 'Alex Smith, your VPN profile was reset.', user_profile=ASKER)
+    
+    assert cache.items == []
+    assert bot.lookup_cached_answer('how do I reset the vpn', 'Chris Lee') is None
+
+def test_personal_questions_are_never_cached(bot, cache):
+    bot.store_cached_answer('what is the status of my ticket 12345', 'Alex Smith', 'It is open.', user_profile=ASKER)
+    
+    assert cache.items == []
+
+def test_metrics_are_counted_under_concurrency(bot, monkeypatch):
+    monkeypatch.setattr(bot, 'answer_cache_metrics', dict.fromkeys(bot.answer_cache_metrics, 0))
+    
+    def record():
+        for _ in range(1000):
+            bot.record_answer_cache_metric('lookups')
+    
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert bot.answer_cache_metrics['lookups'] == 8000
+    bot.emit_answer_cache_metrics()
+    assert bot.answer_cache_metrics['lookups'] == 0
@@ -0,0 +1,115 @@
+import io
+import urllib.error
+
+import pytest
+
+import api_retry
+
+class FakeClock:
+    """Stands in for time.monotonic/time.time/time.sleep so buckets can be tested without waiting"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def time(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(api_retry.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(api_retry.time, 'time', clock.time)
+    monkeypatch.setattr(api_retry.time, 'sleep', clock.sleep)
+    return clock
+
+def http_error(code, retry_after=None):
+    headers = {'Retry-After': retry_after} if retry_after is not None else {}
+    return urllib.error.HTTPError('https://example.test', code, 'error', headers, io.BytesIO(b''))
+
+def test_bucket_allows_a_burst_up_to_capacity_then_paces(clock):
+    bucket = api_retry.TokenBucket(rate=2, capacity=3)
+    
+    assert all(bucket.acquire() for _ in range(3))
+    assert clock.sleeps == []
+    assert bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+def test_bucket_refills_with_time(clock):
+    bucket = api_retry.TokenBucket(rate=1, capacity=1)
+    assert bucket.acquire()
+    clock.now += 1
+    assert bucket.acquire()
+    assert clock.sleeps == []
+
+def test_bucket_gives_up_rather_than_wait_past_the_deadline(clock):
+    bucket = api_retry.TokenBucket(rate=0.5, capacity=1)
+    assert bucket.acquire()
+    assert not bucket.acquire(deadline=clock.now + 1)
+    assert clock.sleeps == []
+
+def test_penalize_makes_every_caller_wait_out_retry_after(clock):
+    bucket = api_retry.TokenBucket(rate=1, capacity=5)
+    bucket.penalize(3)
+    assert bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(4)
+
+@pytest.mark.parametrize('value, seconds', [('7', 7.0), ('0.5', 0.5), (None, 0), ('soon', 0)])
+def test_parse_retry_after(value, seconds):
+    assert api_retry.parse_retry_after(value) == seconds
+
+def test_retry_after_header_is_honored_for_429():
+    assert api_retry.get_retry_after(http_error(429, '12')) == 12.0
+
+def test_server_errors_retry_only_when_idempotent():
+    assert api_retry.get_retry_after(http_error(503)) == 0
+    assert api_retry.get_retry_after(http_error(503), idempotent=False) is None
+    assert api_retry.get_retry_after(http_error(429), idempotent=False) == 0
+
+def test_client_errors_are_not_retried():
+    assert api_retry.get_retry_after(http_error(400)) is None
+    assert api_retry.get_retry_after(ValueError('bad')) is None
+
+def test_slack_ratelimited_body_and_aws_throttling_are_retryable():
+    assert api_retry.get_retry_after(api_retry.RateLimitedError('ratelimited', retry_after=30)) == 30
+    throttled = Exception('throttled')
+    throttled.response = {'Error': {'Code': 'ThrottlingException'},
+                          'ResponseMetadata': {'HTTPHeaders': {'retry-after': '2'}}}
+    assert api_retry.get_retry_after(throttled) == 2.0
+
+def test_call_with_retry_waits_at_least_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(api_retry, 'rate_limit_buckets', {})
+    attempts = []
+    
+    def flaky():
+        attempts.append(clock.now)
+        if len(attempts) == 1:
+            raise http_error(429, '3')
+        return 'ok'
+    
+    assert api_retry.call_with_retry('graph', flaky) == 'ok'
+    assert attempts[1] - attempts[0] >= 3
+
+def test_call_with_retry_does_not_repeat_a_non_idempotent_call_on_5xx(clock, monkeypatch):
+    monkeypatch.setattr(api_retry, 'rate_limit_buckets', {})
+    attempts = []
+    
+    def post():
+        attempts.append(1)
+        raise http_error(502)
+    
+    with pytest.raises(urllib.error.HTTPError):
+        api_retry.call_with_retry('slack_post:C1', post, idempotent=False)
+    assert len(attempts) == 1
+
+def test_chat_post_message_is_paced_per_channel():
+    assert api_retry.slack_rate_limit_api('chat.postMessage', 'C1') == 'slack_post:C1'
+    assert api_retry.slack_rate_limit_api('users.info', 'C1') == 'slack_tier4'
+    assert api_retry.slack_rate_limit_api('unknown.method') == 'slack_tier3'
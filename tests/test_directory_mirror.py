@@ -0,0 +1,50 @@
+import pytest
+
+import directory_mirror
+
+MIRROR = {
+    'groups': {
+        'g1': {'id': 'g1', 'displayName': 'IT Test', 'mail': 'ittest@ever.ag', 'mailNickname': 'ittest'},
+        'g2': {'id': 'g2', 'displayName': 'DL_Sales', 'mail': 'dl_sales@ever.ag', 'mailNickname': 'dl_sales'}
+    },
+    'users': {
+        'u1': {'id': 'u1', 'displayName': 'Alex Smith', 'mail': 'Alex.Smith@ever.ag', 'userPrincipalName': 'asmith@ever.ag',
+               'proxyAddresses': ['SMTP:Alex.Smith@ever.ag', 'smtp:alex@dairy.com']},
+        'u2': {'id': 'u2', 'displayName': 'Chris Lee', 'mail': 'chris.lee@ever.ag', 'userPrincipalName': 'clee@ever.ag'},
+        'u3': {'id': 'u3', 'displayName': 'Chris Lee', 'mail': None, 'userPrincipalName': 'clee@partner.com'},
+        'u4': {'id': 'u4', 'displayName': 'Sam Park', 'mail': 'sam.park@ever.ag'},
+        'u5': {'id': 'u5', 'displayName': 'Sam Park', 'mail': 'samuel.park@ever.ag'}
+    }
+}
+
+@pytest.fixture(autouse=True)
+def mirror():
+    directory_mirror.remember_directory_mirror(MIRROR)
+    yield
+    directory_mirror.directory_mirror_cache.update(mirror=None, index=None, loaded_at=0)
+
+@pytest.mark.parametrize('needle', ['alex.smith@ever.ag', 'ASMITH@ever.ag', 'alex@dairy.com', 'alex smith'])
+def test_user_found_by_any_address_or_display_name(needle):
+    assert directory_mirror.find_mirror_user(needle)['id'] == 'u1'
+
+def test_shared_display_name_prefers_the_single_ever_ag_account():
+    assert directory_mirror.find_mirror_user('Chris Lee')['id'] == 'u2'
+
+def test_ambiguous_display_name_is_not_guessed():
+    assert directory_mirror.find_mirror_user('Sam Park') is None
+
+def test_unknown_user():
+    assert directory_mirror.find_mirror_user('nobody@ever.ag') is None
+
+def test_mirror_user_email_falls_back_to_upn():
+    assert directory_mirror.mirror_user_email(MIRROR['users']['u3']) == 'clee@partner.com'
+
+def test_group_search_matches_name_exactly_and_addresses_by_prefix():
+    assert [g['id'] for g in directory_mirror.search_mirror_groups('it test')] == ['g1']
+    assert directory_mirror.search_mirror_groups('IT') == []
+    assert [g['id'] for g in directory_mirror.search_mirror_groups('dl_sales@ever.ag')] == ['g2']
+
+def test_no_mirror_means_fall_back_to_graph():
+    directory_mirror.remember_directory_mirror(None)
+    assert directory_mirror.search_mirror_groups('IT Test') is None
+    assert directory_mirror.find_mirror_user('alex smith') is None
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+@pytest.fixture
+def graph(connector, monkeypatch):
+    """Fake $batch endpoint: answers every sub-request with 200 unless told otherwise"""
+    calls = []
+    statuses = {}  # {request id: [status for each attempt, ...]}
+    
+    def fake_urlopen_json(req, api, deadline=None, idempotent=True):
+        sub_requests = json.loads(req.data.decode('utf-8'))['requests']
+        calls.append([sub_request['id'] for sub_request in sub_requests])
+        responses = []
+        for sub_request in sub_requests:
+            pending = statuses.get(sub_request['id'])
+            status = pending.pop(0) if pending else 200
+            response = {'id': sub_request['id'], 'status': status, 'body': {'url': sub_request['url']}}
+            if status == 429:
+                response['headers'] = {'Retry-After': '0'}
+            responses.append(response)
+        return {'responses': responses}
+    
+    monkeypatch.setattr(connector, 'urlopen_json', fake_urlopen_json)
+    monkeypatch.setattr(connector.time, 'sleep', lambda seconds: None)
+    return calls, statuses
+
+def test_requests_are_sent_in_chunks_of_twenty(connector, graph):
+    calls, _ = graph
+    batch = connector.GraphBatch('token')
+    ids = [batch.get(f"/users/user{i}@ever.ag") for i in range(45)]
+    
+    results = batch.execute()
+    
+    assert [len(call) for call in calls] == [20, 20, 5]
+    assert all(results[request_id]['status'] == 200 for request_id in ids)
+    assert results[ids[44]]['body']['url'] == '/users/user44@ever.ag'
+    assert batch.requests == []
+
+def test_only_throttled_sub_requests_are_resent(connector, graph):
+    calls, statuses = graph
+    statuses['2'] = [429, 429]
+    batch = connector.GraphBatch('token')
+    ids = [batch.get(f"/users/user{i}@ever.ag") for i in range(3)]
+    
+    results = batch.execute()
+    
+    assert calls == [['1', '2', '3'], ['2'], ['2']]
+    assert [results[request_id]['status'] for request_id in ids] == [200, 200, 200]
+
+def test_sub_request_still_throttled_after_the_last_attempt_is_a_failure(connector, graph):
+    calls, statuses = graph
+    statuses['1'] = [429] * connector.RETRY_MAX_ATTEMPTS
+    batch = connector.GraphBatch('token')
+    request_id = batch.get('/users/busy@ever.ag')
+    
+    results = batch.execute()
+    
+    assert len(calls) == connector.RETRY_MAX_ATTEMPTS
+    assert results[request_id]['status'] == 500
+
+def test_lookup_graph_users_tells_missing_from_failed(connector, graph, monkeypatch):
+    _, statuses = graph
+    statuses.update({'1': [404], '2': [503]})
+    monkeypatch.setattr(connector, 'find_mirror_user', lambda email: None)
+    
+    users = connector.lookup_graph_users('token', ['gone@ever.ag', 'flaky@ever.ag'])
+    
+    assert users['gone@ever.ag'] == {'found': False}
+    assert users['flaky@ever.ag'] == {'found': False, 'error': 503}
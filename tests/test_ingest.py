@@ -0,0 +1,73 @@
+import json
+import threading
+
+import pytest
+
+def record(message_id, user, text, **extra):
+    return {'messageId': message_id, 'body': json.dumps({'slack_event': {'user': user, 'text': text}, **extra})}
+
+@pytest.fixture
+def handled(bot, monkeypatch):
+    """Texts the worker handled, in order, per user; a message with 'fail' set raises"""
+    seen = {}
+    lock = threading.Lock()
+    
+    def fake_process_ingest_message(message, context):
+        if message.get('fail'):
+            raise RuntimeError('handler failed')
+        with lock:
+            seen.setdefault(message['slack_event']['user'], []).append(message['slack_event']['text'])
+    
+    monkeypatch.setattr(bot, 'process_ingest_message', fake_process_ingest_message)
+    return seen
+
+def test_each_conversation_is_handled_in_order(bot, handled):
+    records = [record(str(i), 'U1' if i % 2 else 'U2', f"m{i}") for i in range(1, 9)]
+    
+    result = bot.process_ingest_records(records, None)
+    
+    assert result == {'batchItemFailures': []}
+    assert handled == {'U1': ['m1', 'm3', 'm5', 'm7'], 'U2': ['m2', 'm4', 'm6', 'm8']}
+
+def test_failure_retries_the_rest_of_that_conversation_only(bot, handled):
+    records = [
+        record('1', 'U1', 'a1'),
+        record('2', 'U1', 'a2', fail=True),
+        record('3', 'U1', 'a3'),
+        record('4', 'U2', 'b1')
+    ]
+    
+    result = bot.process_ingest_records(records, None)
+    
+    assert result == {'batchItemFailures': [{'itemIdentifier': '2'}, {'itemIdentifier': '3'}]}
+    assert handled == {'U1': ['a1'], 'U2': ['b1']}
+
+def test_malformed_body_fails_only_that_record(bot, handled):
+    records = [record('1', 'U1', 'a1'), {'messageId': '2', 'body': '{not json'}, record('3', 'U1', 'a2')]
+    
+    result = bot.process_ingest_records(records, None)
+    
+    assert result == {'batchItemFailures': [{'itemIdentifier': '2'}]}
+    assert handled == {'U1': ['a1', 'a2']}
+
+def test_ack_hands_off_to_an_async_worker_without_a_queue(bot, monkeypatch):
+    invocations = []
+    
+    class FakeLambda:
+        def invoke(self, **kwargs):
+            invocations.append(kwargs)
+    
+    class Context:
+        function_name = 'it-helpdesk-bot'
+    
+    monkeypatch.setattr(bot, 'INGEST_QUEUE_URL', '')
+    monkeypatch.setattr(bot, 'claim_slack_event', lambda event_id: True)
+    monkeypatch.setattr(bot.boto3, 'client', lambda service, **kwargs: FakeLambda())
+    monkeypatch.setattr(bot, 'handle_slack_event', lambda *args: pytest.fail('routed before the ack'))
+    body = {'event_id': 'Ev1', 'event': {'type': 'message', 'user': 'U1', 'text': 'hi'}}
+    
+    assert bot.acknowledge_slack_event({}, body, Context()) == {'statusCode': 200, 'body': 'OK'}
+    assert invocations[0]['FunctionName'] == 'it-helpdesk-bot'
+    assert invocations[0]['InvocationType'] == 'Event'
+    payload = json.loads(invocations[0]['Payload'])
+    assert payload['ingest_worker'] and payload['message']['slack_event']['text'] == 'hi'
@@ -0,0 +1,61 @@
+import pytest
+
+PAGES = {
+    '1': {'id': '1', 'title': 'VPN Setup', 'text': '', 'sections': [
+        ('Install', 'Download GlobalProtect from the portal and install it.'),
+        ('Troubleshooting', 'If the VPN will not connect, restart GlobalProtect and sign in again.')
+    ]},
+    '2': {'id': '2', 'title': 'Printer Guide', 'text': '', 'sections': [
+        ('Adding a printer', 'Open Settings, choose Printers and add the office printer by name.')
+    ]},
+    '3': {'id': '3', 'title': 'Password Reset', 'text': '', 'sections': [
+        ('', 'Reset your password at the self service portal. Call IT if you are locked out.')
+    ]}
+}
+
+@pytest.fixture
+def kb(bot, monkeypatch):
+    kb = {'kb_version': 'test', 'pages': PAGES, 'index': bot.build_kb_index(PAGES)}
+    monkeypatch.setattr(bot, 'get_knowledge_base', lambda: kb)
+    return kb
+
+def test_best_matching_chunk_ranks_first(bot, kb):
+    results = bot.search_kb('vpn will not connect')
+    
+    assert results[0]['id'] == '1#1'
+    assert results[0]['heading'] == 'Troubleshooting'
+    assert [r['score'] for r in results] == sorted((r['score'] for r in results), reverse=True)
+
+def test_title_and_heading_are_searchable(bot, kb):
+    assert bot.search_kb('printer')[0]['page_id'] == '2'
+    assert bot.search_kb('install')[0]['id'] == '1#0'
+
+def test_rarer_terms_outweigh_common_ones(bot, kb):
+    # "portal" is on two pages, "locked" on one
+    assert bot.search_kb('portal locked')[0]['page_id'] == '3'
+
+def test_stopwords_and_unknown_terms_match_nothing(bot, kb):
+    assert bot.search_kb('how do I') == []
+    assert bot.search_kb('kubernetes') == []
+
+def test_top_k_and_token_budget_limit_results(bot, kb):
+    assert len(bot.search_kb('portal')) == 2
+    assert len(bot.search_kb('portal', top_k=1)) == 1
+    best = bot.search_kb('portal')[0]
+    assert bot.search_kb('portal', token_budget=bot.estimate_tokens(best['text'])) == [best]
+    assert bot.search_kb('portal', token_budget=1) == []
+
+def test_long_sections_are_chunked_with_overlap(bot):
+    words = [f"w{i}" for i in range(400)]
+    page = {'id': 'p', 'title': 'Long', 'sections': [('Body', ' '.join(words))]}
+    
+    chunks = bot.chunk_kb_page(page)
+    
+    step = bot.KB_CHUNK_WORDS - bot.KB_CHUNK_OVERLAP_WORDS
+    assert [chunk['text'].split()[0] for chunk in chunks] == [words[i] for i in range(0, 400 - bot.KB_CHUNK_OVERLAP_WORDS, step)]
+    assert all(len(chunk['text'].split()) <= bot.KB_CHUNK_WORDS for chunk in chunks)
+    assert chunks[-1]['text'].split()[-1] == 'w399'
+
+def test_empty_index_returns_nothing(bot, monkeypatch):
+    monkeypatch.setattr(bot, 'get_knowledge_base', lambda: {'pages': {}, 'index': bot.build_kb_index({})})
+    assert bot.search_kb('vpn') == []
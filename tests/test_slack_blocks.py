@@ -0,0 +1,41 @@
+import pytest
+
+@pytest.mark.parametrize('text', [None, '', '   ', '\n\n'])
+def test_empty_text_gives_no_blocks(bot, text):
+    assert bot.text_to_section_blocks(text) == []
+
+def test_short_text_is_one_section(bot):
+    assert bot.text_to_section_blocks('Restart the VPN client.') == [
+        {'type': 'section', 'text': {'type': 'mrkdwn', 'text': 'Restart the VPN client.'}}
+    ]
+
+def test_long_text_splits_under_the_limit_at_paragraph_breaks(bot):
+    limit = bot.SLACK_SECTION_MAX_CHARS
+    first = 'a' * (limit - 100)
+    second = 'b' * (limit - 100)
+    
+    blocks = bot.text_to_section_blocks(f"{first}\n\n{second}")
+    
+    assert [block['text']['text'].strip() for block in blocks] == [first, second]
+    assert all(len(block['text']['text']) <= limit for block in blocks)
+
+def test_text_without_line_breaks_is_cut_at_the_limit(bot):
+    limit = bot.SLACK_SECTION_MAX_CHARS
+    text = 'x' * (2 * limit + 10)
+    
+    blocks = bot.text_to_section_blocks(text)
+    
+    assert [len(block['text']['text']) for block in blocks] == [limit, limit, 10]
+    assert ''.join(block['text']['text'] for block in blocks) == text
+
+def test_status_update_omits_blocks_for_empty_text(bot, monkeypatch):
+    sent = []
+    monkeypatch.setattr(bot, 'slack_api_call', lambda method, payload: sent.append((method, payload)) or {'ok': True})
+    monkeypatch.setattr(bot.slack_outbox, 'flush', lambda channel=None: None)
+    status = bot.StatusMessage('C1', ts='1.1')
+    
+    status.update('', force=True)
+    status.update('Done', force=True)
+    
+    assert sent[0] == ('chat.update', {'channel': 'C1', 'ts': '1.1', 'text': ''})
+    assert sent[1][1]['blocks'] == bot.text_to_section_blocks('Done')
@@ -0,0 +1,47 @@
+def test_headings_split_sections(bot):
+    sections = bot.convert_storage('<p>Intro with <strong>bold</strong>.</p><h2>Steps</h2><p>One</p><h3>More</h3><p>Two</p>')
+    
+    assert sections == [('', 'Intro with bold.'), ('Steps', 'One'), ('More', 'Two')]
+
+def test_lists_are_numbered_and_nested(bot):
+    sections = bot.convert_storage('<ol><li>Open the app</li><li>Click <em>Connect</em><ul><li>Wait</li></ul></li></ol>')
+    
+    assert sections == [('', '1. Open the app\n2. Click Connect\n  - Wait')]
+
+def test_tables_become_one_line_per_row(bot):
+    sections = bot.convert_storage(
+        '<table><tbody><tr><th>Name</th><th>Value</th></tr><tr><td>Port</td><td><p>443</p></td></tr></tbody></table>'
+    )
+    
+    assert sections == [('', 'Name | Value\nPort | 443')]
+
+def test_admonitions_are_labelled_and_navigation_macros_dropped(bot):
+    sections = bot.convert_storage(
+        '<ac:structured-macro ac:name="toc"><ac:parameter ac:name="maxLevel">2</ac:parameter></ac:structured-macro>'
+        '<ac:structured-macro ac:name="warning"><ac:rich-text-body><p>Never share your password.</p>'
+        '</ac:rich-text-body></ac:structured-macro><p>After</p>'
+    )
+    
+    assert sections == [('', 'Warning: Never share your password.\nAfter')]
+
+def test_code_macro_keeps_its_lines(bot):
+    sections = bot.convert_storage(
+        '<ac:structured-macro ac:name="code"><ac:plain-text-body><![CDATA[ipconfig /flushdns\n\nipconfig /renew]]>'
+        '</ac:plain-text-body></ac:structured-macro>'
+    )
+    
+    assert sections == [('', 'ipconfig /flushdns\nipconfig /renew')]
+
+def test_links_attachments_and_entities(bot):
+    sections = bot.convert_storage(
+        '<p>See <ac:link><ri:page ri:content-title="VPN Setup"/></ac:link> and '
+        '<ac:link><ri:page ri:content-title="Other"/><ac:plain-text-link-body><![CDATA[this page]]>'
+        '</ac:plain-text-link-body></ac:link>.</p>'
+        '<p><ac:image><ri:attachment ri:filename="screen.png"/></ac:image> Q&amp;A</p>'
+    )
+    
+    assert sections == [('', 'See VPN Setup and this page.\n[image: screen.png] Q&A')]
+
+def test_sections_to_text_puts_headings_above_their_text(bot):
+    sections = [('', 'Intro'), ('Steps', '1. Open')]
+    assert bot.sections_to_text(sections) == 'Intro\n\nSteps\n1. Open'